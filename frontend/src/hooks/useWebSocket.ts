@@ -17,6 +17,8 @@ export const useWebSocket = ({ url, onMessage, onError, onClose }: UseWebSocketP
   const [isConnecting, setIsConnecting] = useState(false);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  // last numbered frame of the answer being streamed, so a reconnect can resume instead of re-asking
+  const streamRef = useRef<{ sessionId: string; lastSeq: number } | null>(null);
 
   const connect = () => {
     if (wsRef.current?.readyState === WebSocket.OPEN) return;
@@ -46,6 +48,16 @@ export const useWebSocket = ({ url, onMessage, onError, onClose }: UseWebSocketP
       console.log('WebSocket connection opened successfully');
       setIsConnected(true);
       setIsConnecting(false);
+      // connection dropped mid-answer: fetch the missed tail / re-attach to the running generation
+      if (streamRef.current) {
+        const teacherID = window.localStorage.getItem('teacherID');
+        wsRef.current?.send(JSON.stringify({
+          type: 'resume',
+          teacherId: teacherID,
+          sessionId: streamRef.current.sessionId,
+          fromSeq: streamRef.current.lastSeq
+        }));
+      }
     };
 
     wsRef.current.onmessage = (event) => {
@@ -55,10 +67,21 @@ export const useWebSocket = ({ url, onMessage, onError, onClose }: UseWebSocketP
         // Log the received data for debugging
         console.log('Received WebSocket message:', data);
         
+        // Frames of a streamed answer are numbered; replays around a resume can repeat some
+        if (typeof data.seq === 'number' && data.sessionId) {
+          if (streamRef.current?.sessionId === data.sessionId && data.seq <= streamRef.current.lastSeq) {
+            return;
+          }
+          streamRef.current = { sessionId: data.sessionId, lastSeq: data.seq };
+        }
+
         // Check if this is a completion message with sessionId
         if (data.status === 'complete' && data.sessionId) {
           console.log('Received completion with sessionId:', data.sessionId);
         }
+        if (data.status === 'complete' || data.status === 'resume_unavailable') {
+          streamRef.current = null;
+        }
         
         onMessage(data);
       } catch (error) {
@@ -98,11 +121,19 @@ export const useWebSocket = ({ url, onMessage, onError, onClose }: UseWebSocketP
       console.log('WebSocket connection closed:', { code: event.code, reason: event.reason, wasClean: event.wasClean });
       setIsConnected(false);
       setIsConnecting(false);
+      // dropped in the middle of an answer: reconnect and resume it (onopen sends the resume)
+      if (streamRef.current && !reconnectTimeoutRef.current) {
+        reconnectTimeoutRef.current = setTimeout(() => {
+          reconnectTimeoutRef.current = null;
+          connect();
+        }, 1000);
+      }
       onClose?.(event);
     };
   };
 
   const disconnect = () => {
+    streamRef.current = null;
     // Clear any pending reconnect timeout
     if (reconnectTimeoutRef.current) {
       clearTimeout(reconnectTimeoutRef.current);
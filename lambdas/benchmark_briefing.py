@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Prompt size and time to first token of first-turn student chats: full profile vs briefing.
+
+Builds the student-chat system prompt both ways (format_student_profile with and without
+use_briefing) for every profile, from the sample CSV or a live table. Profiles without a stored
+briefing get one generated with --live. With --live each prompt is also streamed through
+converse_stream --repeats times and the median time to first token and reported input tokens
+are compared; without it prompt tokens are estimated (~4 chars/token).
+
+usage:
+  python benchmark_briefing.py                               # sample CSV, stored briefings only
+  python benchmark_briefing.py --live --limit 10 --repeats 3 --out briefing.json
+  python benchmark_briefing.py --table k12-coteacher-student-profiles --live --store
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'layers', 'aws_clients', 'python'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'inference'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'studentBriefing'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'sample_data'))
+os.chdir(os.path.join(SCRIPT_DIR, 'inference'))  # prompt templates are loaded relative to the lambda root
+
+from student_utils import format_student_profile
+from utils import load_prompt_template
+from map_reduce import estimate_tokens
+
+CHAT_MODEL_ID = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
+SAMPLE_CSV = os.path.join(SCRIPT_DIR, '..', 'sample_data', 'dynamo_data', 'k12-coteacher-student-profiles.csv')
+FIRST_MESSAGE = "Tomorrow we start fractions on a number line with a partner activity. What should I adjust for this student?"
+
+def load_profiles(table_name, limit):
+    if table_name:
+        from aws_clients import get_table
+        items, kwargs = [], {}
+        while len(items) < limit:
+            response = get_table(table_name).scan(**kwargs)
+            items += response['Items']
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return items[:limit]
+    import csv
+    from load_csv_to_dynamo import row_to_item
+    with open(SAMPLE_CSV, newline='', encoding='utf-8') as f:
+        return [row_to_item(row) for _, row in zip(range(limit), csv.DictReader(f))]
+
+def system_prompt(profile, teacher_id, use_briefing):
+    return load_prompt_template("prompts/3_7_prompt_student_chat.txt",
+                                {"STUDENT_PROFILE": format_student_profile(profile, teacher_id, use_briefing=use_briefing)})
+
+def time_first_token(client, prompt, repeats):
+    ttfts, input_tokens = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = client.converse_stream(
+            modelId=CHAT_MODEL_ID,
+            messages=[{"role": "user", "content": [{"text": FIRST_MESSAGE}]}],
+            system=[{"text": prompt}],
+            inferenceConfig={"maxTokens": 1024, "temperature": 0.3, "topP": 0.9},
+        )
+        first = None
+        for event in response["stream"]:
+            if first is None and "contentBlockDelta" in event:
+                first = time.perf_counter() - started
+            if "metadata" in event:
+                input_tokens = event["metadata"]["usage"]["inputTokens"]
+        ttfts.append(first)
+    return statistics.median(ttfts), input_tokens
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare first-turn student prompts with and without the briefing")
+    parser.add_argument("--table", help="read profiles from this table instead of the sample CSV")
+    parser.add_argument("--limit", type=int, default=31)
+    parser.add_argument("--teacher-id", default=None, help="teacher whose comments / briefing to use")
+    parser.add_argument("--live", action="store_true", help="generate missing briefings and time converse_stream")
+    parser.add_argument("--store", action="store_true", help="with --live and --table, save generated briefings")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    client = None
+    if args.live:
+        from aws_clients import get_bedrock_client, get_table
+        from briefing import generate_briefing, store_briefing
+        client = get_bedrock_client()
+
+        def invoke_bedrock(body, model_id):
+            response = client.invoke_model(modelId=model_id, contentType="application/json", accept="application/json", body=body)
+            return json.loads(response["body"].read())
+
+    rows = []
+    print(f"{'student':<10} {'full tok':>9} {'brief tok':>10} {'saved':>6} {'full ttft':>10} {'brief ttft':>11}")
+    for profile in load_profiles(args.table, args.limit):
+        if args.live and not profile.get('briefing'):
+            profile['briefing'] = generate_briefing(profile, invoke_bedrock)
+            if args.store and args.table:
+                store_briefing(get_table(args.table), profile['studentID'], profile['briefing'])
+        full = system_prompt(profile, args.teacher_id, use_briefing=False)
+        brief = system_prompt(profile, args.teacher_id, use_briefing=True)
+        row = {'studentID': profile.get('studentID'), 'has_briefing': brief != full,
+               'full_tokens': estimate_tokens(full), 'briefing_tokens': estimate_tokens(brief)}
+        if client and row['has_briefing']:
+            row['full_ttft_s'], row['full_tokens'] = time_first_token(client, full, args.repeats)
+            row['briefing_ttft_s'], row['briefing_tokens'] = time_first_token(client, brief, args.repeats)
+        rows.append(row)
+        saved = f"{1 - row['briefing_tokens'] / row['full_tokens']:.0%}" if row['has_briefing'] else '-'
+        full_ttft = f"{row['full_ttft_s']:.2f}s" if 'full_ttft_s' in row else '-'
+        brief_ttft = f"{row['briefing_ttft_s']:.2f}s" if 'briefing_ttft_s' in row else '-'
+        print(f"{str(row['studentID']):<10} {row['full_tokens']:>9} {row['briefing_tokens'] if row['has_briefing'] else '-':>10} "
+              f"{saved:>6} {full_ttft:>10} {brief_ttft:>11}")
+
+    with_briefing = [r for r in rows if r['has_briefing']]
+    print(f"\n{len(rows)} profiles, median full prompt {statistics.median(r['full_tokens'] for r in rows)} tokens")
+    if with_briefing:
+        print(f"{len(with_briefing)} with a briefing: median briefing prompt "
+              f"{statistics.median(r['briefing_tokens'] for r in with_briefing)} tokens")
+        if client:
+            print(f"median time to first token: full {statistics.median(r['full_ttft_s'] for r in with_briefing):.2f}s, "
+                  f"briefing {statistics.median(r['briefing_ttft_s'] for r in with_briefing):.2f}s")
+    else:
+        print("no stored briefings, run with --live to generate them")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(rows, f, indent=2, default=str)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Query latency of the chat search index at 100k messages for one teacher, against DynamoDB Local.
+
+Writes --messages synthetic chat messages (education vocabulary, Zipf distributed, spread over
+--conversations conversations) into bench copies of the chat history and search tables, indexes
+them in bulk (or one message at a time with --incremental, compacting every SEARCH_COMPACT_EVERY
+like the inference lambda does), then runs rare, common and multi-term queries --repeats times.
+Reports p50/p95 of the whole search() call and of ranking alone (segment reads + BM25), the rest
+being page resolution (DOC/message/conversation BatchGets).
+
+usage (DynamoDB Local on :8000):
+  docker run -p 8000:8000 amazon/dynamodb-local
+  python benchmark_chat_search.py [--messages 100000] [--conversations 2000] [--repeats 20] [--out search.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault('DYNAMODB_ENDPOINT_URL', 'http://localhost:8000')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+os.environ.setdefault('AWS_REGION', 'us-west-2')
+os.environ.setdefault('CHAT_HISTORY_TABLE', 'k12-coteacher-chat-history-bench')
+os.environ.setdefault('SEARCH_INDEX_TABLE', 'k12-coteacher-chat-search-bench')
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'layers', 'aws_clients', 'python'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'inference'))
+
+import chat_search_index
+from aws_clients import get_dynamo_resource, get_table
+
+TEACHER_ID = 'bench-teacher'
+VOCABULARY = """
+student students lesson lessons reading writing math fractions decimals number line partner group activity worksheet
+accommodation accommodations iep goal goals extended time breaks visual schedule graphic organizer checklist
+behavior attention focus transition transitions anxiety sensory noise headphones seating preferential small
+vocabulary comprehension fluency phonics decoding spelling essay paragraph sentence starters rubric feedback
+assessment quiz test retake chunking scaffold scaffolding model modeling practice independent guided review
+science experiment lab hypothesis data chart graph history timeline map primary source discussion debate
+speech language therapy occupational counselor aide paraprofessional parent conference email progress report
+dyslexia adhd autism processing memory executive function organization planner homework deadline calculator
+""".split()
+QUERIES = {
+    'rare': ['dyslexia', 'hypothesis', 'paraprofessional', 'headphones'],
+    'common': ['student', 'lesson', 'reading', 'accommodations'],
+    'multi': ['extended time on the fractions quiz', 'visual schedule for transitions', 'graphic organizer essay paragraph',
+              'parent conference about homework deadlines'],
+}
+
+def create_tables():
+    dynamo = get_dynamo_resource()
+    for name in (chat_search_index.CHAT_HISTORY_TABLE, chat_search_index.SEARCH_INDEX_TABLE):
+        try:
+            dynamo.Table(name).delete()
+            dynamo.Table(name).wait_until_not_exists()
+        except Exception:
+            pass
+        dynamo.create_table(
+            TableName=name,
+            KeySchema=[{'AttributeName': 'TeacherId', 'KeyType': 'HASH'}, {'AttributeName': 'sortId', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'TeacherId', 'AttributeType': 'S'}, {'AttributeName': 'sortId', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        ).wait_until_exists()
+
+def generate_messages(n_messages, n_conversations, seed=7):
+    """(conversation_id, message item) pairs, oldest first, with Zipf-ish word frequencies"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    fillers = "the a for and to with on in is this that we they".split()
+    conversations = [str(uuid.uuid4()) for _ in range(n_conversations)]
+    started = int(time.time()) - n_messages * 30
+    messages = []
+    for i in range(n_messages):
+        words = rng.choices(VOCABULARY, weights, k=rng.randint(8, 60))
+        words = [w if rng.random() > 0.3 else f"{rng.choice(fillers)} {w}" for w in words]
+        conversation_id = rng.choice(conversations)
+        messages.append((conversation_id, {
+            'TeacherId': TEACHER_ID,
+            'sortId': f'CHAT#{conversation_id}#MSG#{uuid.uuid4()}',
+            'created_at': started + i * 30,
+            'message': " ".join(words).capitalize() + ".",
+            'sender': 'user' if i % 2 == 0 else 'assistant',
+        }))
+    return conversations, messages
+
+def load(conversations, messages, incremental):
+    with get_table(chat_search_index.CHAT_HISTORY_TABLE).batch_writer() as batch:
+        for i, conversation_id in enumerate(conversations):
+            batch.put_item(Item={'TeacherId': TEACHER_ID, 'sortId': f'CONV#{conversation_id}', 'conversation_id': conversation_id,
+                                 'title': f'Conversation {i}', 'created_at': messages[0][1]['created_at']})
+        for _, item in messages:
+            batch.put_item(Item=item)
+    started = time.perf_counter()
+    if incremental:
+        for i, (conversation_id, item) in enumerate(messages):
+            chat_search_index.index_message(TEACHER_ID, conversation_id, item)
+            if i % 2:  # the handler tries once per turn, after the assistant message
+                chat_search_index.compact_index(TEACHER_ID)
+    else:
+        chat_search_index.bulk_index(TEACHER_ID, messages)
+    return time.perf_counter() - started
+
+def index_stats():
+    table = get_table(chat_search_index.SEARCH_INDEX_TABLE)
+    kwargs = {'KeyConditionExpression': 'TeacherId = :t AND begins_with(sortId, :p)',
+              'ExpressionAttributeValues': {':t': TEACHER_ID, ':p': 'TERM#'}}
+    segments, posting_bytes = 0, 0
+    while True:
+        response = table.query(**kwargs)
+        segments += len(response['Items'])
+        posting_bytes += sum(len(bytes(item['postings'])) for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return segments, posting_bytes
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat search latency")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--incremental", action="store_true", help="index message by message like the chat path")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the tables from the last run")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        create_tables()
+        conversations, messages = generate_messages(args.messages, args.conversations)
+        seconds = load(conversations, messages, args.incremental)
+        print(f"indexed {len(messages)} messages in {seconds:.1f}s ({len(messages) / seconds:.0f} msg/s)")
+    segments, posting_bytes = index_stats()
+    print(f"{segments} posting segments, {posting_bytes / 1024:.0f} KiB of postings")
+
+    results = {'messages': args.messages, 'segments': segments, 'posting_bytes': posting_bytes, 'queries': {}}
+    print(f"\n{'query':<45} {'hits':>7} {'rank p50':>9} {'rank p95':>9} {'search p50':>11} {'search p95':>11}")
+    for kind, queries in QUERIES.items():
+        for query in queries:
+            terms = list(dict.fromkeys(chat_search_index.tokenize(query)))
+            rank_ms, search_ms = [], []
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                ranked, _ = chat_search_index.rank(TEACHER_ID, terms)
+                rank_ms.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                result = chat_search_index.search(TEACHER_ID, query, page_size=args.page_size)
+                search_ms.append((time.perf_counter() - started) * 1000)
+            row = {'kind': kind, 'candidates': len(ranked), 'page_hits': len(result['hits']),
+                   'rank_p50_ms': pct(rank_ms, 0.5), 'rank_p95_ms': pct(rank_ms, 0.95),
+                   'search_p50_ms': pct(search_ms, 0.5), 'search_p95_ms': pct(search_ms, 0.95)}
+            results['queries'][query] = row
+            print(f"{kind + ': ' + query:<45} {len(ranked):>7} {row['rank_p50_ms']:>7.1f}ms {row['rank_p95_ms']:>7.1f}ms "
+                  f"{row['search_p50_ms']:>9.1f}ms {row['search_p95_ms']:>9.1f}ms")
+
+    rows = list(results['queries'].values())
+    print(f"\nall queries: search p50 {statistics.median(r['search_p50_ms'] for r in rows):.1f}ms, "
+          f"worst p95 {max(r['search_p95_ms'] for r in rows):.1f}ms")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
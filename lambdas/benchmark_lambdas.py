@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Cold-start and warm-invocation benchmark for the deployed lambdas.
+
+For each function: forces a fresh execution environment (by touching an env var), invokes it once
+cold and N times warm, and reads Init Duration / Duration from the REPORT line of the tail log.
+Run once before and once after deploying a change, then compare the two result files.
+editStudentProfile writes to a throwaway fixture student that is deleted afterwards, with
+BRIEFING_QUEUE_URL blanked for the run so no briefing regeneration (and Bedrock call) is queued.
+
+usage:
+  python benchmark_lambdas.py --label before [--warm 20] [--out results_before.json]
+  python benchmark_lambdas.py --compare results_before.json results_after.json
+"""
+
+import base64
+import json
+import re
+import statistics
+import sys
+import time
+import boto3
+
+STUDENT_PROFILES_TABLE = 'k12-coteacher-student-profiles'
+FIXTURE_STUDENT_ID = 'benchmark-fixture'
+
+# sample payloads match sample_data/dynamo_data, writes only touch the fixture student
+FUNCTIONS = {
+    'getStudentProfile': {'studentID': '021lj'},
+    'getStudentsForClass': {'classID': 'cn667cb953am8'},
+    'getClassesForDashboard': {'teacherID': 'ABC123'},
+    'getChatHistory': {'teacherId': 'sliang19@calpoly.edu', 'classId': 'cn667cb953am8'},
+    'editStudentProfile': {'studentID': FIXTURE_STUDENT_ID, 'teacherID': 'benchmark', 'teacherComment': 'benchmark run'},
+    'inference': {'requestContext': {'routeKey': '$connect'}},
+}
+# env overrides while a function is benchmarked, the original environment is restored afterwards
+ENV_OVERRIDES = {
+    'editStudentProfile': {'BRIEFING_QUEUE_URL': ''},
+}
+
+REPORT_FIELDS = {
+    'duration_ms': re.compile(r'\tDuration: ([\d.]+) ms'),
+    'init_ms': re.compile(r'Init Duration: ([\d.]+) ms'),
+    'max_memory_mb': re.compile(r'Max Memory Used: (\d+) MB'),
+}
+
+lambda_client = boto3.client('lambda')
+
+def parse_report(log_result):
+    log = base64.b64decode(log_result).decode('utf-8', errors='replace')
+    report = {}
+    for field, pattern in REPORT_FIELDS.items():
+        match = pattern.search(log)
+        report[field] = float(match.group(1)) if match else None
+    return report
+
+def set_environment(function_name, variables):
+    lambda_client.update_function_configuration(FunctionName=function_name, Environment={'Variables': variables})
+    lambda_client.get_waiter('function_updated_v2').wait(FunctionName=function_name)
+
+def force_cold_start(function_name, overrides=None):
+    """returns the environment before the change, for restoring"""
+    config = lambda_client.get_function_configuration(FunctionName=function_name)
+    original = config.get('Environment', {}).get('Variables', {})
+    variables = {**original, **(overrides or {}), 'BENCHMARK_COLD_START': str(time.time())}
+    set_environment(function_name, variables)
+    return original
+
+def create_fixture():
+    boto3.resource('dynamodb').Table(STUDENT_PROFILES_TABLE).put_item(Item={
+        'studentID': FIXTURE_STUDENT_ID, 'first_name': 'Benchmark', 'last_name': 'Fixture', 'teacherComments': {},
+    })
+
+def delete_fixture():
+    boto3.resource('dynamodb').Table(STUDENT_PROFILES_TABLE).delete_item(Key={'studentID': FIXTURE_STUDENT_ID})
+
+def invoke(function_name, payload):
+    start = time.perf_counter()
+    response = lambda_client.invoke(
+        FunctionName=function_name,
+        Payload=json.dumps(payload).encode('utf-8'),
+        LogType='Tail'
+    )
+    report = parse_report(response['LogResult'])
+    report['client_ms'] = (time.perf_counter() - start) * 1000
+    return report
+
+def summarize(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return {
+        'p50': statistics.median(values),
+        'p90': values[min(len(values) - 1, int(len(values) * 0.9))],
+        'mean': statistics.fmean(values),
+    }
+
+def benchmark_function(function_name, payload, warm_runs):
+    original_env = force_cold_start(function_name, ENV_OVERRIDES.get(function_name))
+    try:
+        cold = invoke(function_name, payload)
+        warm = [invoke(function_name, payload) for _ in range(warm_runs)]
+    finally:
+        # drops BENCHMARK_COLD_START and any override, the function is left as deployed
+        set_environment(function_name, original_env)
+    return {
+        'cold': cold,
+        'warm_duration_ms': summarize([w['duration_ms'] for w in warm]),
+        'warm_client_ms': summarize([w['client_ms'] for w in warm]),
+    }
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'function':<24}{'init ms':>20}{'cold ms':>20}{'warm p50 ms':>20}")
+    for name in before['results']:
+        if name not in after['results']:
+            continue
+        b, a = before['results'][name], after['results'][name]
+        def cell(x, y):
+            if x is None or y is None:
+                return 'n/a'
+            return f"{x:.1f} -> {y:.1f}"
+        print(f"{name:<24}"
+              f"{cell(b['cold']['init_ms'], a['cold']['init_ms']):>20}"
+              f"{cell(b['cold']['duration_ms'], a['cold']['duration_ms']):>20}"
+              f"{cell((b['warm_duration_ms'] or {}).get('p50'), (a['warm_duration_ms'] or {}).get('p50')):>20}")
+
+def main():
+    if '--compare' in sys.argv:
+        i = sys.argv.index('--compare')
+        compare(sys.argv[i + 1], sys.argv[i + 2])
+        return
+
+    label = sys.argv[sys.argv.index('--label') + 1] if '--label' in sys.argv else 'run'
+    warm_runs = int(sys.argv[sys.argv.index('--warm') + 1]) if '--warm' in sys.argv else 20
+    out_path = sys.argv[sys.argv.index('--out') + 1] if '--out' in sys.argv else f"results_{label}.json"
+
+    results = {}
+    create_fixture()
+    try:
+        for function_name, payload in FUNCTIONS.items():
+            print(f"Benchmarking {function_name}...")
+            try:
+                results[function_name] = benchmark_function(function_name, payload, warm_runs)
+                cold = results[function_name]['cold']
+                print(f"  init {cold['init_ms']} ms, cold {cold['duration_ms']} ms, warm p50 {results[function_name]['warm_duration_ms']['p50']:.1f} ms")
+            except Exception as e:
+                print(f"  Error benchmarking {function_name}: {e}")
+    finally:
+        delete_fixture()
+
+    with open(out_path, 'w') as f:
+        json.dump({'label': label, 'warm_runs': warm_runs, 'results': results}, f, indent=2)
+    print(f"Results saved to {out_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Single-prompt vs map-reduce answering for general chats at 30, 150 and 600 students.
+
+Builds a synthetic roster, then runs both paths through the inference code (get_students_data
+output -> one big system prompt, or map_reduce.run_map + build_reduce_prompt) and reports the
+prompt tokens of the streamed answer call, prompt tokens over all calls, time to the first answer
+token, total latency, answer tokens and whether the answer hit maxTokens (cut: the student list is
+incomplete).
+
+By default Bedrock is simulated: time to first token grows with prompt tokens (prefill) and
+generation runs at a fixed tokens/s per model, sleeps scaled by --time-scale. Latencies are
+reported unscaled. --live calls Bedrock for real and uses the reported usage.
+
+The SIM_MODELS rates are assumptions, not measurements, so the simulated crossover only shows the
+shape of the trade-off. MAP_REDUCE_MIN_STUDENTS (200) is provisional until it is set from --live runs.
+
+usage:
+  python benchmark_map_reduce.py [--sizes 30 150 600] [--time-scale 0.05] [--out map_reduce.json]
+  python benchmark_map_reduce.py --live --sizes 30 150
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'layers', 'aws_clients', 'python'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'inference'))
+os.chdir(os.path.join(SCRIPT_DIR, 'inference'))  # prompt templates are loaded relative to the lambda root
+
+import map_reduce
+from map_reduce import estimate_tokens
+from utils import load_prompt_template
+
+ANSWER_MODEL_ID = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
+BODY = ("Tomorrow we start a two-week unit on persuasive essays. Students read two op-eds, annotate "
+        "the claims and evidence, then draft their own essay in pairs. How should I adapt this?")
+
+DISABILITIES = ['Dyslexia', 'ADHD', 'Autism Spectrum Disorder', 'Anxiety Disorder', 'Dysgraphia',
+                'Speech or Language Impairment', 'Dyscalculia', 'Auditory Processing Disorder',
+                'Emotional Disturbance', 'Visual Impairment', 'Other Health Impairment']
+ACCOMMODATIONS = ['Extended time (1.5x) on assignments and assessments', 'Preferential seating near instruction',
+                  'Text-to-speech for reading passages', 'Graphic organizers for writing tasks',
+                  'Chunk multi-step directions and check for understanding', 'Frequent breaks as needed',
+                  'Access to a quiet testing location', 'Speech-to-text for written responses',
+                  'Printed copy of notes and slides', 'Reduced number of items without changing the standard',
+                  'Visual schedule and advance notice of transitions', 'Use of a calculator and multiplication chart',
+                  'Enlarged print materials (18pt)', 'Check-ins with a trusted adult when overwhelmed']
+FIRST = ['Ava', 'Liam', 'Maya', 'Noah', 'Sofia', 'Ethan', 'Zara', 'Mateo', 'Lena', 'Omar', 'Priya', 'Jonah', 'Iris', 'Kai']
+LAST = ['Garcia', 'Nguyen', 'Smith', 'Okafor', 'Patel', 'Kim', 'Rossi', 'Haddad', 'Silva', 'Cohen', 'Ito', 'Brown']
+
+# simulated models: (seconds to first token before prefill, prompt tokens/s, output tokens/s)
+SIM_MODELS = {
+    ANSWER_MODEL_ID: (0.45, 6000.0, 55.0),
+    map_reduce.MAP_MODEL_ID: (0.25, 15000.0, 110.0),
+}
+
+def make_mapping(n, seed=7):
+    rng = random.Random(seed + n)
+    mapping = {}
+    for i in range(n):
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}"
+        mapping[name] = {
+            "disabilities": rng.sample(DISABILITIES, rng.choice([1, 1, 2])),
+            "accommodations": rng.sample(ACCOMMODATIONS, rng.randint(3, 6)),
+        }
+    return mapping
+
+class SimulatedBedrock:
+    """converse / converse_stream with latency from a prefill + decode model"""
+    def __init__(self, time_scale):
+        self.time_scale = time_scale
+        self.lock = threading.Lock()
+        self.prompt_tokens = 0
+
+    def _timing(self, model_id, prompt_tokens, output_tokens):
+        base, prefill_rate, decode_rate = SIM_MODELS[model_id]
+        with self.lock:
+            self.prompt_tokens += prompt_tokens
+        return base + prompt_tokens / prefill_rate, output_tokens / decode_rate
+
+    def converse(self, modelId, messages, inferenceConfig, system=None):
+        prompt = messages[-1]["content"][0]["text"]
+        students = prompt.count('"disabilities"')
+        notes = "\n".join(f"**Student {i} (Need):**\n- relevant accommodation" for i in range(students))
+        output_tokens = min(inferenceConfig["maxTokens"], 22 * students)
+        ttft, gen = self._timing(modelId, estimate_tokens(prompt), output_tokens)
+        time.sleep((ttft + gen) * self.time_scale)
+        usage = {"inputTokens": estimate_tokens(prompt), "outputTokens": output_tokens}
+        return {"output": {"message": {"content": [{"text": notes}]}}, "usage": usage}
+
+    def converse_stream(self, modelId, messages, system, inferenceConfig):
+        prompt_tokens = estimate_tokens(system[0]["text"]) + sum(estimate_tokens(m["content"][0]["text"]) for m in messages)
+        # the answer lists every student: ~900 tokens of advice plus ~5 per name
+        count = re.search(r"\((\d+) students\)", system[0]["text"])
+        students = int(count.group(1)) if count else system[0]["text"].count('"disabilities"')
+        needed = 900 + 5 * students
+        output_tokens = min(inferenceConfig["maxTokens"], needed)
+        ttft, gen = self._timing(modelId, prompt_tokens, output_tokens)
+        time_scale = self.time_scale
+
+        def events():
+            time.sleep(ttft * time_scale)
+            for _ in range(0, output_tokens, 30):
+                yield {"contentBlockDelta": {"delta": {"text": "word " * 30}}}
+                time.sleep(gen / (output_tokens / 30) * time_scale)
+            yield {"messageStop": {"stopReason": "max_tokens" if needed > output_tokens else "end_turn"}}
+            yield {"metadata": {"usage": {"inputTokens": prompt_tokens, "outputTokens": output_tokens}}}
+        return {"stream": events()}
+
+def stream_answer(client, system_prompt, max_tokens):
+    started = time.perf_counter()
+    response = client.converse_stream(
+        modelId=ANSWER_MODEL_ID,
+        messages=[{"role": "user", "content": [{"text": BODY}]}],
+        system=[{"text": system_prompt}],
+        inferenceConfig={"maxTokens": max_tokens, "temperature": 0.3, "topP": 0.9},
+    )
+    first, usage, stop_reason = None, {}, None
+    for event in response["stream"]:
+        if first is None and "contentBlockDelta" in event:
+            first = time.perf_counter() - started
+        if "messageStop" in event:
+            stop_reason = event["messageStop"].get("stopReason")
+        if "metadata" in event:
+            usage = event["metadata"]["usage"]
+    usage["cut"] = stop_reason == "max_tokens"
+    return first, time.perf_counter() - started, usage
+
+def run_single(client, mapping):
+    started = time.perf_counter()
+    system_prompt = load_prompt_template("prompts/3_7_prompt_all_chat.txt", {"MAPPINGS_JSON": json.dumps(mapping, indent=2)})
+    first, _, usage = stream_answer(client, system_prompt, map_reduce.general_max_tokens(len(mapping)))
+    return {
+        "groups": 0,
+        "answer_prompt_tokens": usage.get("inputTokens", 0),
+        "total_prompt_tokens": usage.get("inputTokens", 0),
+        "answer_tokens": usage.get("outputTokens", 0),
+        "cut": usage["cut"],
+        "first_token_s": first,
+        "total_s": time.perf_counter() - started,
+    }
+
+def run_map_reduce(client, mapping):
+    started = time.perf_counter()
+    map_usage = []
+    notes = map_reduce.run_map(mapping, BODY, bedrock_client=client,
+                               on_usage=lambda response, latency_ms: map_usage.append(response["usage"]))
+    map_s = time.perf_counter() - started
+    system_prompt = map_reduce.build_reduce_prompt(mapping, notes)
+    first, _, usage = stream_answer(client, system_prompt, map_reduce.general_max_tokens(len(mapping)))
+    return {
+        "groups": len(notes),
+        "answer_prompt_tokens": usage.get("inputTokens", 0),
+        "total_prompt_tokens": usage.get("inputTokens", 0) + sum(u.get("inputTokens", 0) for u in map_usage),
+        "answer_tokens": usage.get("outputTokens", 0),
+        "cut": usage["cut"],
+        "map_s": map_s,
+        "first_token_s": map_s + first,
+        "total_s": time.perf_counter() - started,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark map-reduce answering for large general chats")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 150, 600])
+    parser.add_argument("--time-scale", type=float, default=0.05, help="simulated sleeps are multiplied by this")
+    parser.add_argument("--live", action="store_true", help="call Bedrock instead of the simulation")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    if args.live:
+        from aws_clients import get_bedrock_client
+        client, scale = get_bedrock_client(), 1.0
+    else:
+        client, scale = SimulatedBedrock(args.time_scale), args.time_scale
+    print(f"{'live Bedrock' if args.live else 'simulated Bedrock'}, map model {map_reduce.MAP_MODEL_ID}, "
+          f"groups of ~{map_reduce.MAP_GROUP_TOKENS} tokens, {map_reduce.MAP_MAX_WORKERS} concurrent\n")
+    print(f"{'students':>8} {'mode':<11} {'groups':>6} {'answer prompt':>14} {'all prompts':>12} {'first token':>12} {'total':>8} "
+          f"{'answer':>7} {'cut':>4}")
+
+    results = []
+    for n in args.sizes:
+        mapping = make_mapping(n)
+        for mode, run in (("single", run_single), ("map-reduce", run_map_reduce)):
+            row = run(client, mapping)
+            for key in ("map_s", "first_token_s", "total_s"):
+                if key in row:
+                    row[key] = round(row[key] / scale, 2)
+            row.update(students=n, mode=mode)
+            results.append(row)
+            print(f"{n:>8} {mode:<11} {row['groups']:>6} {row['answer_prompt_tokens']:>14} {row['total_prompt_tokens']:>12} "
+                  f"{row['first_token_s']:>11.2f}s {row['total_s']:>7.2f}s {row['answer_tokens']:>7} {'yes' if row['cut'] else 'no':>4}")
+        print(f"{'':>8} auto-switch at {map_reduce.MAP_REDUCE_MIN_STUDENTS} students -> "
+              f"{'map-reduce' if map_reduce.use_map_reduce(mapping) else 'single'}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Backfill the expires_at TTL attribute on chat messages written before it was stored.
+expires_at = created_at + CHAT_RETENTION_DAYS (default 90).
+
+usage: python backfill_ttl.py [--dry-run] [--segments N]
+"""
+
+import os, sys
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr
+
+# run locally: pick up the shared client layer from the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'layers', 'aws_clients', 'python'))
+from chat_archive import chat_table, expires_at_for
+
+def backfill_segment(client, table_name, segment, total_segments, dry_run=False):
+    # runs on a worker thread: boto3 resources aren't thread safe, the client is (and takes plain values)
+    scan_kwargs = {
+        'TableName': table_name,
+        'FilterExpression': Attr('sortId').begins_with('CHAT#') & Attr('expires_at').not_exists(),
+        'ProjectionExpression': 'TeacherId, sortId, created_at',
+        'Segment': segment,
+        'TotalSegments': total_segments,
+    }
+    updated = 0
+    while True:
+        response = client.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            if 'created_at' not in item:
+                continue
+            if not dry_run:
+                client.update_item(
+                    TableName=table_name,
+                    Key={'TeacherId': item['TeacherId'], 'sortId': item['sortId']},
+                    UpdateExpression='SET expires_at = :exp',
+                    ExpressionAttributeValues={':exp': expires_at_for(item['created_at'])}
+                )
+            updated += 1
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+    return updated
+
+def main():
+    dry_run = '--dry-run' in sys.argv or '-d' in sys.argv
+    total_segments = 4
+    if '--segments' in sys.argv:
+        total_segments = int(sys.argv[sys.argv.index('--segments') + 1])
+
+    table = chat_table()
+    mode = "DRY RUN MODE" if dry_run else "LIVE MODE"
+    print(f"Backfilling expires_at on {table.name} with {total_segments} scan segments - {mode}\n")
+
+    with ThreadPoolExecutor(max_workers=total_segments) as pool:
+        counts = list(pool.map(lambda seg: backfill_segment(table.meta.client, table.name, seg, total_segments, dry_run), range(total_segments)))
+
+    action = "Would update" if dry_run else "Updated"
+    print(f"{action} {sum(counts)} messages")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+cold archive for chat history.
+
+conversations older than ARCHIVE_AFTER_DAYS are compacted into one gzipped json blob
+({"conversation": CONV# item, "messages": [...]}) and their CHAT# items are deleted.
+the CONV# item stays in the table with archive_uri/archived_at so it still shows up in the
+conversation list, and rehydrate_conversation puts the messages back when it is opened.
+
+CHAT_ARCHIVE_URI must be an s3://bucket/prefix URI. without it archiving refuses to run (a blob in
+the lambda's /tmp would vanish with the execution environment after its messages were deleted);
+a local directory is only used when given explicitly, e.g. `python chat_archive.py --local-dir DIR`.
+"""
+import argparse, gzip, json, os, time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from boto3.dynamodb.conditions import Key, Attr
+from aws_clients import get_table, get_s3_client
+
+CHAT_HISTORY_TABLE = os.environ.get('CHAT_HISTORY_TABLE', 'k12-coteacher-chat-history')
+CHAT_ARCHIVE_URI = os.environ.get('CHAT_ARCHIVE_URI', '')
+RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS', '90'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', '30'))
+
+def chat_table():
+    return get_table(CHAT_HISTORY_TABLE)
+
+
+def expires_at_for(created_at, retention_days=RETENTION_DAYS):
+    """TTL value (epoch seconds) for an item created at created_at"""
+    return int(created_at) + retention_days * 24 * 60 * 60
+
+
+def _decimal_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# archive stores ==========================
+
+class LocalArchiveStore:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def put(self, key, data):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return str(path)
+
+    def get(self, uri):
+        return Path(uri).read_bytes()
+
+
+class S3ArchiveStore:
+    def __init__(self, bucket, prefix=''):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.s3 = get_s3_client()
+
+    def put(self, key, data):
+        object_key = f"{self.prefix}/{key}" if self.prefix else key
+        self.s3.put_object(Bucket=self.bucket, Key=object_key, Body=data, ContentEncoding='gzip')
+        return f"s3://{self.bucket}/{object_key}"
+
+    def get(self, uri):
+        bucket, _, object_key = uri[len('s3://'):].partition('/')
+        return self.s3.get_object(Bucket=bucket, Key=object_key)['Body'].read()
+
+
+def get_archive_store(uri=None, local_dir=None):
+    """the configured s3 store, or a LocalArchiveStore when local_dir is passed explicitly. never falls back to a local path"""
+    if local_dir:
+        return LocalArchiveStore(local_dir)
+    uri = uri or CHAT_ARCHIVE_URI
+    if not uri.startswith('s3://'):
+        raise ValueError(f"CHAT_ARCHIVE_URI must be an s3:// URI to archive chat history, got {uri!r}")
+    bucket, _, prefix = uri[len('s3://'):].partition('/')
+    return S3ArchiveStore(bucket, prefix)
+
+
+def _store_for(archive_uri):
+    # reading back follows wherever the blob was written
+    if archive_uri.startswith('s3://'):
+        return get_archive_store(archive_uri)
+    return LocalArchiveStore(os.path.dirname(archive_uri))
+
+
+# compaction ==========================
+
+def _query_all(**query_kwargs):
+    while True:
+        response = chat_table().query(**query_kwargs)
+        yield from response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+
+def get_all_chat_messages(user_id, conversation_id):
+    return list(_query_all(
+        KeyConditionExpression=Key('TeacherId').eq(user_id) & Key('sortId').begins_with(f'CHAT#{conversation_id}#MSG')
+    ))
+
+
+def archive_conversation(conversation, store=None):
+    """compacts one conversation into a blob and deletes its message items. returns number of messages archived"""
+    store = store or get_archive_store()
+    user_id = conversation['TeacherId']
+    conversation_id = conversation['conversation_id']
+    messages = get_all_chat_messages(user_id, conversation_id)
+    messages.sort(key=lambda m: int(m['created_at']))
+
+    blob = gzip.compress(json.dumps(
+        {'conversation': conversation, 'messages': messages},
+        default=_decimal_default
+    ).encode('utf-8'))
+    archive_uri = store.put(f"{user_id}/{conversation_id}.json.gz", blob)
+
+    # pointer goes on the CONV# item before anything is deleted, so a crash never loses messages
+    table = chat_table()
+    table.update_item(
+        Key={'TeacherId': user_id, 'sortId': conversation['sortId']},
+        UpdateExpression='SET archive_uri = :uri, archived_at = :now, message_count = :count',
+        ExpressionAttributeValues={
+            ':uri': archive_uri,
+            ':now': int(datetime.utcnow().timestamp()),
+            ':count': len(messages),
+        }
+    )
+    with table.batch_writer() as batch:
+        for message in messages:
+            batch.delete_item(Key={'TeacherId': user_id, 'sortId': message['sortId']})
+    return len(messages)
+
+
+def compact_teacher_history(user_id, older_than_days=ARCHIVE_AFTER_DAYS, store=None):
+    """archives every conversation of a teacher whose newest message is older than older_than_days"""
+    store = store or get_archive_store()
+    cutoff = int((datetime.utcnow() - timedelta(days=older_than_days)).timestamp())
+    archived = 0
+    conversations = _query_all(
+        KeyConditionExpression=Key('TeacherId').eq(user_id) & Key('sortId').begins_with('CONV#'),
+        FilterExpression=Attr('created_at').lt(cutoff) & Attr('archive_uri').not_exists() & Attr('deleted_at').not_exists()
+    )
+    for conversation in conversations:
+        # only the newest message decides, a conversation can be old but still active
+        message_times = _query_all(
+            KeyConditionExpression=Key('TeacherId').eq(user_id) & Key('sortId').begins_with(f"CHAT#{conversation['conversation_id']}#MSG"),
+            ProjectionExpression='created_at',
+        )
+        if any(int(m['created_at']) >= cutoff for m in message_times):
+            continue
+        try:
+            count = archive_conversation(conversation, store)
+            archived += 1
+            print(f"Archived {count} messages from {user_id}/{conversation['conversation_id']}")
+        except Exception as e:
+            print(f"Error archiving conversation {conversation['conversation_id']}: {e}")
+    return archived
+
+
+def get_teacher_ids():
+    """distinct teacher partitions, found through the CONV# items"""
+    scan_kwargs = {
+        'FilterExpression': Attr('sortId').begins_with('CONV#'),
+        'ProjectionExpression': 'TeacherId',
+    }
+    teacher_ids = set()
+    while True:
+        response = chat_table().scan(**scan_kwargs)
+        teacher_ids.update(item['TeacherId'] for item in response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+    return sorted(teacher_ids)
+
+
+# rehydrate ==========================
+
+def read_archive(conversation, store=None):
+    """the archived messages of a CONV# item with an archive_uri, oldest to newest. reads only"""
+    store = store or _store_for(conversation['archive_uri'])
+    return json.loads(gzip.decompress(store.get(conversation['archive_uri'])), parse_float=Decimal)['messages']
+
+
+def rehydrate_conversation(user_id, conversation_id, store=None, conversation=None):
+    """
+    restores an archived conversation's messages into the table (with a fresh TTL) and clears the archive pointer.
+    returns the restored messages oldest to newest, or None if the conversation isn't archived.
+    pass the CONV# item as conversation when it was just read
+    """
+    table = chat_table()
+    conv_key = {'TeacherId': user_id, 'sortId': f'CONV#{conversation_id}'}
+    if conversation is None:
+        conversation = table.get_item(Key=conv_key).get('Item')
+    if not conversation or 'archive_uri' not in conversation:
+        return None
+
+    messages = read_archive(conversation, store)
+    now = int(time.time())
+    with table.batch_writer() as batch:
+        for message in messages:
+            message['expires_at'] = expires_at_for(now)
+            batch.put_item(Item=message)
+    table.update_item(
+        Key=conv_key,
+        UpdateExpression='REMOVE archive_uri, archived_at, message_count'
+    )
+    return messages
+
+
+if __name__ == "__main__":
+    # by hand: python chat_archive.py --teacher-id T [--older-than-days 30] [--local-dir ./chat-archive]
+    parser = argparse.ArgumentParser(description="Archive idle conversations to cold storage")
+    parser.add_argument("--teacher-id", help="only this teacher (default: every teacher)")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--local-dir", help="write archives to this directory instead of CHAT_ARCHIVE_URI")
+    args = parser.parse_args()
+    store = get_archive_store(local_dir=args.local_dir)
+    for tid in [args.teacher_id] if args.teacher_id else get_teacher_ids():
+        compact_teacher_history(tid, older_than_days=args.older_than_days, store=store)
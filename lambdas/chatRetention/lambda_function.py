@@ -0,0 +1,20 @@
+import json
+from chat_archive import ARCHIVE_AFTER_DAYS, compact_teacher_history, get_archive_store, get_teacher_ids
+
+# invoked on a schedule (EventBridge) or with {"teacherId": "..."} to compact one teacher
+def lambda_handler(event, context):
+    teacher_id = event.get('teacherId')
+    older_than_days = int(event.get('olderThanDays', ARCHIVE_AFTER_DAYS))
+    teacher_ids = [teacher_id] if teacher_id else get_teacher_ids()
+
+    # raises before anything is archived when CHAT_ARCHIVE_URI isn't an s3:// URI
+    store = get_archive_store()
+    archived = 0
+    for tid in teacher_ids:
+        archived += compact_teacher_history(tid, older_than_days=older_than_days, store=store)
+
+    print(f"Archived {archived} conversations across {len(teacher_ids)} teachers")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'archived': archived, 'teachers': len(teacher_ids)})
+    }
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Reproducible cold-start report for the inference Lambda.
+
+Each run starts a fresh interpreter with `python -X importtime`, imports lambda_function the way the
+Lambda runtime does, then times a $connect call and the first-message setup (helper imports + client
+construction, no network calls). Runs with and without PREWARM_ON_INIT, prints the median of N runs
+and the import-time tree, and can fail against a saved baseline to catch regressions.
+
+usage:
+  python cold_start_report.py [--runs 5] [--depth 3] [--out cold_start.json]
+  python cold_start_report.py --baseline cold_start.json [--tolerance 20]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INFERENCE_DIR = os.path.join(SCRIPT_DIR, 'inference')
+LAYER_DIR = os.path.join(SCRIPT_DIR, 'layers', 'aws_clients', 'python')
+
+# runs inside the child interpreter, prints one json line with the timings
+PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import lambda_function
+t1 = time.perf_counter()
+lambda_function.lambda_handler({"requestContext": {"routeKey": "$connect"}}, None)
+t2 = time.perf_counter()
+from conversation_history import chat_table
+from utils import get_http
+from aws_clients import get_bedrock_client, get_apigw_client
+chat_table(); get_bedrock_client(); get_http(); get_apigw_client("https://example.execute-api.us-west-2.amazonaws.com/dev")
+t3 = time.perf_counter()
+print(json.dumps({"init_ms": (t1 - t0) * 1000, "connect_ms": (t2 - t1) * 1000, "first_message_setup_ms": (t3 - t2) * 1000}))
+'''
+
+def child_env(prewarm):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': LAYER_DIR,
+        'PYTHONDONTWRITEBYTECODE': '1',
+        'AWS_DEFAULT_REGION': 'us-west-2',
+        'AWS_ACCESS_KEY_ID': 'cold-start-report',
+        'AWS_SECRET_ACCESS_KEY': 'cold-start-report',
+        'AWS_EC2_METADATA_DISABLED': 'true',
+        'PREWARM_ON_INIT': '1' if prewarm else '0',
+    })
+    return env
+
+def run_once(prewarm):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=INFERENCE_DIR, env=child_env(prewarm), capture_output=True, text=True, check=True
+    )
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    return timings, parse_importtime(proc.stderr)
+
+def parse_importtime(stderr):
+    """turns -X importtime output into a tree of {name, self_us, cumulative_us, children}"""
+    root = {'name': '<root>', 'self_us': 0, 'cumulative_us': 0, 'children': []}
+    pending = []  # (depth, node) of finished imports waiting for their parent
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        node = {'name': name.strip(), 'self_us': int(self_us), 'cumulative_us': int(cumulative_us), 'children': []}
+        # children are printed before their parent, one indent level deeper
+        while pending and pending[-1][0] > depth:
+            node['children'].insert(0, pending.pop()[1])
+        pending.append((depth, node))
+    root['children'] = [node for _, node in pending]
+    root['cumulative_us'] = sum(c['cumulative_us'] for c in root['children'])
+    return root
+
+def print_tree(node, max_depth, min_us=1000, depth=0, indent='    '):
+    for child in sorted(node['children'], key=lambda c: -c['cumulative_us']):
+        if child['cumulative_us'] < min_us:
+            continue
+        print(f"{indent}{child['cumulative_us'] / 1000:8.1f} ms  {'  ' * depth}{child['name']}")
+        if depth + 1 < max_depth:
+            print_tree(child, max_depth, min_us, depth + 1, indent)
+
+def median_timings(runs):
+    return {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+def main():
+    runs = int(sys.argv[sys.argv.index('--runs') + 1]) if '--runs' in sys.argv else 5
+    depth = int(sys.argv[sys.argv.index('--depth') + 1]) if '--depth' in sys.argv else 3
+    out_path = sys.argv[sys.argv.index('--out') + 1] if '--out' in sys.argv else None
+    baseline_path = sys.argv[sys.argv.index('--baseline') + 1] if '--baseline' in sys.argv else None
+    tolerance = float(sys.argv[sys.argv.index('--tolerance') + 1]) if '--tolerance' in sys.argv else 20.0
+
+    report = {'python': sys.version.split()[0], 'runs': runs, 'scenarios': {}}
+    for scenario, prewarm in (('lazy', False), ('prewarm', True)):
+        results = [run_once(prewarm) for _ in range(runs)]
+        timings = median_timings([t for t, _ in results])
+        tree = results[-1][1]
+        report['scenarios'][scenario] = {
+            'timings_ms': timings,
+            'top_imports': [
+                {'name': c['name'], 'cumulative_ms': c['cumulative_us'] / 1000}
+                for c in sorted(tree['children'], key=lambda c: -c['cumulative_us'])[:15]
+            ],
+        }
+        print(f"=== {scenario} (PREWARM_ON_INIT={'1' if prewarm else '0'}), median of {runs} runs")
+        for key, value in timings.items():
+            print(f"  {key:<24}{value:8.1f} ms")
+        print("  import tree (cumulative):")
+        print_tree(tree, depth)
+        print()
+
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {out_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for scenario, data in report['scenarios'].items():
+            for key, value in data['timings_ms'].items():
+                before = baseline['scenarios'].get(scenario, {}).get('timings_ms', {}).get(key)
+                if before and value > before * (1 + tolerance / 100):
+                    regressions.append(f"{scenario}.{key}: {before:.1f} -> {value:.1f} ms")
+        if regressions:
+            print("Cold start regressions:")
+            for r in regressions:
+                print(f"  {r}")
+            sys.exit(1)
+        print(f"No regressions beyond {tolerance:.0f}% of baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import json
-import boto3
+import os
+import time
+from decimal import Decimal
+from aws_clients import get_table, get_sqs_client
+
+# every comment queues a delayed briefing request for the studentBriefing lambda, which only
+# regenerates for the last comment of a burst (the others are no longer the latest when they come due)
+BRIEFING_QUEUE_URL = os.environ.get('BRIEFING_QUEUE_URL', '')
+BRIEFING_DEBOUNCE_SECONDS = min(900, int(os.environ.get('BRIEFING_DEBOUNCE_SECONDS', '30')))  # sqs max delay
 
 def lambda_handler(event, context):
-    dynamo = boto3.resource('dynamodb')
-    table = dynamo.Table('k12-coteacher-student-profiles')
+    table = get_table('k12-coteacher-student-profiles')
     studentID = event['studentID']
     teacherID = event['teacherID']
     comment = event['teacherComment']
@@ -20,14 +27,30 @@ def lambda_handler(event, context):
         else:
             comments[teacherID] = [comment]
 
+        requested_at = round(time.time(), 3)
+        briefing_requests = item.get('briefing_requests', {})
+        briefing_requests[teacherID] = Decimal(str(requested_at))
+
         table.update_item(
             Key={'studentID': studentID},
-            UpdateExpression='SET teacherComments = :updated',
+            UpdateExpression='SET teacherComments = :updated, briefing_requests = :requests',
             ExpressionAttributeValues={
-                ':updated': comments
+                ':updated': comments,
+                ':requests': briefing_requests
             }
         )
 
+        # the comment is saved either way, a missed regeneration only leaves the briefing a comment behind
+        if BRIEFING_QUEUE_URL:
+            try:
+                get_sqs_client().send_message(
+                    QueueUrl=BRIEFING_QUEUE_URL,
+                    MessageBody=json.dumps({'studentID': studentID, 'teacherID': teacherID, 'requestedAt': requested_at}),
+                    DelaySeconds=BRIEFING_DEBOUNCE_SECONDS
+                )
+            except Exception as e:
+                print(f"Error requesting briefing regeneration: {e}")
+
         return {
             'statusCode': 200,
             'body': json.dumps(f"Comment added for teacher {teacherID}.")
@@ -1,11 +1,11 @@
 import json
-import boto3
 from boto3.dynamodb.conditions import Key
+from aws_clients import get_table
+from chat_archive import rehydrate_conversation
 
 def lambda_handler(event, context):
     # config
-    dynamo = boto3.resource('dynamodb')
-    table = dynamo.Table('k12-coteacher-chat-history')
+    table = get_table('k12-coteacher-chat-history')
     teacher_id = event['teacherId']
     conversation_id = event.get('conversationId')
     class_id = event.get('classId')
@@ -18,6 +18,14 @@ def lambda_handler(event, context):
             ScanIndexForward=True # oldest to newest
         )
         items = response.get('Items', [])
+        # an archived conversation can still have live messages (written during or after archiving),
+        # so restore from cold storage whenever the pointer is set and merge both
+        conversation = table.get_item(Key={'TeacherId': teacher_id, 'sortId': f'CONV#{conversation_id}'}).get('Item')
+        if conversation and 'archive_uri' in conversation:
+            restored = rehydrate_conversation(teacher_id, conversation_id, conversation=conversation) or []
+            merged = {item['sortId']: item for item in restored}
+            merged.update({item['sortId']: item for item in items})
+            items = sorted(merged.values(), key=lambda m: int(m.get('created_at', 0)))
         return items
     
     # flow 2 : teacherID -> all of the teacher's convos
@@ -25,7 +33,8 @@ def lambda_handler(event, context):
         response = table.query(
             KeyConditionExpression=Key('TeacherId').eq(teacher_id) &
                                    Key('sortId').begins_with('CONV#'),
-            FilterExpression='class_id = :class_id',
+            # skip conversations tombstoned for async deletion
+            FilterExpression='class_id = :class_id AND attribute_not_exists(deleted_at)',
             ExpressionAttributeValues={':class_id': class_id},
             ScanIndexForward=True # oldest to newest
         )
@@ -1,10 +1,9 @@
 import json
-import boto3
 from botocore.exceptions import ClientError
+from aws_clients import get_table
 
-dynamodb = boto3.resource('dynamodb')
-classes_for_teacher_table = dynamodb.Table('k12-coteacher-teachers-to-classes')
-class_attributes_table = dynamodb.Table('k12-coteacher-class-attributes')
+classes_for_teacher_table = get_table('k12-coteacher-teachers-to-classes')
+class_attributes_table = get_table('k12-coteacher-class-attributes')
 
 def lambda_handler(event, context):
     try:
@@ -1,10 +1,9 @@
 import json
-import boto3
+from aws_clients import get_table
 
 def lambda_handler(event, context):
     studentID = event['studentID']
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table('k12-coteacher-student-profiles')
+    table = get_table('k12-coteacher-student-profiles')
     response = table.get_item(Key={'studentID': studentID})
     return {
         'statusCode': 200,
@@ -1,10 +1,9 @@
 import json
-import boto3
+from aws_clients import get_table
 
 def lambda_handler(event, context):
     classID = event['classID']
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table('k12-coteacher-class-to-students')
+    table = get_table('k12-coteacher-class-to-students')
     students = table.get_item(Key={'classID': classID})['Item']['students']
     return {
         'statusCode': 200,
@@ -0,0 +1,469 @@
+"""
+per-teacher full-text index over chat messages, kept in its own table (pk TeacherId, sk sortId).
+
+  META                      next_docno / total_tokens (atomic ADD), compacted_through, lease
+  DOC#<docno>               one per message: conversation, message key, length, term -> tf
+  TERM#<term>#<first docno> a posting segment: the term's (docno, tf, length norm) entries for one
+                            compaction batch, delta + varint encoded into a single binary attribute
+
+create_chat_message calls index_message(), which only bumps the counter and writes the DOC item,
+so the chat path pays two small writes. compact_index() later folds every pending DOC into new
+TERM segments (writes only, no read-modify-write) once SEARCH_COMPACT_EVERY messages are waiting.
+search() reads the segments of each query term plus the still pending DOC items, ranks with BM25
+and resolves one page of hits against the chat history for snippets and titles.
+
+messages that expired or were deleted keep their postings until the index is rebuilt
+(searchChatHistory/backfill_index.py --rebuild); search() skips them when resolving a page.
+messages of conversations archived by chatRetention keep their postings too and are resolved
+from the archive (chat_archive.py has to be deployed next to this module for search).
+"""
+import math, os, re, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+from aws_clients import get_table, get_dynamo_resource
+
+SEARCH_INDEX_TABLE = os.environ.get('SEARCH_INDEX_TABLE', 'k12-coteacher-chat-search')
+SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', '1') == '1'
+CHAT_HISTORY_TABLE = os.environ.get('CHAT_HISTORY_TABLE', 'k12-coteacher-chat-history')
+RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS', '90'))
+# pending messages before compaction writes them out as posting segments
+SEARCH_COMPACT_EVERY = int(os.environ.get('SEARCH_COMPACT_EVERY', '128'))
+# messages per segment when (re)building an index in bulk
+BULK_SEGMENT_DOCS = 4096
+COMPACT_LEASE_SECONDS = 300
+BM25_K1, BM25_B = 1.2, 0.75
+SNIPPET_CHARS = 180
+
+STOPWORDS = set("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how i
+if in into is it its itself just me more most my no nor not of off on once only or other our ours out over own same she
+should so some such than that the their theirs them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours also like im ive dont
+""".split())
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """lowercased words without stopwords, plurals folded (accommodations -> accommodation)"""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+# posting encoding ==========================
+
+def _norm_byte(length):
+    # doc length squeezed into one byte (log scale), plenty for bm25 length normalisation
+    return min(255, int(round(math.log2(1 + length) * 16)))
+
+
+def _norm_length(byte):
+    return 2 ** (byte / 16) - 1
+
+
+def encode_postings(entries, base):
+    """[(docno, tf, norm)] sorted by docno -> bytes of varint(docno gap), tf byte, norm byte"""
+    out = bytearray()
+    prev = base
+    for docno, tf, norm in entries:
+        gap = docno - prev
+        prev = docno
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+        out.append(min(tf, 255))
+        out.append(norm)
+    return bytes(out)
+
+
+def decode_postings(data, base):
+    entries = []
+    prev, i, n = base, 0, len(data)
+    while i < n:
+        gap, shift = 0, 0
+        while True:
+            b = data[i]
+            i += 1
+            gap |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        prev += gap
+        entries.append((prev, data[i], data[i + 1]))
+        i += 2
+    return entries
+
+
+# writing ==========================
+
+def index_table():
+    return get_table(SEARCH_INDEX_TABLE)
+
+
+def _doc_key(docno):
+    return f'DOC#{docno:010d}'
+
+
+def _doc_item(user_id, docno, conversation_id, message_item, terms):
+    return {
+        'TeacherId': user_id,
+        'sortId': _doc_key(docno),
+        'conversation_id': conversation_id,
+        'message_key': message_item['sortId'],
+        'created_at': message_item.get('created_at', 0),
+        'sender': message_item.get('sender', ''),
+        'length': sum(terms.values()),
+        'terms': dict(terms),
+        'expires_at': message_item.get('expires_at') or int((datetime.utcnow() + timedelta(days=RETENTION_DAYS)).timestamp()),
+    }
+
+
+def index_message(user_id, conversation_id, message_item):
+    """adds one chat message (as written by create_chat_message) to the teacher's pending docs"""
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    terms = Counter(tokenize(message_item.get('message', '')))
+    if not terms:
+        return None
+    table = index_table()
+    meta = table.update_item(
+        Key={'TeacherId': user_id, 'sortId': 'META'},
+        UpdateExpression='ADD next_docno :one, total_tokens :len',
+        ExpressionAttributeValues={':one': 1, ':len': sum(terms.values())},
+        ReturnValues='UPDATED_NEW',
+    )['Attributes']
+    docno = int(meta['next_docno'])
+    table.put_item(Item=_doc_item(user_id, docno, conversation_id, message_item, terms))
+    return docno
+
+
+def _write_segments(user_id, docs):
+    """docs: [(docno, {term: tf}, length)] sorted by docno -> one TERM segment per term"""
+    if not docs:
+        return 0
+    base = docs[0][0]
+    postings = {}
+    for docno, terms, length in docs:
+        norm = _norm_byte(length)
+        for term, tf in terms.items():
+            postings.setdefault(term, []).append((docno, int(tf), norm))
+    # the segment key is the batch's first docno, so rewriting a batch after a crash is idempotent
+    with index_table().batch_writer(overwrite_by_pkeys=['TeacherId', 'sortId']) as batch:
+        for term, entries in postings.items():
+            batch.put_item(Item={
+                'TeacherId': user_id,
+                'sortId': f'TERM#{term}#{base:010d}',
+                'postings': Binary(encode_postings(entries, base)),
+                'df': len(entries),
+                'last_docno': entries[-1][0],
+            })
+    return len(postings)
+
+
+def _take_lease(table, user_id):
+    now = int(time.time())
+    try:
+        table.update_item(
+            Key={'TeacherId': user_id, 'sortId': 'META'},
+            UpdateExpression='SET lease_until = :until',
+            ConditionExpression='attribute_exists(next_docno) AND (attribute_not_exists(lease_until) OR lease_until < :now)',
+            ExpressionAttributeValues={':until': now + COMPACT_LEASE_SECONDS, ':now': now},
+        )
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def _pending_docs(table, user_id, after_docno):
+    kwargs = {
+        'KeyConditionExpression': Key('TeacherId').eq(user_id) & Key('sortId').between(_doc_key(after_docno + 1), 'DOC#9999999999'),
+        'ConsistentRead': True,
+    }
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items += response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def compact_index(user_id, force=False):
+    """
+    writes pending DOCs out as posting segments. one compactor per teacher at a time (lease on META).
+    returns the number of messages compacted
+    """
+    table = index_table()
+    meta = table.get_item(Key={'TeacherId': user_id, 'sortId': 'META'}, ConsistentRead=True).get('Item')
+    if not meta:
+        return 0
+    done = int(meta.get('compacted_through', 0))
+    if not force and int(meta['next_docno']) - done < SEARCH_COMPACT_EVERY:
+        return 0
+    if not _take_lease(table, user_id):
+        return 0
+    docs, written = [], False
+    try:
+        items = _pending_docs(table, user_id, done)
+        # stop at a gap: that docno was handed out but its DOC write hasn't landed yet. a gap older
+        # than a minute is a write that never will, skip it
+        docs, expected = [], done + 1
+        for item in items:
+            docno = int(item['sortId'][4:])
+            if docno != expected and time.time() - int(item.get('created_at', 0)) < 60:
+                break
+            docs.append((docno, item['terms'], int(item['length'])))
+            expected = docno + 1
+        if docs:
+            _write_segments(user_id, docs)
+            written = True
+    finally:
+        update = {
+            'Key': {'TeacherId': user_id, 'sortId': 'META'},
+            'UpdateExpression': 'REMOVE lease_until',
+        }
+        if written:
+            update['UpdateExpression'] = 'SET compacted_through = :through REMOVE lease_until'
+            update['ExpressionAttributeValues'] = {':through': docs[-1][0]}
+        table.update_item(**update)
+    return len(docs)
+
+
+def indexed_message_keys(user_id):
+    """message sortIds that already have a DOC item"""
+    table = index_table()
+    kwargs = {
+        'KeyConditionExpression': Key('TeacherId').eq(user_id) & Key('sortId').begins_with('DOC#'),
+        'ProjectionExpression': 'message_key',
+    }
+    keys = set()
+    while True:
+        response = table.query(**kwargs)
+        keys.update(item['message_key'] for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return keys
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def bulk_index(user_id, messages, segment_docs=BULK_SEGMENT_DOCS):
+    """
+    indexes many (conversation_id, message_item) pairs at once, for backfills and benchmarks.
+    docnos are reserved in one ADD and segments are written straight from memory
+    """
+    table = index_table()
+    prepared = [(conversation_id, item, Counter(tokenize(item.get('message', '')))) for conversation_id, item in messages]
+    prepared = [p for p in prepared if p[2]]
+    if not prepared:
+        return 0
+    # fold the chat path's pending docs first: compacted_through can only move past our batch
+    # if nothing below it is still pending
+    compact_index(user_id, force=True)
+    meta = table.update_item(
+        Key={'TeacherId': user_id, 'sortId': 'META'},
+        UpdateExpression='ADD next_docno :n, total_tokens :len',
+        ExpressionAttributeValues={':n': len(prepared), ':len': sum(sum(t.values()) for _, _, t in prepared)},
+        ReturnValues='UPDATED_NEW',
+    )['Attributes']
+    first = int(meta['next_docno']) - len(prepared) + 1
+    docs = []
+    with table.batch_writer() as batch:
+        for docno, (conversation_id, item, terms) in enumerate(prepared, first):
+            batch.put_item(Item=_doc_item(user_id, docno, conversation_id, item, terms))
+            docs.append((docno, terms, sum(terms.values())))
+    for i in range(0, len(docs), segment_docs):
+        _write_segments(user_id, docs[i:i + segment_docs])
+    update = {
+        'Key': {'TeacherId': user_id, 'sortId': 'META'},
+        'UpdateExpression': 'SET compacted_through = :through',
+        'ConditionExpression': 'compacted_through = :before',
+        'ExpressionAttributeValues': {':through': docs[-1][0], ':before': first - 1},
+    }
+    if first == 1:
+        update['ConditionExpression'] = 'attribute_not_exists(compacted_through)'
+        del update['ExpressionAttributeValues'][':before']
+    try:
+        table.update_item(**update)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        # chat-path docs below the batch are still pending (a compaction lease or an in-flight
+        # write). our docs stay pending too, the next compaction folds them in again; search
+        # keeps one entry per doc, so the extra postings don't change the ranking
+        print(f"Bulk index for {user_id}: docs before {first} still pending, left {len(docs)} docs to compaction")
+    return len(docs)
+
+
+def drop_index(user_id):
+    """deletes everything indexed for a teacher"""
+    table = index_table()
+    kwargs = {'KeyConditionExpression': Key('TeacherId').eq(user_id), 'ProjectionExpression': 'TeacherId, sortId'}
+    deleted = 0
+    with table.batch_writer() as batch:
+        while True:
+            response = table.query(**kwargs)
+            for key in response['Items']:
+                batch.delete_item(Key=key)
+                deleted += 1
+            if 'LastEvaluatedKey' not in response:
+                return deleted
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+# searching ==========================
+
+def _term_segments(client, table_name, user_id, term):
+    # the resource's client: it runs in worker threads, table resources aren't thread safe
+    kwargs = {
+        'TableName': table_name,
+        'KeyConditionExpression': 'TeacherId = :t AND begins_with(sortId, :p)',
+        'ExpressionAttributeValues': {':t': user_id, ':p': f'TERM#{term}#'},
+        'ProjectionExpression': 'sortId, postings',
+    }
+    entries = []
+    while True:
+        response = client.query(**kwargs)
+        for item in response['Items']:
+            entries += decode_postings(bytes(item['postings']), int(item['sortId'].rsplit('#', 1)[1]))
+        if 'LastEvaluatedKey' not in response:
+            return entries
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def rank(user_id, terms):
+    """[(score, docno)] best first, plus the pending DOC items by docno (already fetched, reused for the page)"""
+    table = index_table()
+    client = table.meta.client
+    with ThreadPoolExecutor(max_workers=len(terms)) as pool:
+        futures = [pool.submit(_term_segments, client, table.name, user_id, t) for t in terms]
+        meta = table.get_item(Key={'TeacherId': user_id, 'sortId': 'META'}).get('Item')
+        if meta:
+            pending = {int(item['sortId'][4:]): item for item in _pending_docs(table, user_id, int(meta.get('compacted_through', 0)))}
+        postings = dict(zip(terms, (f.result() for f in futures)))
+    if not meta:
+        return [], {}
+    # a compaction finishing mid-query can put a pending doc in a segment too, keep one entry per doc
+    postings = {term: {docno: (tf, norm) for docno, tf, norm in entries} for term, entries in postings.items()}
+    for docno, item in pending.items():
+        for term in terms:
+            if term in item['terms']:
+                postings[term][docno] = (int(item['terms'][term]), _norm_byte(int(item['length'])))
+
+    n_docs = max(1, int(meta['next_docno']))
+    avg_len = max(1.0, float(meta.get('total_tokens', 1)) / n_docs)
+    scores = {}
+    for term, entries in postings.items():
+        idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+        for docno, (tf, norm) in entries.items():
+            length = _norm_length(norm)
+            scores[docno] = scores.get(docno, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+    ranked = sorted(((score, docno) for docno, score in scores.items()), reverse=True)
+    return ranked, pending
+
+
+def _batch_get(table_name, keys, projection=None):
+    """BatchGetItem over any number of keys, unprocessed keys retried. returns items keyed by sortId"""
+    client = get_dynamo_resource().meta.client
+    found = {}
+    for i in range(0, len(keys), 100):
+        request = {table_name: {'Keys': keys[i:i + 100]}}
+        if projection:
+            request[table_name]['ProjectionExpression'] = projection
+        for attempt in range(6):
+            response = client.batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(table_name, []):
+                found[item['sortId']] = item
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                break
+            time.sleep(0.05 * 2 ** attempt)
+    return found
+
+
+def make_snippet(text, terms):
+    """~SNIPPET_CHARS around the first match of the query's rarest matched term, matches in **bold**"""
+    lowered = text.lower()
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+    positions = [m.start() for m in pattern.finditer(lowered)]
+    center = positions[0] if positions else 0
+    start = max(0, center - SNIPPET_CHARS // 3)
+    if start:
+        start = lowered.find(' ', start) + 1 or start
+    end = min(len(text), start + SNIPPET_CHARS)
+    if end < len(text):
+        end = text.rfind(' ', start, end) if text.rfind(' ', start, end) > start else end
+    snippet = " ".join(text[start:end].split())
+    snippet = pattern.sub(lambda m: f"**{m.group(0)}**", snippet)
+    return ("..." if start else "") + snippet + ("..." if end < len(text) else "")
+
+
+def _archived_messages(conversation, archived):
+    """{sortId: message} of an archived conversation, read from cold storage once per search"""
+    conversation_id = conversation['conversation_id']
+    if conversation_id not in archived:
+        try:
+            from chat_archive import read_archive
+            archived[conversation_id] = {m['sortId']: m for m in read_archive(conversation)}
+        except Exception as e:
+            print(f"Error reading archive {conversation.get('archive_uri')}: {e}")
+            archived[conversation_id] = {}
+    return archived[conversation_id]
+
+
+def search(user_id, query, page_size=10, offset=0):
+    """
+    ranked (conversation, message) hits for a query. returns {'hits', 'nextOffset', 'total'};
+    nextOffset is None on the last page. total counts ranked candidates, hits on expired or deleted
+    messages are skipped while filling the page, hits in archived conversations are read from the archive
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return {'hits': [], 'nextOffset': None, 'total': 0}
+    ranked, pending = rank(user_id, terms)
+    index_name = index_table().name
+
+    hits, position, archived = [], offset, {}
+    while len(hits) < page_size and position < len(ranked):
+        chunk = ranked[position:position + page_size * 2]
+        docnos = [docno for _, docno in chunk]
+        missing = [{'TeacherId': user_id, 'sortId': _doc_key(d)} for d in docnos if d not in pending]
+        docs = {int(k[4:]): v for k, v in _batch_get(index_name, missing, 'sortId, conversation_id, message_key, created_at, sender').items()}
+        docs.update({d: pending[d] for d in docnos if d in pending})
+
+        keys = {doc['message_key'] for doc in docs.values()} | {f"CONV#{doc['conversation_id']}" for doc in docs.values()}
+        history = _batch_get(CHAT_HISTORY_TABLE, [{'TeacherId': user_id, 'sortId': k} for k in keys])
+
+        for score, docno in chunk:
+            position += 1
+            doc = docs.get(docno)
+            message = doc and history.get(doc['message_key'])
+            conversation = doc and history.get(f"CONV#{doc['conversation_id']}")
+            if not message and conversation and conversation.get('archive_uri'):
+                message = _archived_messages(conversation, archived).get(doc['message_key'])
+            if not message or not conversation or conversation.get('deleted_at'):
+                continue
+            hits.append({
+                'conversationId': doc['conversation_id'],
+                'title': conversation.get('title', ''),
+                'classId': conversation.get('class_id', ''),
+                'messageId': doc['message_key'],
+                'sender': message.get('sender', ''),
+                'createdAt': int(message.get('created_at', 0)),
+                'score': round(score, 4),
+                'snippet': make_snippet(message.get('message', ''), terms),
+            })
+            if len(hits) == page_size:
+                break
+    return {'hits': hits, 'nextOffset': position if position < len(ranked) else None, 'total': len(ranked)}
@@ -1,12 +1,22 @@
-import boto3, uuid
+import os, uuid, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
 
-dynamo = boto3.resource('dynamodb')
-table = dynamo.Table('k12-coteacher-chat-history')
+from aws_clients import get_table
+from chat_search_index import index_message
+
+# table handle is created on first use so importing this module stays cheap on cold start
+CHAT_HISTORY_TABLE = os.environ.get('CHAT_HISTORY_TABLE', 'k12-coteacher-chat-history')
+# messages expire through the table's TTL on expires_at, see chatRetention for archiving
+RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS', '90'))
+
+def chat_table():
+    return get_table(CHAT_HISTORY_TABLE)
 
 # conversation history
 def create_conversation(user_id, conversation_attributes):
+    table = chat_table()
     created_at = int(datetime.utcnow().timestamp())
     conversation_id = conversation_attributes['conversation_id']
     item = {
@@ -23,13 +33,14 @@ def create_conversation(user_id, conversation_attributes):
     return item
 
 def create_chat_message(user_id, conversation_id, message, sender):
+    table = chat_table()
     # Generate a ULID for the message
     # message_ulid = str(ulid.new())
     # changing this for now..
     message_ulid = str(uuid.uuid4())
    
     created_at = int(datetime.utcnow().timestamp())
-    expires_at = int((datetime.utcnow() + timedelta(days=90)).timestamp())
+    expires_at = int((datetime.utcnow() + timedelta(days=RETENTION_DAYS)).timestamp())
    
     item = {
         'TeacherId': user_id,
@@ -37,12 +48,19 @@ def create_chat_message(user_id, conversation_id, message, sender):
         'created_at': created_at,
         'message': message,
         'sender': sender,
+        'expires_at': expires_at,
     }
    
     table.put_item(Item=item)
+    # search indexing is best effort, a failure here must not lose the chat turn
+    try:
+        index_message(user_id, conversation_id, item)
+    except Exception as e:
+        print(f"Error indexing message for search: {e}")
     return item
 
 def update_conversation_title(user_id, conversation_id, new_title):
+    table = chat_table()
     response = table.update_item(
         Key={
             'TeacherId': user_id,
@@ -59,7 +77,16 @@ def update_conversation_title(user_id, conversation_id, new_title):
     )
     return response
 
+def get_conversation_title(user_id, conversation_id):
+    table = chat_table()
+    response = table.get_item(
+        Key={'TeacherId': user_id, 'sortId': f'CONV#{conversation_id}'},
+        ProjectionExpression='title'
+    )
+    return response.get('Item', {}).get('title', '')
+
 def get_chat_messages(user_id, conversation_id):
+    table = chat_table()
     sort_key_prefix = f'CHAT#{conversation_id}#MSG'
    
     response = table.query(
@@ -68,23 +95,109 @@ def get_chat_messages(user_id, conversation_id):
     items = response.get('Items', [])
     return items
 
-def delete_conversation(user_id, conversation_id):
-    # Get all message items related to the conversation
-    message_items = get_chat_messages(user_id, conversation_id)
-   
-    with table.batch_writer() as batch:
-        # Delete the metadata item
-        batch.delete_item(
-            Key={
-                'TeacherId': user_id,
-                'sortId': f'CONV#{conversation_id}'
-            }
+# deleting conversations ==========================
+# batch_write_item takes at most 25 requests per call
+BATCH_WRITE_LIMIT = 25
+DELETE_WORKERS = 8
+
+def get_chat_message_keys(user_id, conversation_id):
+    """yields pages of message keys for a conversation, following LastEvaluatedKey past the 1 MB query limit"""
+    table = chat_table()
+    sort_key_prefix = f'CHAT#{conversation_id}#MSG'
+    query_kwargs = {
+        'KeyConditionExpression': Key('TeacherId').eq(user_id) & Key('sortId').begins_with(sort_key_prefix),
+        'ProjectionExpression': 'TeacherId, sortId',
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        items = response.get('Items', [])
+        if items:
+            yield items
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def _delete_key_batch(keys, max_retries=8):
+    table = chat_table()
+    # low level client is thread safe, table resources/batch_writers are not
+    client = table.meta.client
+    requests = [
+        {'DeleteRequest': {'Key': {'TeacherId': k['TeacherId'], 'sortId': k['sortId']}}}
+        for k in keys
+    ]
+    attempt = 0
+    while requests:
+        response = client.batch_write_item(RequestItems={table.name: requests})
+        requests = response.get('UnprocessedItems', {}).get(table.name, [])
+        if requests:
+            attempt += 1
+            if attempt > max_retries:
+                raise RuntimeError(f"{len(requests)} deletes still unprocessed after {max_retries} retries")
+            time.sleep(min(0.05 * (2 ** attempt), 2))
+    return len(keys)
+
+def delete_chat_messages(user_id, conversation_id, max_workers=DELETE_WORKERS):
+    """deletes every message in a conversation, fanning 25-key batches out across worker threads"""
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for page in get_chat_message_keys(user_id, conversation_id):
+            for i in range(0, len(page), BATCH_WRITE_LIMIT):
+                futures.append(pool.submit(_delete_key_batch, page[i:i + BATCH_WRITE_LIMIT]))
+        for future in as_completed(futures):
+            deleted += future.result()
+    return deleted
+
+def delete_conversation(user_id, conversation_id, async_delete=False):
+    """
+    deletes a conversation and all of its messages.
+    with async_delete=True the CONV# item is only tombstoned and sweep_deleted_conversations removes the rest later
+    """
+    table = chat_table()
+    conv_key = {'TeacherId': user_id, 'sortId': f'CONV#{conversation_id}'}
+    if async_delete:
+        table.update_item(
+            Key=conv_key,
+            UpdateExpression='SET deleted_at = :now',
+            ExpressionAttributeValues={':now': int(datetime.utcnow().timestamp())}
         )
-        # Delete all message items
-        for item in message_items:
-            batch.delete_item(
-                Key={
-                    'TeacherId': item['TeacherId'],
-                    'sortId': item['sortId']
-                }
-            )
+        return 0
+
+    deleted = delete_chat_messages(user_id, conversation_id)
+    # metadata goes last so a failed run can be retried from the conversation list
+    table.delete_item(Key=conv_key)
+    return deleted
+
+def sweep_deleted_conversations(user_id=None):
+    """removes messages + metadata for every tombstoned conversation (one teacher, or the whole table when user_id is None)"""
+    table = chat_table()
+    if user_id:
+        query_kwargs = {
+            'KeyConditionExpression': Key('TeacherId').eq(user_id) & Key('sortId').begins_with('CONV#'),
+            'FilterExpression': Attr('deleted_at').exists(),
+            'ProjectionExpression': 'TeacherId, sortId',
+        }
+        read = table.query
+    else:
+        query_kwargs = {
+            'FilterExpression': Attr('sortId').begins_with('CONV#') & Attr('deleted_at').exists(),
+            'ProjectionExpression': 'TeacherId, sortId',
+        }
+        read = table.scan
+
+    swept = 0
+    while True:
+        response = read(**query_kwargs)
+        for item in response.get('Items', []):
+            conversation_id = item['sortId'][len('CONV#'):]
+            try:
+                delete_conversation(item['TeacherId'], conversation_id)
+                swept += 1
+            except Exception as e:
+                print(f"Error sweeping conversation {conversation_id}: {e}")
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_key
+    return swept
@@ -1,22 +1,54 @@
 import json
-import boto3
-import uuid
-from conversation_history import *
-from student_utils import *
-from utils import *
+import math
 import os
+import time
+import uuid
+
+# only stdlib is imported at module level: $connect/$disconnect return before any boto3 import,
+# AWS client or connection pool is created. the helpers are imported inside lambda_handler.
+
+def prewarm():
+    """imports the helpers and builds the clients during the init phase so the first real message doesn't pay for them"""
+    from conversation_history import chat_table
+    from utils import get_http
+    from aws_clients import get_bedrock_client
+    chat_table()
+    get_bedrock_client()
+    get_http()
 
-bedrock = boto3.client(service_name='bedrock-runtime', region_name='us-west-2')
+# PREWARM_ON_INIT=1 trades a slower init (billed free / boosted cpu) for a faster first message,
+# worth it with provisioned concurrency or when most cold starts are real chat messages
+if os.environ.get('PREWARM_ON_INIT') == '1':
+    prewarm()
 
 def lambda_handler(event, context):
-    if event['requestContext']['routeKey'] == '$connect':
-        return {'statusCode': 200}
-    
-    if event['requestContext']['routeKey'] == '$disconnect':
+    route_key = event.get('requestContext', {}).get('routeKey')
+    if route_key in ('$connect', '$disconnect'):
         return {'statusCode': 200}
 
+    # no-ops after the first call (or after prewarm), python caches the modules
+    from conversation_history import (
+        create_conversation, create_chat_message, update_conversation_title, get_conversation_title,
+        get_chat_messages, sweep_deleted_conversations
+    )
+    from student_utils import get_students_data, format_student_profile
+    from utils import post_json, format_history_for_claude, load_prompt_template, call_bedrock
+    from aws_clients import get_bedrock_client, get_apigw_client
+    from rate_limiter import admit_request
+    from usage_ledger import record_usage, flush_usage, reset_usage, usage_from_converse, usage_from_invoke
+    from stream_buffer import ResumableStream, resume_stream
+    from map_reduce import use_map_reduce, run_map, build_reduce_prompt, general_max_tokens, MAP_MODEL_ID
+    from chat_search_index import compact_index
+
+    # scheduled EventBridge rule -> clean up conversations tombstoned by delete_conversation(async_delete=True)
+    if event.get('source') == 'aws.events':
+        swept = sweep_deleted_conversations()
+        print(f"Swept {swept} deleted conversations")
+        return {'statusCode': 200, 'body': json.dumps({'swept': swept})}
+
     print(f"Event: {event}")
     print(f"Context: {context}")
+    reset_usage()
     
     try:
         # Parse request
@@ -38,14 +70,52 @@ def lambda_handler(event, context):
         stage = event['requestContext']['stage']
         api_endpoint = f"https://{domain}/{stage}"
 
-        apigw_client = boto3.client(
-            'apigatewaymanagementapi',
-            endpoint_url=api_endpoint
-        )
+        apigw_client = get_apigw_client(api_endpoint)
+        connection_id = event['requestContext']['connectionId']
+
+        # reconnected client picking up an answer it was in the middle of receiving
+        if message_data.get("type") == "resume":
+            if not session_id or not teacher_id:
+                return {'statusCode': 400, 'body': 'Missing sessionId or teacherId'}
+            try:
+                outcome = resume_stream(apigw_client, connection_id, session_id, teacher_id, int(message_data.get("fromSeq", 0)))
+            except Exception as e:
+                print(f"Error resuming stream: {e}")
+                outcome = 'unavailable'
+            print(f"Resume {session_id} from seq {message_data.get('fromSeq', 0)}: {outcome}")
+            if outcome == 'unavailable':
+                try:
+                    apigw_client.post_to_connection(
+                        ConnectionId=connection_id,
+                        Data=json.dumps({'sessionId': session_id, 'status': 'resume_unavailable', 'is_streaming': False}).encode('utf-8')
+                    )
+                except Exception as e:
+                    print(f"Error sending WebSocket message: {e}")
+            return {'statusCode': 200, 'body': json.dumps({'conversationId': session_id, 'status': outcome})}
 
         if not body or not teacher_id:
             return {'statusCode': 400, 'body': 'Missing body or teacherId'}
 
+        # admission control: reject fast instead of queueing another bedrock stream behind the quota
+        allowed, retry_after = admit_request(teacher_id)
+        if not allowed:
+            retry_after = max(1, math.ceil(retry_after))
+            print(f"Rate limited teacher {teacher_id}, retry after {retry_after}s")
+            try:
+                apigw_client.post_to_connection(
+                    ConnectionId=connection_id,
+                    Data=json.dumps({
+                        'message': f"The assistant is busy right now, please retry in {retry_after} seconds.",
+                        'sessionId': session_id,
+                        'status': 'busy',
+                        'retry_after': retry_after,
+                        'is_streaming': False
+                    }).encode('utf-8')
+                )
+            except Exception as e:
+                print(f"Error sending busy WebSocket message: {e}")
+            return {'statusCode': 429, 'body': json.dumps({'error': 'busy', 'retryAfter': retry_after})}
+
         # New conversation
         is_new_convo = session_id is None
         if is_new_convo:
@@ -106,11 +176,13 @@ def lambda_handler(event, context):
 
         # Build system prompt
         system_prompt = ""
+        answer_max_tokens = 1024
         if chat_type == "student":
             print("student chat")
             student_profile_clean = studentProfiles[0].get("body", {}).get("Item", {})
             print(student_profile_clean)
-            formatted_profile = format_student_profile(student_profile_clean, teacher_id)
+            # a new chat starts from the short briefing, follow-ups keep the full profile in the prompt
+            formatted_profile = format_student_profile(student_profile_clean, teacher_id, use_briefing=is_new_convo)
             print(formatted_profile)
             system_prompt = load_prompt_template(
                 "prompts/3_7_prompt_student_chat.txt",
@@ -119,11 +191,23 @@ def lambda_handler(event, context):
         elif chat_type == "general":
             print("general chat")
             students_to_disabilties = get_students_data(studentProfiles)
-            formatted_mappings = json.dumps(students_to_disabilties, indent=2)
-            system_prompt = load_prompt_template(
-                "prompts/3_7_prompt_all_chat.txt",
-                {"MAPPINGS_JSON": formatted_mappings}
-            )
+            # both prompts require every student by name, a fixed budget cuts the list off in big classes
+            answer_max_tokens = general_max_tokens(len(students_to_disabilties))
+            if use_map_reduce(students_to_disabilties):
+                # large class: per-group notes from a fast model, then the answer is written from the notes
+                group_notes = run_map(
+                    students_to_disabilties, body,
+                    on_usage=lambda response, latency_ms: record_usage(
+                        teacher_id, session_id, class_id, chat_type, 'map', MAP_MODEL_ID,
+                        usage_from_converse(response), latency_ms)
+                )
+                system_prompt = build_reduce_prompt(students_to_disabilties, group_notes)
+            else:
+                formatted_mappings = json.dumps(students_to_disabilties, indent=2)
+                system_prompt = load_prompt_template(
+                    "prompts/3_7_prompt_all_chat.txt",
+                    {"MAPPINGS_JSON": formatted_mappings}
+                )
         
         # Conversation history
         try:
@@ -162,18 +246,27 @@ def lambda_handler(event, context):
             ]
         }
 
+        # numbered, checkpointed frames so a dropped connection can resume instead of asking again
+        try:
+            stream = ResumableStream(apigw_client, connection_id, session_id, teacher_id)
+        except Exception as e:
+            print(f"Error creating stream buffer: {e}")
+            stream = ResumableStream(apigw_client, connection_id, session_id, teacher_id, buffered=False)
+
         # Call Bedrock
+        chat_model_id = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
+        call_started = time.perf_counter()
         try:
             if chat_type == "general":
-                stream_response = bedrock.converse_stream(
-                    modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
+                stream_response = get_bedrock_client().converse_stream(
+                    modelId=chat_model_id,
                     messages=conversation,
                     system=[{"text": system_prompt}],
-                    inferenceConfig={"maxTokens": 1024, "temperature": 0.3, "topP": 0.9},
+                    inferenceConfig={"maxTokens": answer_max_tokens, "temperature": 0.3, "topP": 0.9},
                 )
             else:
-                stream_response = bedrock.converse_stream(
-                    modelId='us.anthropic.claude-3-7-sonnet-20250219-v1:0',
+                stream_response = get_bedrock_client().converse_stream(
+                    modelId=chat_model_id,
                     messages=conversation,
                     system=[{"text": system_prompt}],
                     toolConfig=tool_config,
@@ -188,6 +281,8 @@ def lambda_handler(event, context):
         tool_use = {}
         tool_result = None
         tool_was_called = False
+        stream_metadata = {}
+        first_token_ms = None
         
         for chunk in stream_response["stream"]:
             if "contentBlockDelta" in chunk:
@@ -198,15 +293,11 @@ def lambda_handler(event, context):
                         tool_use['input'] = ''
                     tool_use['input'] += delta2['toolUse']['input']
                 elif 'text' in delta2:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - call_started) * 1000
                     text = chunk["contentBlockDelta"]["delta"]["text"]
                     assistant_response += text
-                    try:
-                        apigw_client.post_to_connection(
-                            ConnectionId=event['requestContext']['connectionId'],
-                            Data=json.dumps({'message': text, 'sessionId': session_id, "is_streaming": True}).encode('utf-8')
-                        )
-                    except Exception as e:
-                        print(f"Error sending WebSocket message: {e}")
+                    stream.send({'message': text, 'sessionId': session_id, "is_streaming": True})
             elif 'contentBlockStart' in chunk:
                 tool = chunk['contentBlockStart']['start']['toolUse']
                 tool_use['toolUseId'] = tool['toolUseId']
@@ -220,8 +311,13 @@ def lambda_handler(event, context):
                         tool_use['input'] = {}
             elif 'messageStop' in chunk:
                 stop_reason = chunk['messageStop']['stopReason']
+            elif 'metadata' in chunk:
+                # last event of the stream: token usage for the whole call
+                stream_metadata = chunk['metadata']
         
         final_assistant_response = assistant_response
+        record_usage(teacher_id, session_id, class_id, chat_type, 'chat', chat_model_id,
+                     usage_from_converse(stream_metadata), (time.perf_counter() - call_started) * 1000, first_token_ms)
 
         # Handle tool use
         if stop_reason == "tool_use" and tool_use.get('name') == 'editStudentProfile':
@@ -252,21 +348,30 @@ def lambda_handler(event, context):
                     "prompts/3_5_prompt_generate_title.txt",
                     {"BODY": body}
                 )
-                title = call_bedrock(title_prompt)
+                title_usage = {}
+                title_started = time.perf_counter()
+                title = call_bedrock(title_prompt, usage=title_usage)
+                record_usage(teacher_id, session_id, class_id, chat_type, 'title', 'us.anthropic.claude-3-5-sonnet-20241022-v2:0',
+                             usage_from_invoke({'usage': title_usage}), (time.perf_counter() - title_started) * 1000)
                 update_conversation_title(teacher_id, session_id, title)
             except Exception as e:
                 print(f"Error generating title: {e}")
 
+        stream.finish({'sessionId': session_id, 'status': 'complete', 'is_streaming': False})
+
+        # the teacher already has the full answer, usage accounting doesn't hold it up
+        flush_usage()
+        # fold the teacher's recent messages into the search index every SEARCH_COMPACT_EVERY messages
         try:
-            apigw_client.post_to_connection(
-                ConnectionId=event['requestContext']['connectionId'],
-                Data=json.dumps({'sessionId': session_id, 'status': 'complete', 'is_streaming': False}).encode('utf-8')
-            )
+            compact_index(teacher_id)
         except Exception as e:
-            print(f"Error sending final WebSocket message: {e}")
+            print(f"Error compacting search index: {e}")
         
         return {'statusCode': 200, 'body': json.dumps({'conversationId': session_id, 'status': 'complete'})}
     
     except Exception as e:
         print(f"Unexpected error: {e}")
         return {'statusCode': 500, 'body': json.dumps({'error': 'Internal server error'})}
+    finally:
+        # no-op after a complete turn, records the calls of a turn that returned early or failed
+        flush_usage()
@@ -0,0 +1,111 @@
+"""
+map-reduce answering for general chats over large classes.
+
+a general chat normally puts every selected student's disabilities and accommodations into one
+system prompt. above MAP_REDUCE_MIN_STUDENTS that prompt gets slow to process and the model
+starts skipping students, so instead:
+  - map: the roster is sharded into groups of about MAP_GROUP_TOKENS prompt tokens (students with
+    the same needs sorted next to each other) and a fast model writes short per-group notes,
+    all groups concurrently
+  - reduce: the notes replace the mappings in the system prompt and the usual streamed
+    converse call writes the answer
+"""
+import json, os, time
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_bedrock_client
+from utils import load_prompt_template
+
+MAP_REDUCE_MIN_STUDENTS = int(os.environ.get('MAP_REDUCE_MIN_STUDENTS', '200'))
+MAP_GROUP_TOKENS = int(os.environ.get('MAP_GROUP_TOKENS', '800'))
+MAP_MODEL_ID = os.environ.get('MAP_MODEL_ID', 'us.anthropic.claude-3-5-haiku-20241022-v1:0')
+MAP_MAX_WORKERS = int(os.environ.get('MAP_MAX_WORKERS', '32'))
+MAP_MAX_TOKENS = 700
+# a general answer has to name every student, so its room grows with the class: a normal answer
+# plus ~4 tokens per name and the comma / heading around it. the cap keeps generation inside the
+# lambda timeout (~150s at 55 tokens/s), it only binds above ~1200 students
+ANSWER_BASE_TOKENS = 1024
+ANSWER_TOKENS_PER_STUDENT = 6
+ANSWER_MAX_TOKENS_CAP = int(os.environ.get('ANSWER_MAX_TOKENS_CAP', '8192'))
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for english / json, close enough to size groups
+    return len(text) // 4 + 1
+
+
+def use_map_reduce(mapping):
+    return len(mapping) >= MAP_REDUCE_MIN_STUDENTS
+
+
+def general_max_tokens(student_count):
+    """maxTokens for a general-chat answer that lists student_count students by name"""
+    return min(ANSWER_MAX_TOKENS_CAP, ANSWER_BASE_TOKENS + ANSWER_TOKENS_PER_STUDENT * student_count)
+
+
+def shard_students(mapping, group_tokens=None):
+    """splits {name: needs} into groups of about group_tokens prompt tokens"""
+    group_tokens = group_tokens or MAP_GROUP_TOKENS
+    # same disabilities next to each other so a group's notes can merge them
+    names = sorted(mapping, key=lambda n: (sorted(mapping[n].get('disabilities', [])), n))
+    groups, current, size = [], {}, 0
+    for name in names:
+        cost = estimate_tokens(json.dumps({name: mapping[name]}))
+        if current and size + cost > group_tokens:
+            groups.append(current)
+            current, size = {}, 0
+        current[name] = mapping[name]
+        size += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+def map_group(group, body, number, count, bedrock_client=None):
+    """one fast-model call for one group. returns (notes, converse response, latency_ms)"""
+    prompt = load_prompt_template("prompts/3_5_prompt_map_student_group.txt", {
+        "BODY": body,
+        "MAPPINGS_JSON": json.dumps(group, indent=1),
+        "GROUP_NUMBER": str(number),
+        "GROUP_COUNT": str(count),
+    })
+    started = time.perf_counter()
+    response = (bedrock_client or get_bedrock_client()).converse(
+        modelId=MAP_MODEL_ID,
+        messages=[{"role": "user", "content": [{"text": prompt}]}],
+        inferenceConfig={"maxTokens": MAP_MAX_TOKENS, "temperature": 0.2},
+    )
+    notes = "".join(block.get("text", "") for block in response["output"]["message"]["content"])
+    return notes.strip(), response, (time.perf_counter() - started) * 1000
+
+
+def run_map(mapping, body, bedrock_client=None, on_usage=None):
+    """
+    runs map_group over every group concurrently and returns the group notes in roster order.
+    a failed group falls back to its raw mappings so no student drops out of the answer.
+    on_usage(response, latency_ms) is called for every successful map call
+    """
+    groups = shard_students(mapping)
+    print(f"map-reduce: {len(mapping)} students in {len(groups)} groups")
+
+    def run(numbered):
+        number, group = numbered
+        try:
+            notes, response, latency_ms = map_group(group, body, number, len(groups), bedrock_client)
+            if on_usage:
+                on_usage(response, latency_ms)
+            return notes
+        except Exception as e:
+            print(f"Error mapping group {number}: {e}")
+            return json.dumps(group, indent=1)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAP_MAX_WORKERS, len(groups)))) as pool:
+        return list(pool.map(run, enumerate(groups, 1)))
+
+
+def build_reduce_prompt(mapping, group_notes):
+    notes = "\n\n".join(f"<group number=\"{i}\">\n{n}\n</group>" for i, n in enumerate(group_notes, 1))
+    return load_prompt_template("prompts/3_7_prompt_all_chat_reduce.txt", {
+        "GROUP_NOTES": notes,
+        "STUDENT_COUNT": str(len(mapping)),
+        "GROUP_COUNT": str(len(group_notes)),
+    })
@@ -0,0 +1,105 @@
+"""
+token-bucket admission control for the inference lambda.
+
+every chat message takes one token from the teacher's bucket and one from the global bucket
+before we call bedrock. buckets live in dynamo (one item per bucket) so all concurrent lambda
+instances share them.
+
+a bucket is stored as the single timestamp `full_at`, when it will be full again: taking a token
+pushes it forward by 1/rate, a refund pulls it back, and a request is over the limit when it would
+push full_at more than burst/rate past now. that makes admission one conditional update with no
+read first, so concurrent instances never retry each other out of a token, and a refund is an ADD
+on the same attribute that no concurrent take can overwrite.
+"""
+import os, time
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE', 'k12-coteacher-rate-limits')
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+
+# rate = tokens refilled per minute, burst = bucket capacity
+TEACHER_RATE_PER_MIN = float(os.environ.get('TEACHER_RATE_PER_MIN', '6'))
+TEACHER_BURST = float(os.environ.get('TEACHER_BURST', '10'))
+GLOBAL_RATE_PER_MIN = float(os.environ.get('GLOBAL_RATE_PER_MIN', '120'))
+GLOBAL_BURST = float(os.environ.get('GLOBAL_BURST', '200'))
+
+
+def _num(value):
+    return Decimal(str(round(value, 4)))
+
+
+def _update_bucket(bucket_id, update, condition, values):
+    """one conditional write, False if the condition didn't hold"""
+    try:
+        get_table(RATE_LIMIT_TABLE).update_item(
+            Key={'bucketId': bucket_id},
+            UpdateExpression=update,
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+
+def take_token(bucket_id, rate_per_min, burst, cost=1):
+    """
+    tries to take `cost` tokens from a bucket.
+    returns (allowed, retry_after_seconds)
+    """
+    rate_per_sec = rate_per_min / 60.0
+    step = cost / rate_per_sec
+    now = time.time()
+    limit = now + burst / rate_per_sec - step
+    # idle buckets are full again by full_at <= now + burst/rate, let TTL clean them up
+    expires_at = int(now + burst / rate_per_sec + 3600)
+
+    # bucket already draining: take from it unless that would overdraw it
+    draining = ('ADD full_at :step SET expires_at = :exp', 'full_at > :now AND full_at <= :limit',
+                {':step': _num(step), ':now': _num(now), ':limit': _num(limit), ':exp': expires_at})
+    # full (or new) bucket: start draining from now
+    full = ('SET full_at = :start, expires_at = :exp', 'attribute_not_exists(full_at) OR full_at <= :now',
+            {':start': _num(now + step), ':now': _num(now), ':exp': expires_at})
+
+    # the two conditions only miss each other if another instance moved full_at past now in
+    # between, so draining -> full -> draining all failing means the bucket really is empty
+    for update, condition, values in (draining, full, draining):
+        if _update_bucket(bucket_id, update, condition, values):
+            return True, 0
+
+    item = get_table(RATE_LIMIT_TABLE).get_item(Key={'bucketId': bucket_id}, ConsistentRead=True).get('Item') or {}
+    full_at = float(item.get('full_at', now))
+    return False, max(0.0, full_at - limit)
+
+
+def refund_token(bucket_id, rate_per_min, cost=1):
+    """gives tokens back, used when a later bucket rejects the request"""
+    # a refund that lands after the bucket refilled is lost, which is right: it was full anyway
+    _update_bucket(bucket_id, 'ADD full_at :back', 'attribute_exists(full_at)',
+                   {':back': _num(-cost / (rate_per_min / 60.0))})
+
+
+def admit_request(teacher_id, cost=1):
+    """
+    per-teacher bucket first so one busy teacher can't drain the global bucket for everyone.
+    returns (allowed, retry_after_seconds). fails open if the limiter table is unavailable
+    """
+    if not RATE_LIMIT_ENABLED:
+        return True, 0
+    teacher_bucket = f'TEACHER#{teacher_id}'
+    try:
+        allowed, retry_after = take_token(teacher_bucket, TEACHER_RATE_PER_MIN, TEACHER_BURST, cost)
+        if not allowed:
+            return False, retry_after
+        allowed, retry_after = take_token('GLOBAL', GLOBAL_RATE_PER_MIN, GLOBAL_BURST, cost)
+        if not allowed:
+            refund_token(teacher_bucket, TEACHER_RATE_PER_MIN, cost)
+            return False, retry_after
+        return True, 0
+    except Exception as e:
+        print(f"Rate limiter unavailable, admitting request: {e}")
+        return True, 0
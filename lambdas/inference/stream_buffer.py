@@ -0,0 +1,181 @@
+"""
+resumable answer streams for the inference lambda.
+
+every frame we stream to the teacher gets a sequence number (1, 2, 3, ...) and is checkpointed
+into a short-TTL buffer keyed by sessionId, so a dropped websocket doesn't cost a second
+generation. one dynamo partition per session:
+  - seq 0 is the header: status (streaming / complete), last_seq, teacher, the connection
+    currently listening and the turn (one id per answer)
+  - seq N holds the frames N.. of one checkpoint (frames are coalesced, not written one by one),
+    tagged with the turn that wrote it. every answer in a conversation numbers its frames from 1
+    again, so checkpoints left over from an earlier answer are skipped by turn, not by seq
+
+a client that reconnects sends {"type": "resume", "sessionId": ..., "fromSeq": <last seq seen>}.
+resume_stream() replays the buffered tail to the new connection and, if the answer is still being
+generated, points the header at the new connection. the generating lambda sees that on its next
+checkpoint and sends everything after what was replayed. frames can arrive twice around the
+hand-over, clients drop any seq they have already seen.
+"""
+import json, os, time, uuid
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+
+STREAM_BUFFER_TABLE = os.environ.get('STREAM_BUFFER_TABLE', 'k12-coteacher-stream-buffer')
+STREAM_BUFFER_ENABLED = os.environ.get('STREAM_BUFFER_ENABLED', '1') == '1'
+STREAM_BUFFER_TTL_SECONDS = int(os.environ.get('STREAM_BUFFER_TTL_SECONDS', '900'))
+# a checkpoint is written when this much time or this many frames have piled up
+CHECKPOINT_INTERVAL_MS = float(os.environ.get('CHECKPOINT_INTERVAL_MS', '400'))
+CHECKPOINT_MAX_FRAMES = int(os.environ.get('CHECKPOINT_MAX_FRAMES', '40'))
+
+
+def _is_gone(e):
+    return getattr(e, 'response', {}).get('Error', {}).get('Code') == 'GoneException'
+
+
+class ResumableStream:
+    """sends numbered frames to the current connection and checkpoints them for resume"""
+
+    def __init__(self, apigw_client, connection_id, session_id, teacher_id, buffered=STREAM_BUFFER_ENABLED):
+        self.apigw_client = apigw_client
+        self.connection_id = connection_id
+        self.session_id = session_id
+        self.teacher_id = teacher_id
+        self.frames = []  # every frame sent so far, frames[i] has seq i + 1
+        self.checkpointed = 0  # frames already in the buffer
+        self.connected = True
+        self.turn = uuid.uuid4().hex
+        self.last_checkpoint = time.perf_counter()
+        # without a buffer frames are still numbered and sent, there is just nothing to resume from
+        self.table = get_table(STREAM_BUFFER_TABLE) if buffered else None
+        if self.table:
+            self._write_header('streaming')
+
+    def _expires_at(self):
+        return int(time.time()) + STREAM_BUFFER_TTL_SECONDS
+
+    def _write_header(self, status):
+        self.table.put_item(Item={
+            'sessionId': self.session_id, 'seq': 0, 'status': status, 'last_seq': 0,
+            'teacher_id': self.teacher_id, 'connection_id': self.connection_id, 'resume_from': 0,
+            'turn': self.turn, 'expires_at': self._expires_at(),
+        })
+
+    def _post(self, frame):
+        if not self.connected:
+            return
+        try:
+            self.apigw_client.post_to_connection(ConnectionId=self.connection_id, Data=frame)
+        except Exception as e:
+            print(f"Error sending WebSocket message: {e}")
+            if _is_gone(e):
+                # keep generating into the buffer, a reconnecting client can pick it up
+                self.connected = False
+
+    def send(self, payload):
+        """numbers, sends and buffers one frame. payload is the frame dict without seq"""
+        frame = json.dumps({**payload, 'seq': len(self.frames) + 1}).encode('utf-8')
+        self.frames.append(frame)
+        self._post(frame)
+        if self.table and (len(self.frames) - self.checkpointed >= CHECKPOINT_MAX_FRAMES
+                           or (time.perf_counter() - self.last_checkpoint) * 1000 >= CHECKPOINT_INTERVAL_MS):
+            self.checkpoint()
+
+    def checkpoint(self, status='streaming'):
+        """writes the unbuffered frames and follows the connection a resume attached, if any"""
+        if not self.table:
+            return
+        self.last_checkpoint = time.perf_counter()
+        try:
+            if self.checkpointed < len(self.frames):
+                self.table.put_item(Item={
+                    'sessionId': self.session_id, 'seq': self.checkpointed + 1, 'turn': self.turn,
+                    'frames': [f.decode('utf-8') for f in self.frames[self.checkpointed:]],
+                    'expires_at': self._expires_at(),
+                })
+                self.checkpointed = len(self.frames)
+            header = self.table.update_item(
+                Key={'sessionId': self.session_id, 'seq': 0},
+                UpdateExpression='SET last_seq = :seq, #s = :status, expires_at = :exp',
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues={':seq': self.checkpointed, ':status': status, ':exp': self._expires_at()},
+                ReturnValues='ALL_NEW',
+            )['Attributes']
+        except Exception as e:
+            print(f"Error checkpointing stream: {e}")
+            return
+        if header.get('connection_id') != self.connection_id:
+            # a resume attached a new connection, catch it up from where its replay stopped
+            self.connection_id = header['connection_id']
+            self.connected = True
+            print(f"Stream {self.session_id} resumed on {self.connection_id} after seq {header.get('resume_from', 0)}")
+            for frame in self.frames[int(header.get('resume_from', 0)):]:
+                self._post(frame)
+
+    def finish(self, payload):
+        """sends the final frame and marks the buffer complete"""
+        self.send(payload)
+        self.checkpoint(status='complete')
+
+
+def _buffered_frames(table, header, after_seq):
+    """(seq, frame) of the header's answer after after_seq, up to its last checkpointed seq"""
+    frames = []
+    last_seq = int(header.get('last_seq', 0))
+    if after_seq >= last_seq:
+        return frames
+    # a checkpoint starting at or before after_seq can still hold frames after it
+    query = {'KeyConditionExpression': Key('sessionId').eq(header['sessionId']) & Key('seq').between(1, last_seq),
+             'ConsistentRead': True}
+    while True:
+        response = table.query(**query)
+        for item in response['Items']:
+            if item.get('turn') != header.get('turn'):
+                continue  # an earlier answer's checkpoint, not overwritten by this one yet
+            first = int(item['seq'])
+            frames += [(first + i, f) for i, f in enumerate(item['frames']) if after_seq < first + i <= last_seq]
+        if 'LastEvaluatedKey' not in response:
+            return frames
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def resume_stream(apigw_client, connection_id, session_id, teacher_id, from_seq):
+    """
+    replays the frames after from_seq to connection_id and attaches it to a still running
+    generation. returns 'replayed', 'attached' or 'unavailable' (nothing buffered, ask again)
+    """
+    if not STREAM_BUFFER_ENABLED:
+        return 'unavailable'
+    table = get_table(STREAM_BUFFER_TABLE)
+    header = table.get_item(Key={'sessionId': session_id, 'seq': 0}, ConsistentRead=True).get('Item')
+    if not header or header.get('teacher_id') != teacher_id:
+        return 'unavailable'
+
+    def replay(header, after_seq):
+        last = after_seq
+        for seq, frame in _buffered_frames(table, header, after_seq):
+            apigw_client.post_to_connection(ConnectionId=connection_id, Data=frame.encode('utf-8'))
+            last = seq
+        return last
+
+    replayed = replay(header, from_seq)
+    if header['status'] == 'complete':
+        return 'replayed'
+    try:
+        header = table.update_item(
+            Key={'sessionId': session_id, 'seq': 0},
+            UpdateExpression='SET connection_id = :c, resume_from = :r',
+            ConditionExpression='turn = :turn',
+            ExpressionAttributeValues={':c': connection_id, ':r': replayed, ':turn': header.get('turn')},
+            ReturnValues='ALL_NEW',
+        )['Attributes']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # a new answer started in this session meanwhile, the one we replayed is over
+        return 'replayed'
+    if header['status'] == 'complete':
+        # finished while we were replaying, the generator won't look at the header again
+        replay(header, replayed)
+        return 'replayed'
+    return 'attached'
@@ -1,3 +1,8 @@
+import os
+
+# first turns of a student chat read the precomputed briefing instead of the full profile
+STUDENT_BRIEFING_ENABLED = os.environ.get('STUDENT_BRIEFING_ENABLED', '1') == '1'
+
 def get_students_data(student_profiles):
     # Extract disabilities, accommodations, and teacher notes for each student
     mapping = {}
@@ -23,8 +28,28 @@ def get_students_data(student_profiles):
     return mapping
 
  
-def format_student_profile(profile, teacher_id=None):
-    """formats student profile into more readable format for llm"""
+def format_briefing(profile, teacher_id=None):
+    """
+    the precomputed briefing for this teacher (or the teacher-independent one), with any comments
+    the teacher added after it was generated appended. None when the profile has no briefing yet
+    """
+    briefing = (profile.get("teacher_briefings") or {}).get(teacher_id) or profile.get("briefing")
+    if not briefing or not briefing.get("text"):
+        return None
+    comments = list((profile.get("teacherComments") or {}).get(teacher_id) or [])
+    newer = comments[int(briefing.get("comment_count", 0)):]
+    if not newer:
+        return briefing["text"]
+    return briefing["text"] + "\n\n**Teacher Comments (added since this briefing)**\n" + "\n".join(f"- {c}" for c in newer)
+
+ 
+def format_student_profile(profile, teacher_id=None, use_briefing=False):
+    """formats student profile into more readable format for llm. use_briefing prefers the short precomputed briefing"""
+    if use_briefing and STUDENT_BRIEFING_ENABLED:
+        briefing = format_briefing(profile, teacher_id)
+        if briefing:
+            return briefing
+
     def listify(lst, indent="- "):
         return "\n".join(f"{indent}{item['S'] if isinstance(item, dict) and 'S' in item else item}" for item in lst)
 
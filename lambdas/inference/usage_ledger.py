@@ -0,0 +1,121 @@
+"""
+token usage ledger for the inference lambda.
+
+every bedrock call in a turn (the streamed answer, the title) is noted with record_usage() while
+the turn runs; flush_usage() then writes, in parallel:
+  - one compact record per call under the teacher:  pk TEACHER#<id>, sk TURN#<iso time>#<id>
+  - atomic ADD roll-ups for the day per teacher and per class:  pk DAILY#<yyyy-mm-dd>, sk TEACHER#<id> / CLASS#<id>
+flush_usage() runs after the final websocket frame has gone out, so the teacher never waits on it,
+and it never raises. the records live in a module list that survives between invocations of a warm
+lambda, so the handler calls reset_usage() first and flush_usage() again in its finally: a turn that
+returns early or fails still records its calls and never hands them to the next teacher's turn. lambdas/usage_report.py aggregates the ledger offline.
+"""
+import os, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from aws_clients import get_table
+
+USAGE_TABLE = os.environ.get('USAGE_TABLE', 'k12-coteacher-usage-ledger')
+USAGE_LEDGER_ENABLED = os.environ.get('USAGE_LEDGER_ENABLED', '1') == '1'
+# turn records expire through the table's TTL on expires_at, the daily roll-ups are kept
+USAGE_RETENTION_DAYS = int(os.environ.get('USAGE_RETENTION_DAYS', '180'))
+
+COUNTERS = ('calls', 'input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens', 'latency_ms')
+
+_pending = []
+
+
+def usage_from_converse(metadata):
+    """the converse_stream 'metadata' event -> our usage fields"""
+    usage = metadata.get('usage', {})
+    return {
+        'input_tokens': usage.get('inputTokens', 0),
+        'output_tokens': usage.get('outputTokens', 0),
+        'cache_read_tokens': usage.get('cacheReadInputTokens', 0),
+        'cache_write_tokens': usage.get('cacheWriteInputTokens', 0),
+    }
+
+
+def usage_from_invoke(response_body):
+    """an invoke_model (anthropic messages) response body -> our usage fields"""
+    usage = response_body.get('usage', {})
+    return {
+        'input_tokens': usage.get('input_tokens', 0),
+        'output_tokens': usage.get('output_tokens', 0),
+        'cache_read_tokens': usage.get('cache_read_input_tokens', 0),
+        'cache_write_tokens': usage.get('cache_creation_input_tokens', 0),
+    }
+
+
+def record_usage(teacher_id, conversation_id, class_id, chat_type, purpose, model_id, usage, latency_ms, ttft_ms=None):
+    """notes one bedrock call for this turn, nothing is written until flush_usage()"""
+    if not USAGE_LEDGER_ENABLED:
+        return
+    _pending.append({
+        'teacher_id': teacher_id,
+        'conversation_id': conversation_id or '',
+        'class_id': class_id or '',
+        'chat_type': chat_type,
+        'purpose': purpose,
+        'model': model_id,
+        'latency_ms': int(latency_ms),
+        'ttft_ms': None if ttft_ms is None else int(ttft_ms),
+        'recorded_at': time.time(),
+        **{k: int(usage.get(k, 0)) for k in ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens')},
+    })
+
+
+def _put_turn(table, record):
+    when = datetime.fromtimestamp(record['recorded_at'], tz=timezone.utc)
+    item = {k: v for k, v in record.items() if v is not None and k not in ('teacher_id', 'recorded_at')}
+    item.update({
+        'pk': f"TEACHER#{record['teacher_id']}",
+        'sk': f"TURN#{when.isoformat(timespec='milliseconds')}#{uuid.uuid4().hex[:8]}",
+        'expires_at': int(record['recorded_at']) + USAGE_RETENTION_DAYS * 86400,
+    })
+    table.put_item(Item=item)
+
+
+def _add_rollup(table, day, owner_key, totals):
+    table.update_item(
+        Key={'pk': f'DAILY#{day}', 'sk': owner_key},
+        UpdateExpression='ADD ' + ', '.join(f'{k} :{k}' for k in COUNTERS),
+        ExpressionAttributeValues={f':{k}': totals[k] for k in COUNTERS},
+    )
+
+
+def reset_usage():
+    """drops records left over from an earlier invocation. returns how many were dropped"""
+    global _pending
+    dropped, _pending = len(_pending), []
+    if dropped:
+        print(f"Dropped {dropped} usage records left over from an earlier invocation")
+    return dropped
+
+
+def flush_usage():
+    """writes and clears this turn's usage records. returns how many calls were recorded"""
+    global _pending
+    records, _pending = _pending, []
+    if not records:
+        return 0
+    try:
+        table = get_table(USAGE_TABLE)
+        rollups = {}
+        for record in records:
+            day = datetime.fromtimestamp(record['recorded_at'], tz=timezone.utc).date().isoformat()
+            owners = [f"TEACHER#{record['teacher_id']}"] + ([f"CLASS#{record['class_id']}"] if record['class_id'] else [])
+            for owner in owners:
+                totals = rollups.setdefault((day, owner), dict.fromkeys(COUNTERS, 0))
+                totals['calls'] += 1
+                for k in COUNTERS[1:]:
+                    totals[k] += record[k]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(_put_turn, table, record) for record in records]
+            futures += [pool.submit(_add_rollup, table, day, owner, totals) for (day, owner), totals in rollups.items()]
+            for future in futures:
+                future.result()
+    except Exception as e:
+        # usage accounting must never break a chat turn
+        print(f"Error writing usage ledger: {e}")
+    return len(records)
@@ -1,10 +1,18 @@
-import boto3
 import json
 import urllib3
+from aws_clients import get_bedrock_client
+
+_http = None
+
+def get_http():
+    # pool is built on first use, $connect/$disconnect never need it
+    global _http
+    if _http is None:
+        _http = urllib3.PoolManager()
+    return _http
 
-http = urllib3.PoolManager()
 def post_json(url, payload):
-    r = http.request(
+    r = get_http().request(
         "POST",
         url,
         body=json.dumps(payload).encode("utf-8"),
@@ -35,8 +43,9 @@ def load_prompt_template(filepath, replacements):
     return template
 
 # invoke bedrock
-def call_bedrock(prompt, model_id="us.anthropic.claude-3-5-sonnet-20241022-v2:0"):
-    bedrock = boto3.client(service_name="bedrock-runtime", region_name="us-west-2")
+def call_bedrock(prompt, model_id="us.anthropic.claude-3-5-sonnet-20241022-v2:0", usage=None):
+    """returns the response text. pass a dict as usage to have the response's token usage copied into it"""
+    bedrock = get_bedrock_client()
     body = {
         "anthropic_version": "bedrock-2023-05-31",
         "max_tokens": 5000,
@@ -51,6 +60,8 @@ def call_bedrock(prompt, model_id="us.anthropic.claude-3-5-sonnet-20241022-v2:0"
             body=json.dumps(body)
         )
         response_body = json.loads(response["body"].read())
+        if usage is not None:
+            usage.update(response_body.get("usage", {}))
         return response_body["content"][0]["text"]
     except Exception as e:
         print("call to bedrock failed", e)
@@ -0,0 +1,100 @@
+"""
+shared, lazily created AWS clients for all lambdas (deployed as the aws_clients layer).
+
+clients/resources are built on first use and cached at module level, so they survive across
+warm invocations of the same execution environment instead of being rebuilt in every handler.
+boto3 clients are thread safe, resources are not - only share resources within one thread.
+"""
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+REGION = os.environ.get('AWS_REGION', 'us-west-2')
+BEDROCK_REGION = os.environ.get('BEDROCK_REGION', 'us-west-2')
+# point at DynamoDB Local (e.g. http://localhost:8000) for load tests and local runs
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL')
+
+# short timeouts for dynamo/apigw, long read timeout for bedrock since generations stream for a while
+DEFAULT_CONFIG = Config(
+    region_name=REGION,
+    connect_timeout=2,
+    read_timeout=10,
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32')),
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+)
+BEDROCK_CONFIG = DEFAULT_CONFIG.merge(Config(
+    region_name=BEDROCK_REGION,
+    read_timeout=300,
+    retries={'mode': 'adaptive', 'max_attempts': 6},
+))
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_resources = {}
+_tables = {}
+
+
+def _get_session():
+    # one botocore session per process, boto3's default session isn't safe to build clients from concurrently
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name, config=DEFAULT_CONFIG, **kwargs):
+    """cached boto3 client, one per (service, kwargs) pair"""
+    cache_key = (service_name, tuple(sorted(kwargs.items())))
+    client = _clients.get(cache_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                client = _get_session().client(service_name, config=config, **kwargs)
+                _clients[cache_key] = client
+    return client
+
+
+def get_dynamo_resource():
+    resource = _resources.get('dynamodb')
+    if resource is None:
+        with _lock:
+            resource = _resources.get('dynamodb')
+            if resource is None:
+                resource = _get_session().resource('dynamodb', config=DEFAULT_CONFIG, endpoint_url=DYNAMODB_ENDPOINT_URL)
+                _resources['dynamodb'] = resource
+    return resource
+
+
+def get_table(table_name):
+    table = _tables.get(table_name)
+    if table is None:
+        table = get_dynamo_resource().Table(table_name)
+        _tables[table_name] = table
+    return table
+
+
+def get_bedrock_client():
+    return get_client('bedrock-runtime', config=BEDROCK_CONFIG)
+
+
+def get_apigw_client(endpoint_url):
+    """websocket management client, cached per api endpoint (https://{domain}/{stage})"""
+    return get_client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+
+
+def get_s3_client():
+    return get_client('s3')
+
+
+def get_lambda_client():
+    return get_client('lambda')
+
+
+def get_sqs_client():
+    return get_client('sqs')
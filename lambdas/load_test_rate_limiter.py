@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Load test for inference admission control under skewed load, against DynamoDB Local.
+
+One "hot" teacher sends most of the traffic while the rest send occasionally. Admitted requests
+hold a slot on a simulated Bedrock with fixed capacity (its tokens-per-minute quota); when the
+model is saturated requests queue and are throttled, the way converse_stream backs off.
+Compares latency percentiles for normal teachers with the limiter off and on.
+
+usage (DynamoDB Local on :8000):
+  docker run -p 8000:8000 amazon/dynamodb-local
+  python load_test_rate_limiter.py [--requests 2000] [--teachers 50] [--hot-share 0.6] [--workers 64]
+"""
+
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault('DYNAMODB_ENDPOINT_URL', 'http://localhost:8000')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+os.environ.setdefault('AWS_REGION', 'us-west-2')
+os.environ.setdefault('RATE_LIMIT_TABLE', 'k12-coteacher-rate-limits-loadtest')
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'layers', 'aws_clients', 'python'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, 'inference'))
+
+import rate_limiter
+from aws_clients import get_dynamo_resource
+
+def arg(name, default, cast):
+    return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+class SimulatedBedrock:
+    """fixed number of concurrent generations, each taking ~gen_seconds; extra callers wait"""
+    def __init__(self, capacity, gen_seconds):
+        self.slots = threading.Semaphore(capacity)
+        self.gen_seconds = gen_seconds
+
+    def generate(self):
+        with self.slots:
+            time.sleep(random.uniform(0.5, 1.5) * self.gen_seconds)
+
+def create_table():
+    dynamo = get_dynamo_resource()
+    name = rate_limiter.RATE_LIMIT_TABLE
+    try:
+        dynamo.Table(name).delete()
+        dynamo.Table(name).wait_until_not_exists()
+    except Exception:
+        pass
+    table = dynamo.create_table(
+        TableName=name,
+        KeySchema=[{'AttributeName': 'bucketId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'bucketId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+
+def run(limiter_on, requests, teachers, hot_share, workers, bedrock):
+    rate_limiter.RATE_LIMIT_ENABLED = limiter_on
+    create_table()
+    rng = random.Random(42)
+    senders = ['hot-teacher' if rng.random() < hot_share else f'teacher-{rng.randrange(teachers)}' for _ in range(requests)]
+    latencies = {'hot': [], 'normal': []}
+    rejected = {'hot': 0, 'normal': 0}
+    lock = threading.Lock()
+
+    def one(teacher_id):
+        kind = 'hot' if teacher_id == 'hot-teacher' else 'normal'
+        start = time.perf_counter()
+        allowed, _ = rate_limiter.admit_request(teacher_id)
+        if allowed:
+            bedrock.generate()
+        elapsed = time.perf_counter() - start
+        with lock:
+            if allowed:
+                latencies[kind].append(elapsed)
+            else:
+                rejected[kind] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, senders))
+    wall = time.perf_counter() - start
+    return latencies, rejected, wall
+
+def pct(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    requests = arg('--requests', 2000, int)
+    teachers = arg('--teachers', 50, int)
+    hot_share = arg('--hot-share', 0.6, float)
+    workers = arg('--workers', 64, int)
+    bedrock = SimulatedBedrock(capacity=arg('--capacity', 8, int), gen_seconds=arg('--gen-seconds', 0.2, float))
+
+    print(f"{requests} requests, {teachers} teachers, hot teacher share {hot_share:.0%}, {workers} workers\n")
+    print(f"{'limiter':<10}{'normal p50':>12}{'normal p99':>12}{'hot p99':>12}{'rejected hot':>14}{'rejected normal':>17}{'wall s':>9}")
+    for limiter_on in (False, True):
+        latencies, rejected, wall = run(limiter_on, requests, teachers, hot_share, workers, bedrock)
+        print(f"{'on' if limiter_on else 'off':<10}"
+              f"{statistics.median(latencies['normal']) * 1000 if latencies['normal'] else float('nan'):>10.0f}ms"
+              f"{pct(latencies['normal'], 0.99) * 1000:>10.0f}ms"
+              f"{pct(latencies['hot'], 0.99) * 1000:>10.0f}ms"
+              f"{rejected['hot']:>14}{rejected['normal']:>17}{wall:>9.1f}")
+
+if __name__ == "__main__":
+    main()
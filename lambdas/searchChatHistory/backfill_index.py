@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Build the chat search index for teachers whose messages were written before indexing existed.
+Reads every message of the teacher from the chat history table, oldest first, and bulk indexes the
+ones without a DOC item yet, so reruns and teachers already indexed by the chat path don't get their
+postings doubled. --rebuild drops the teacher's index first and indexes everything (also clears
+postings of expired and deleted messages).
+
+usage: python backfill_index.py TEACHER_ID [TEACHER_ID ...] [--rebuild]
+"""
+
+import argparse, os, sys
+from boto3.dynamodb.conditions import Key
+
+# run locally: pick up the shared client layer and the index module from the repo
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'layers', 'aws_clients', 'python'))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'inference'))
+from aws_clients import get_table
+from chat_search_index import bulk_index, drop_index, indexed_message_keys, CHAT_HISTORY_TABLE
+
+def teacher_messages(teacher_id):
+    table = get_table(CHAT_HISTORY_TABLE)
+    kwargs = {'KeyConditionExpression': Key('TeacherId').eq(teacher_id) & Key('sortId').begins_with('CHAT#')}
+    messages = []
+    while True:
+        response = table.query(**kwargs)
+        for item in response['Items']:
+            conversation_id = item['sortId'].split('#')[1]
+            messages.append((conversation_id, item))
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    messages.sort(key=lambda m: int(m[1].get('created_at', 0)))
+    return messages
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the chat search index")
+    parser.add_argument("teacher_ids", nargs='+')
+    parser.add_argument("--rebuild", action="store_true", help="drop the teacher's existing index first")
+    args = parser.parse_args()
+    for teacher_id in args.teacher_ids:
+        if args.rebuild:
+            print(f"{teacher_id}: dropped {drop_index(teacher_id)} index items")
+        messages = teacher_messages(teacher_id)
+        indexed = set() if args.rebuild else indexed_message_keys(teacher_id)
+        todo = [m for m in messages if m[1]['sortId'] not in indexed]
+        print(f"{teacher_id}: indexed {bulk_index(teacher_id, todo)} of {len(messages)} messages "
+              f"({len(messages) - len(todo)} already indexed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import base64
+import json
+from chat_search_index import search
+
+MAX_PAGE_SIZE = 50
+
+def lambda_handler(event, context):
+    teacher_id = event['teacherId']
+    query = (event.get('query') or '').strip()
+    page_size = max(1, min(int(event.get('pageSize', 10)), MAX_PAGE_SIZE))
+    if not query:
+        return {'statusCode': 400, 'body': {'error': 'query is required'}}
+
+    # nextToken is opaque to the client: the ranked position to continue from, tied to the query
+    offset = 0
+    if event.get('nextToken'):
+        try:
+            token = json.loads(base64.urlsafe_b64decode(event['nextToken']))
+            if token['q'] == query:
+                offset = int(token['offset'])
+        except (ValueError, KeyError, TypeError):
+            return {'statusCode': 400, 'body': {'error': 'invalid nextToken'}}
+
+    result = search(teacher_id, query, page_size=page_size, offset=offset)
+    next_token = None
+    if result['nextOffset'] is not None:
+        next_token = base64.urlsafe_b64encode(json.dumps({'q': query, 'offset': result['nextOffset']}).encode()).decode()
+    return {
+        'statusCode': 200,
+        'body': {'hits': result['hits'], 'total': result['total'], 'nextToken': next_token}
+    }
@@ -0,0 +1,109 @@
+"""
+concise per-student briefings, read by the inference lambda instead of the full profile on the
+first turn of a student chat.
+
+stored on the student-profiles item, next to the profile it summarises:
+  - briefing: built from the profile alone (written at ingestion)
+  - teacher_briefings.<teacherID>: the profile plus that teacher's comments, regenerated after
+    editStudentProfile (comments stay private to their teacher, like in format_student_profile)
+each record carries a version (bumped on every rewrite) and comment_count, the number of the
+teacher's comments it covers. a write is conditional on the version it read and only lands if it
+covers at least as many comments as the stored one, so a slow regeneration can't replace a newer
+briefing and two concurrent ones can't both claim the same version.
+
+no boto3 here: callers pass invoke(body, model_id) -> parsed response body, so preprocessing can
+use its throttled bedrock_client and the lambda its layer client.
+"""
+import json, os, time
+from botocore.exceptions import ClientError
+
+BRIEFING_MODEL_ID = os.environ.get('BRIEFING_MODEL_ID', 'us.anthropic.claude-3-7-sonnet-20250219-v1:0')
+PROMPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts', '3_7_prompt_student_briefing.txt')
+
+# fields that are ours or per teacher, never part of the profile the briefing is built from
+NON_PROFILE_FIELDS = {'briefing', 'teacher_briefings', 'briefing_requests', 'teacherComments'}
+
+
+def build_briefing_prompt(profile, teacher_notes=()):
+    with open(PROMPT_PATH, 'r') as f:
+        template = f.read()
+    fields = {k: v for k, v in profile.items() if k not in NON_PROFILE_FIELDS}
+    notes = "\n".join(f"- {note}" for note in teacher_notes)
+    return (template
+            .replace("{{PROFILE_JSON}}", json.dumps(fields, indent=1, default=str))
+            .replace("{{TEACHER_NOTES}}", notes))
+
+
+def generate_briefing(profile, invoke, teacher_id=None, model_id=None):
+    """returns a briefing record (without version) for the profile, or for one teacher's view of it"""
+    model_id = model_id or BRIEFING_MODEL_ID
+    notes = list(((profile.get('teacherComments') or {}).get(teacher_id) or [])) if teacher_id else []
+    body = json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 1200,
+        "temperature": 0.2,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": build_briefing_prompt(profile, notes)}]}],
+    })
+    started = time.perf_counter()
+    response = invoke(body, model_id)
+    text = "".join(block.get("text", "") for block in response.get("content", []))
+    return {
+        'text': text.strip(),
+        'model_id': model_id,
+        'generated_at': int(time.time()),
+        'comment_count': len(notes),
+        'generation_ms': int((time.perf_counter() - started) * 1000),
+        'usage': {k: int(v) for k, v in response.get('usage', {}).items() if isinstance(v, int)},
+    }
+
+
+def _conditional_update(table, **update):
+    """False when the condition failed"""
+    try:
+        table.update_item(**update)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+
+def store_briefing(table, student_id, record, teacher_id=None, attempts=3):
+    """
+    writes the record with the next version. returns the stored version, or None when the item
+    already holds a briefing covering more of the teacher's comments
+    """
+    path = 'teacher_briefings.#t' if teacher_id else 'briefing'
+    names = {'#t': teacher_id} if teacher_id else {}
+    for _ in range(attempts):
+        item = table.get_item(Key={'studentID': student_id}, ConsistentRead=True).get('Item') or {}
+        current = (item.get('teacher_briefings') or {}).get(teacher_id) if teacher_id else item.get('briefing')
+        if current and int(current.get('comment_count', 0)) > record['comment_count']:
+            return None
+        versioned = {**record, 'version': int((current or {}).get('version', 0)) + 1}
+
+        if teacher_id and 'teacher_briefings' not in item:
+            # a nested SET needs the map to exist, create it with this teacher's briefing in it
+            if _conditional_update(table, Key={'studentID': student_id}, UpdateExpression='SET teacher_briefings = :m',
+                                   ConditionExpression='attribute_not_exists(teacher_briefings)',
+                                   ExpressionAttributeValues={':m': {teacher_id: versioned}}):
+                return versioned['version']
+            continue  # another teacher's briefing created the map first, read it again
+
+        # only replace exactly the briefing we read, a concurrent write makes us read again
+        values = {':b': versioned}
+        if current is None:
+            condition = f'attribute_not_exists({path})'
+        elif 'version' in current:
+            condition = f'{path}.version = :prev'
+            values[':prev'] = current['version']
+        else:
+            condition = f'attribute_not_exists({path}.version)'
+        update = {'Key': {'studentID': student_id}, 'UpdateExpression': f'SET {path} = :b',
+                  'ConditionExpression': condition, 'ExpressionAttributeValues': values}
+        if names:
+            update['ExpressionAttributeNames'] = names
+        if _conditional_update(table, **update):
+            return versioned['version']
+    print(f"Gave up storing briefing for {student_id}/{teacher_id or '-'} after {attempts} concurrent writes")
+    return None
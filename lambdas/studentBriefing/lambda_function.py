@@ -0,0 +1,52 @@
+import json
+import os
+from aws_clients import get_table, get_bedrock_client
+from briefing import generate_briefing, store_briefing
+
+STUDENT_PROFILES_TABLE = os.environ.get('STUDENT_PROFILES_TABLE', 'k12-coteacher-student-profiles')
+
+def invoke_bedrock(body, model_id):
+    response = get_bedrock_client().invoke_model(
+        modelId=model_id, contentType="application/json", accept="application/json", body=body
+    )
+    return json.loads(response["body"].read())
+
+# triggered by the briefing queue: editStudentProfile sends {"studentID", "teacherID", "requestedAt"}
+# with a BRIEFING_DEBOUNCE_SECONDS delay, so a burst of comments is only regenerated for the last one.
+# can also be invoked by hand with just {"studentID"} to rebuild the teacher-independent briefing
+def lambda_handler(event, context):
+    if 'Records' not in event:
+        return regenerate(event)
+    # failed messages go back to the queue on their own, the rest of the batch is done
+    failures = []
+    for record in event['Records']:
+        try:
+            regenerate(json.loads(record['body']))
+        except Exception as e:
+            print(f"Error regenerating briefing for message {record['messageId']}: {e}")
+            failures.append({'itemIdentifier': record['messageId']})
+    return {'batchItemFailures': failures}
+
+def regenerate(request):
+    table = get_table(STUDENT_PROFILES_TABLE)
+    student_id = request['studentID']
+    teacher_id = request.get('teacherID')
+    requested_at = request.get('requestedAt')
+
+    item = table.get_item(Key={'studentID': student_id}, ConsistentRead=True).get('Item')
+    if not item:
+        return {'statusCode': 404, 'body': json.dumps(f"No profile for {student_id}")}
+    if teacher_id and requested_at is not None:
+        latest = (item.get('briefing_requests') or {}).get(teacher_id)
+        if latest is not None and float(latest) > float(requested_at):
+            print(f"Skipping briefing for {student_id}/{teacher_id}, a newer edit will rebuild it")
+            return {'statusCode': 200, 'body': json.dumps({'skipped': True})}
+
+    record = generate_briefing(item, invoke_bedrock, teacher_id=teacher_id)
+    version = store_briefing(table, student_id, record, teacher_id=teacher_id)
+    print(f"Briefing for {student_id}/{teacher_id or '-'}: version {version}, {len(record['text'])} chars, "
+          f"{record['generation_ms']} ms")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'version': version, 'commentCount': record['comment_count']})
+    }
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Token usage report built from the inference lambda's usage ledger (see inference/usage_ledger.py).
+
+Reads the DAILY# roll-ups for the window (one query per day), then the TURN# records of every
+teacher seen in them, and prints the top teachers, classes, conversations, chat types and models
+by tokens with an estimated cost. Cost uses the list prices below, cache reads/writes included.
+
+usage:
+  python usage_report.py [--days 7] [--top 10]
+  python usage_report.py --days 30 --out usage_30d.json
+  python usage_report.py --endpoint-url http://localhost:8000 --table k12-coteacher-usage-ledger
+"""
+
+import argparse
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import boto3
+from boto3.dynamodb.conditions import Key
+
+# USD per million tokens: input, output, cache read, cache write
+PRICES = {
+    'us.anthropic.claude-3-7-sonnet-20250219-v1:0': (3.0, 15.0, 0.30, 3.75),
+    'us.anthropic.claude-3-5-sonnet-20241022-v2:0': (3.0, 15.0, 0.30, 3.75),
+    'us.anthropic.claude-3-5-haiku-20241022-v1:0': (0.8, 4.0, 0.08, 1.0),
+}
+DEFAULT_PRICE = (3.0, 15.0, 0.30, 3.75)
+TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens')
+
+def estimate_cost(model_id, usage):
+    price = PRICES.get(model_id, DEFAULT_PRICE)
+    return sum(int(usage.get(field, 0)) * p for field, p in zip(TOKEN_FIELDS, price)) / 1_000_000
+
+def query_all(table, **kwargs):
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def window_days(days):
+    today = datetime.now(timezone.utc).date()
+    return [(today - timedelta(days=n)).isoformat() for n in range(days)][::-1]
+
+def load_rollups(table, days):
+    """daily roll-up items for the window, {'TEACHER#..' / 'CLASS#..': summed counters}"""
+    totals = defaultdict(lambda: defaultdict(int))
+    for day in days:
+        for item in query_all(table, KeyConditionExpression=Key('pk').eq(f'DAILY#{day}')):
+            for k, v in item.items():
+                if k not in ('pk', 'sk'):
+                    totals[item['sk']][k] += int(v)
+    return totals
+
+def load_turns(table, teacher_ids, first_day):
+    for teacher_id in teacher_ids:
+        yield from query_all(table, KeyConditionExpression=Key('pk').eq(f'TEACHER#{teacher_id}') & Key('sk').gte(f'TURN#{first_day}'))
+
+def aggregate(turns):
+    groups = {name: defaultdict(lambda: defaultdict(float)) for name in ('teacher', 'class', 'conversation', 'chat_type', 'model', 'purpose')}
+    ttfts = []
+    for turn in turns:
+        cost = estimate_cost(turn['model'], turn)
+        keys = {
+            'teacher': turn['pk'].split('#', 1)[1],
+            'class': turn.get('class_id') or '-',
+            'conversation': turn.get('conversation_id') or '-',
+            'chat_type': turn.get('chat_type', '-'),
+            'model': turn['model'],
+            'purpose': turn.get('purpose', '-'),
+        }
+        for name, key in keys.items():
+            row = groups[name][key]
+            row['calls'] += 1
+            row['cost_usd'] += cost
+            row['latency_ms'] += int(turn.get('latency_ms', 0))
+            for field in TOKEN_FIELDS:
+                row[field] += int(turn.get(field, 0))
+        if turn.get('ttft_ms') is not None:
+            ttfts.append(int(turn['ttft_ms']))
+    return groups, ttfts
+
+def top_rows(group, n):
+    rows = sorted(group.items(), key=lambda kv: kv[1]['input_tokens'] + kv[1]['output_tokens'], reverse=True)
+    return [{'key': key, **{k: round(v, 4) for k, v in row.items()}} for key, row in rows[:n]]
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'key':<40} {'calls':>6} {'input':>10} {'output':>9} {'cache_rd':>9} {'avg_ms':>7} {'cost_usd':>9}")
+    for row in rows:
+        avg_ms = row['latency_ms'] / row['calls'] if row['calls'] else 0
+        print(f"  {str(row['key'])[:40]:<40} {int(row['calls']):>6} {int(row['input_tokens']):>10} {int(row['output_tokens']):>9} "
+              f"{int(row['cache_read_tokens']):>9} {avg_ms:>7.0f} {row['cost_usd']:>9.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the inference token usage ledger")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--table", default=os.environ.get('USAGE_TABLE', 'k12-coteacher-usage-ledger'))
+    parser.add_argument("--endpoint-url", default=os.environ.get("DYNAMODB_ENDPOINT_URL"))
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-west-2"))
+    parser.add_argument("--out", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb', region_name=args.region, endpoint_url=args.endpoint_url).Table(args.table)
+    days = window_days(args.days)
+    rollups = load_rollups(table, days)
+    teacher_ids = sorted(key.split('#', 1)[1] for key in rollups if key.startswith('TEACHER#'))
+    groups, ttfts = aggregate(load_turns(table, teacher_ids, days[0]))
+
+    total_calls = sum(v['calls'] for k, v in rollups.items() if k.startswith('TEACHER#'))
+    total_cost = sum(row['cost_usd'] for row in groups['model'].values())
+    print(f"Usage {days[0]} .. {days[-1]}: {total_calls} calls from {len(teacher_ids)} teachers, est. ${total_cost:.2f}")
+    if ttfts:
+        ttfts.sort()
+        print(f"time to first token: p50 {ttfts[len(ttfts) // 2]} ms, p95 {ttfts[int(len(ttfts) * 0.95)]} ms")
+
+    report = {'days': days, 'calls': total_calls, 'teachers': len(teacher_ids), 'cost_usd': round(total_cost, 4)}
+    for name in ('teacher', 'class', 'conversation', 'chat_type', 'model', 'purpose'):
+        report[name] = top_rows(groups[name], args.top)
+        print_table(f"Top by {name} (tokens)", report[name])
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.out}")
+
+if __name__ == "__main__":
+    main()
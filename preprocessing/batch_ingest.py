@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Resumable batch ingestion of IEPs + psych reports into student profiles.
+
+Inputs are either a directory with one sub-directory per student (the sub-directory name is the
+student ID; the IEP is the PDF with "iep" in its name, the psych report is the other PDF), or a
+CSV manifest with columns student_id,iep_path,psych_report_path.
+
+Every student is a job in a sqlite ledger. A crashed or interrupted run picks up where it left
+off: finished students are skipped, students that were mid-flight are redone. Students run on a
+worker pool while bedrock_client caps model calls across all of them.
+
+usage (from the repo root):
+  python preprocessing/batch_ingest.py --input-dir district_docs/ [--workers 4] [--bedrock-concurrency 8]
+  python preprocessing/batch_ingest.py --manifest students.csv --output-dir ingest_out --load
+"""
+import argparse, csv, json, os, sqlite3, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+
+import bedrock_client
+from merge_iep_and_report import process_student
+
+STUDENT_PROFILES_TABLE = "k12-coteacher-student-profiles"
+MAX_ATTEMPTS = 3
+
+class JobLedger:
+    """sqlite-backed job table: pending -> running -> done -> loaded (or failed, retried up to MAX_ATTEMPTS)"""
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    student_id TEXT PRIMARY KEY,
+                    iep_path TEXT,
+                    psych_path TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    output_path TEXT,
+                    duration_s REAL,
+                    updated_at REAL
+                )""")
+            # anything still "running" belongs to a run that died
+            self.conn.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+
+    def add(self, student_id, iep_path, psych_path):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (student_id, iep_path, psych_path, updated_at) VALUES (?, ?, ?, ?)",
+                (student_id, iep_path, psych_path, time.time()))
+
+    def runnable(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT student_id, iep_path, psych_path FROM jobs "
+                "WHERE status = 'pending' OR (status = 'failed' AND attempts < ?) ORDER BY student_id",
+                (MAX_ATTEMPTS,)).fetchall()
+
+    def mark(self, student_id, status, **fields):
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        sql = f"UPDATE jobs SET status = ?, updated_at = ?{', ' + assignments if assignments else ''}"
+        if status == "running":
+            sql += ", attempts = attempts + 1"
+        with self.lock, self.conn:
+            self.conn.execute(sql + " WHERE student_id = ?", (status, time.time(), *fields.values(), student_id))
+
+    def with_status(self, status):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT student_id, output_path FROM jobs WHERE status = ?", (status,)).fetchall()
+
+    def counts(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+def jobs_from_dir(input_dir):
+    for name in sorted(os.listdir(input_dir)):
+        student_dir = os.path.join(input_dir, name)
+        if not os.path.isdir(student_dir):
+            continue
+        pdfs = sorted(f for f in os.listdir(student_dir) if f.lower().endswith(".pdf"))
+        iep = next((f for f in pdfs if "iep" in f.lower()), None)
+        psych = next((f for f in pdfs if f != iep), None)
+        if not iep or not psych:
+            print(f"Skipping {name}: expected an IEP and a psych report PDF, found {pdfs}")
+            continue
+        yield name, os.path.join(student_dir, iep), os.path.join(student_dir, psych)
+
+def jobs_from_manifest(manifest_path):
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row["student_id"].strip(), row["iep_path"].strip(), row["psych_report_path"].strip()
+
+def ingest_student(student_id, iep_path, psych_path, output_root):
+    output_dir = os.path.join(output_root, student_id)
+    process_student(iep_path, psych_path, student_id, output_dir=output_dir)
+    return os.path.join(output_dir, f"{student_id}_final_student_profile.json")
+
+# written by the app after ingestion, a re-ingest must not touch them
+APP_FIELDS = ("teacherComments", "teacher_briefings", "briefing_requests")
+
+def update_profile(table, student_id, profile, briefing=None, attempts=3):
+    """SETs the extracted fields (and the briefing, with the next version) on the student's item, leaving the rest alone"""
+    fields = {k: v for k, v in profile.items() if k != "studentID" and k not in APP_FIELDS}
+    names = {f"#f{i}": k for i, k in enumerate(fields)}
+    values = {f":f{i}": v for i, v in enumerate(fields.values())}
+    update = {"Key": {"studentID": student_id}, "ExpressionAttributeNames": names}
+    if briefing is None:
+        if fields:
+            table.update_item(UpdateExpression="SET " + ", ".join(f"#f{i} = :f{i}" for i in range(len(fields))),
+                              ExpressionAttributeValues=values, **update)
+        return True
+    from botocore.exceptions import ClientError
+    for _ in range(attempts):
+        current = (table.get_item(Key={"studentID": student_id}, ConsistentRead=True).get("Item") or {}).get("briefing")
+        # same version guard as studentBriefing's store_briefing, a concurrent regeneration makes us read again
+        briefing_values = {":b": {**briefing, "version": int((current or {}).get("version", 0)) + 1}}
+        if current is None:
+            condition = "attribute_not_exists(briefing)"
+        elif "version" in current:
+            condition = "briefing.version = :prev"
+            briefing_values[":prev"] = current["version"]
+        else:
+            condition = "attribute_not_exists(briefing.version)"
+        try:
+            table.update_item(
+                UpdateExpression="SET " + ", ".join([f"#f{i} = :f{i}" for i in range(len(fields))] + ["briefing = :b"]),
+                ConditionExpression=condition, ExpressionAttributeValues={**values, **briefing_values}, **update)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+    print(f"Gave up loading {student_id} after {attempts} concurrent briefing writes")
+    return False
+
+def load_profiles(ledger, table_name=STUDENT_PROFILES_TABLE):
+    """writes every finished profile into dynamo and marks it loaded. teacher comments and per-teacher briefings already on the item are kept"""
+    import boto3
+    done = ledger.with_status("done")
+    if not done:
+        return 0
+    table = boto3.resource("dynamodb").Table(table_name)
+    loaded = 0
+    for student_id, output_path in done:
+        with open(output_path) as f:
+            profile = json.load(f, parse_float=Decimal)
+        # the briefing is written next to the final profile (profile.briefing stage)
+        briefing = None
+        briefing_path = os.path.join(os.path.dirname(output_path), f"{student_id}_briefing.json")
+        if os.path.exists(briefing_path):
+            with open(briefing_path) as f:
+                briefing = json.load(f, parse_float=Decimal)
+        if update_profile(table, student_id, profile, briefing):
+            ledger.mark(student_id, "loaded")
+            loaded += 1
+    return loaded
+
+def format_eta(seconds):
+    if seconds is None:
+        return "?"
+    return time.strftime("%H:%M:%S", time.gmtime(seconds))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir")
+    source.add_argument("--manifest")
+    parser.add_argument("--output-dir", default="ingest_output")
+    parser.add_argument("--ledger", default=None, help="defaults to <output-dir>/ledger.db")
+    parser.add_argument("--workers", type=int, default=4, help="students processed at once")
+    parser.add_argument("--bedrock-concurrency", type=int, default=bedrock_client.BEDROCK_MAX_CONCURRENCY,
+                        help="model calls in flight across all students")
+    parser.add_argument("--load", action="store_true", help=f"bulk-load finished profiles into {STUDENT_PROFILES_TABLE}")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    ledger = JobLedger(args.ledger or os.path.join(args.output_dir, "ledger.db"))
+    jobs = jobs_from_dir(args.input_dir) if args.input_dir else jobs_from_manifest(args.manifest)
+    for student_id, iep_path, psych_path in jobs:
+        ledger.add(student_id, iep_path, psych_path)
+
+    bedrock_client.set_max_concurrency(args.bedrock_concurrency)
+    todo = ledger.runnable()
+    print(f"Ledger: {ledger.counts()} - {len(todo)} students to process "
+          f"({args.workers} workers, {args.bedrock_concurrency} concurrent model calls)\n")
+
+    start = time.time()
+    finished = 0
+    failed = 0
+
+    def run(job):
+        student_id, iep_path, psych_path = job
+        ledger.mark(student_id, "running")
+        t = time.time()
+        try:
+            output_path = ingest_student(student_id, iep_path, psych_path, args.output_dir)
+            ledger.mark(student_id, "done", output_path=output_path, duration_s=time.time() - t, error=None)
+            return True
+        except Exception as e:
+            ledger.mark(student_id, "failed", error=str(e), duration_s=time.time() - t)
+            print(f"Error ingesting {student_id}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run, job) for job in todo]
+        for future in as_completed(futures):
+            if future.result():
+                finished += 1
+            else:
+                failed += 1
+            elapsed = time.time() - start
+            rate = (finished + failed) / elapsed if elapsed else 0
+            remaining = len(todo) - finished - failed
+            eta = remaining / rate if rate else None
+            print(f"[{finished + failed}/{len(todo)}] {finished} ok, {failed} failed - "
+                  f"{rate * 60:.1f} students/min, ETA {format_eta(eta)}")
+
+    if args.load:
+        loaded = load_profiles(ledger)
+        print(f"Loaded {loaded} profiles into {STUDENT_PROFILES_TABLE}")
+    print(f"\nDone in {format_eta(time.time() - start)}. Ledger: {ledger.counts()}")
+    if failed:
+        print("Rerun the same command to retry failed students.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
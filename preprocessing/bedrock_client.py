@@ -0,0 +1,67 @@
+import json, os, random, threading, time
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# one cached bedrock client for the whole preprocessing run instead of one per page/chunk
+BEDROCK_CONFIG = Config(
+    region_name="us-west-2",
+    connect_timeout=5,
+    read_timeout=300,
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    # throttling is retried below with longer backoff, keep botocore's own retries short
+    retries={"mode": "standard", "max_attempts": 2},
+)
+
+# process-wide cap on in-flight model calls, shared by every worker pool in the run
+BEDROCK_MAX_CONCURRENCY = int(os.environ.get("BEDROCK_MAX_CONCURRENCY", "8"))
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelTimeoutException",
+    "InternalServerException",
+}
+
+_bedrock = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(BEDROCK_MAX_CONCURRENCY)
+
+def get_bedrock_client():
+    global _bedrock
+    if _bedrock is None:
+        with _client_lock:
+            if _bedrock is None:
+                _bedrock = boto3.client(service_name="bedrock-runtime", config=BEDROCK_CONFIG)
+    return _bedrock
+
+def set_max_concurrency(n):
+    """resize the global in-flight cap (call before starting any workers)"""
+    global _slots, BEDROCK_MAX_CONCURRENCY
+    BEDROCK_MAX_CONCURRENCY = n
+    _slots = threading.BoundedSemaphore(n)
+
+def invoke_model(body, model_id, max_retries=6, base_delay=1.0, max_delay=30.0):
+    """
+    invoke_model with the global concurrency cap and exponential backoff (full jitter) on throttling.
+    returns the parsed response body
+    """
+    bedrock = get_bedrock_client()
+    for attempt in range(max_retries + 1):
+        try:
+            with _slots:
+                response = bedrock.invoke_model(
+                    modelId=model_id,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=body
+                )
+                return json.loads(response["body"].read().decode("utf-8"))
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in RETRYABLE_ERRORS or attempt == max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            print(f"Bedrock {code}, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
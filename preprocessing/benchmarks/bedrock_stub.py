@@ -0,0 +1,227 @@
+"""
+local stand-in for the bedrock-runtime client, used by the preprocessing benchmarks.
+install() swaps it in for bedrock_client's cached client so no AWS calls are made.
+RecordingBedrock / ReplayBedrock record real calls to a cassette and replay them offline.
+"""
+import hashlib, io, json, math, os, random, threading, time
+from botocore.exceptions import ClientError
+
+EMPTY_IEP_PARTIAL = {"student_profile_partial": {"iep_goals": [], "accommodations": [], "services": [], "placement": ""}}
+
+class StubBedrock:
+    def __init__(self, latency_s=1.5, jitter=0.3, throttle_rate=0.0, max_concurrent=None, response=EMPTY_IEP_PARTIAL, seed=0,
+                 malformed_rate=0.0):
+        self.latency_s = latency_s
+        # fraction of first answers that break the tool schema (repair turns always come back valid)
+        self.malformed_rate = malformed_rate
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        # simulates the account quota: more concurrent calls than this get throttled
+        self.max_concurrent = max_concurrent
+        self.response = response
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+
+    def _throttle(self):
+        with self.lock:
+            self.throttled += 1
+        raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, "InvokeModel")
+
+    def invoke_model(self, modelId, body, contentType=None, accept=None):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            over_quota = self.max_concurrent is not None and self.in_flight > self.max_concurrent
+            throttle = over_quota or self.rng.random() < self.throttle_rate
+            malformed = self.rng.random() < self.malformed_rate
+            delay = max(0.0, self.rng.gauss(self.latency_s, self.latency_s * self.jitter))
+        try:
+            if throttle:
+                self._throttle()
+            time.sleep(delay)
+            answer = self.response(modelId, body) if callable(self.response) else self.response
+            request = json.loads(body)
+            if malformed and len(request["messages"]) == 1:
+                answer = {"student_profile_partial": {"iep_goals": "goals as one string", "accommodations": [None]}}
+            text = json.dumps(answer)
+            if request.get("tool_choice", {}).get("type") == "tool":
+                # forced tool use: the answer comes back as the tool's input
+                content = [{"type": "tool_use", "id": f"toolu_{self.calls}", "name": request["tool_choice"]["name"], "input": answer}]
+            else:
+                content = [{"type": "text", "text": text}]
+            payload = {"content": content, "usage": estimate_usage(body, text)}
+            return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+def estimate_usage(body, response_text):
+    """rough token counts so reports built on usage aren't all zeros: ~4 chars/token, ~1600 per image"""
+    request = json.loads(body)
+    input_tokens = len(request.get("system", "")) // 4 if isinstance(request.get("system"), str) else 0
+    for message in request.get("messages", []):
+        content = message["content"]
+        if isinstance(content, str):
+            input_tokens += len(content) // 4
+            continue
+        for block in content:
+            if block.get("type") == "image":
+                input_tokens += 1600
+            elif block.get("type") == "text":
+                input_tokens += len(block["text"]) // 4
+            else:
+                input_tokens += len(json.dumps(block)) // 4
+    return {"input_tokens": input_tokens, "output_tokens": len(response_text) // 4}
+
+def install(stub):
+    import bedrock_client
+    bedrock_client._bedrock = stub
+    return stub
+
+# record / replay ==========================
+# a cassette is a jsonl file, one recorded call per line:
+#   {"key": sha256 of model id + request body, "kind": see request_kind, "model_id", "latency_s", "payload": response body}
+
+# (median seconds, lognormal sigma) per kind of call when there is no recording to sample from,
+# roughly what claude 3.5/3.7 sonnet take on bedrock for these prompts
+DEFAULT_LATENCIES = {
+    "iep_text": (2.5, 0.35),
+    "iep_vision": (4.5, 0.35),
+    "psych": (10.0, 0.3),
+    "briefing": (8.0, 0.3),
+    "other": (3.0, 0.4),
+}
+
+def request_key(model_id, body):
+    return hashlib.sha256(f"{model_id}\0{body}".encode("utf-8")).hexdigest()
+
+def request_kind(body):
+    """iep_text / iep_vision / psych / briefing / other, from the tool forced in the request"""
+    request = json.loads(body) if isinstance(body, str) else body
+    tool = request.get("tool_choice", {}).get("name")
+    first = request["messages"][0]["content"]
+    if tool == "record_iep_page":
+        has_image = isinstance(first, list) and any(b.get("type") == "image" for b in first)
+        return "iep_vision" if has_image else "iep_text"
+    if tool == "record_psych_report_chunk":
+        return "psych"
+    if not request.get("tools"):
+        text = first if isinstance(first, str) else " ".join(b.get("text", "") for b in first)
+        return "briefing" if "briefing" in text[:400] else "other"
+    return "other"
+
+def synthetic_answer(kind, rng):
+    """a small schema-valid answer for calls without a recording"""
+    n = rng.randint(1, 3)
+    if kind in ("iep_text", "iep_vision"):
+        return {"student_profile_partial": {
+            "iep_goals": [f"Goal {rng.randint(1, 40)}: the student will read grade-level text with {rng.choice([70, 80, 90])}% accuracy" for _ in range(n)],
+            "accommodations": [rng.choice(["Extended time (1.5x)", "Preferential seating", "Graphic organizers", "Breaks as needed"]) for _ in range(n)],
+            "services": [{"type": "Specialized reading instruction", "frequency": "3x30 min weekly", "start_date": None, "end_date": None}],
+            "placement": "General education with resource support",
+        }}
+    if kind == "psych":
+        return {"key_iep_sections": {"summary": "Average cognitive ability with weaknesses in phonological processing."},
+                "student_profile_partial": {
+                    "first_name": "Alex", "last_name": "Sample", "student_id": None,
+                    "iep_goals": [], "accommodations": ["Text-to-speech for long passages"] * n,
+                    "learning_styles": ["Visual"], "disabilities": [{"type": "specific_learning_disability", "name": "Dyslexia"}],
+                    "interviews": {"parent": "Reports homework takes a long time."}, "observations": {"classroom": "On task with prompts."},
+                }}
+    if kind == "briefing":
+        return "Student: Alex Sample, grade 4\n\n**Disabilities**\n- Dyslexia\n\n**Accommodations**\n- Extended time (1.5x)"
+    return {}
+
+def _response_payload(request, answer, calls):
+    text = answer if isinstance(answer, str) else json.dumps(answer)
+    if request.get("tool_choice", {}).get("type") == "tool":
+        content = [{"type": "tool_use", "id": f"toolu_{calls}", "name": request["tool_choice"]["name"], "input": answer}]
+    else:
+        content = [{"type": "text", "text": text}]
+    return {"content": content, "usage": estimate_usage(json.dumps(request), text)}
+
+class RecordingBedrock:
+    """wraps a real bedrock-runtime client and appends every call (response and latency) to a cassette"""
+    def __init__(self, client, cassette_path):
+        self.client = client
+        self.cassette_path = cassette_path
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.calls_by_kind = {}
+        self.model_seconds = 0.0
+
+    def invoke_model(self, modelId, body, contentType=None, accept=None):
+        start = time.perf_counter()
+        response = self.client.invoke_model(modelId=modelId, body=body, contentType=contentType, accept=accept)
+        raw = response["body"].read()
+        latency = time.perf_counter() - start
+        kind = request_kind(body)
+        record = {"key": request_key(modelId, body), "kind": kind, "model_id": modelId,
+                  "latency_s": round(latency, 4), "payload": json.loads(raw)}
+        with self.lock:
+            self.calls += 1
+            self.calls_by_kind[kind] = self.calls_by_kind.get(kind, 0) + 1
+            self.model_seconds += latency
+            with open(self.cassette_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        return {"body": io.BytesIO(raw)}
+
+class ReplayBedrock(StubBedrock):
+    """
+    answers from a cassette. a recorded request gets its recorded response after its recorded latency;
+    anything else gets a synthetic answer after a latency drawn from the recordings of the same kind
+    (DEFAULT_LATENCIES when there are none). latency_scale shrinks or stretches every wait.
+    counts calls per kind and replay hits/misses
+    """
+    def __init__(self, cassette_path=None, latency_scale=1.0, max_concurrent=None, seed=0):
+        super().__init__(max_concurrent=max_concurrent, seed=seed)
+        self.latency_scale = latency_scale
+        self.recorded = {}
+        self.latencies = {}
+        if cassette_path and os.path.exists(cassette_path):
+            with open(cassette_path, encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.recorded[record["key"]] = record
+                    self.latencies.setdefault(record["kind"], []).append(record["latency_s"])
+        self.calls_by_kind = {}
+        self.replayed = 0
+        self.synthesized = 0
+        self.model_seconds = 0.0
+
+    def _latency(self, kind):
+        if self.latencies.get(kind):
+            return self.rng.choice(self.latencies[kind])
+        median, sigma = DEFAULT_LATENCIES.get(kind, DEFAULT_LATENCIES["other"])
+        return self.rng.lognormvariate(math.log(median), sigma)
+
+    def invoke_model(self, modelId, body, contentType=None, accept=None):
+        request = json.loads(body)
+        kind = request_kind(request)
+        record = self.recorded.get(request_key(modelId, body))
+        with self.lock:
+            self.calls += 1
+            self.calls_by_kind[kind] = self.calls_by_kind.get(kind, 0) + 1
+            self.in_flight += 1
+            over_quota = self.max_concurrent is not None and self.in_flight > self.max_concurrent
+            if record:
+                self.replayed += 1
+                delay = record["latency_s"]
+            else:
+                self.synthesized += 1
+                delay = self._latency(kind)
+                answer = synthetic_answer(kind, self.rng)
+            delay *= self.latency_scale
+            self.model_seconds += delay
+        try:
+            if over_quota:
+                self._throttle()
+            time.sleep(delay)
+            payload = record["payload"] if record else _response_payload(request, answer, self.calls)
+            return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
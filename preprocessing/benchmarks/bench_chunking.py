@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare psych report chunking: fixed 5-page chunks vs token-budget packing at section headings.
+
+Reports chunk count, token distribution (estimated, ~4 chars/token), how many chunks are over
+budget, and how many chunks start at a section heading. Pass report PDFs, or run without
+arguments to use a generated report with uneven page density and section headings.
+
+  python preprocessing/benchmarks/bench_chunking.py [--budget 6000] [report.pdf ...]
+"""
+import os, random, statistics, sys, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fitz
+from extract_psych_reports import (
+    CHUNK_TOKEN_BUDGET, estimate_tokens, extract_report_pages, pack_chunks, prepare_fixed_page_chunks
+)
+
+SECTIONS = [
+    "REASON FOR REFERRAL", "BACKGROUND INFORMATION", "HEALTH AND DEVELOPMENTAL HISTORY",
+    "TEACHER INTERVIEW", "PARENT INTERVIEW", "CLASSROOM OBSERVATION", "COGNITIVE ASSESSMENT",
+    "ACADEMIC ACHIEVEMENT", "SOCIAL-EMOTIONAL FUNCTIONING", "ELIGIBILITY CONSIDERATIONS", "RECOMMENDATIONS",
+]
+
+def make_sample_report(path, seed=0):
+    """pages range from nearly empty (signature/score pages) to dense prose"""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    page, y = doc.new_page(), 60
+    for section in SECTIONS:
+        for paragraph in range(rng.randint(2, 9)):
+            if paragraph == 0:
+                if y > 700:
+                    page, y = doc.new_page(), 60
+                page.insert_text((50, y), section, fontsize=13, fontname="helvetica-bold")
+                y += 24
+            words = rng.randint(20, 220)
+            text = " ".join(rng.choice(["student", "scores", "reading", "attention", "average", "demonstrated",
+                                        "classroom", "assessment", "fluency", "working", "memory"]) for _ in range(words)) + "."
+            height = 14 * (len(text) // 95 + 2)
+            if y + height > 790 or rng.random() < 0.08:
+                page, y = doc.new_page(), 60
+            page.insert_textbox(fitz.Rect(50, y, 560, y + height), text, fontsize=10)
+            y += height + 6
+    doc.save(path)
+    return path
+
+def describe(name, chunks, budget):
+    tokens = [estimate_tokens(c) for c in chunks]
+    headings = set(SECTIONS)
+    starts_at_heading = sum(1 for c in chunks if c.split("\n")[2:3] and c.split("\n")[2].strip() in headings)
+    print(f"  {name:<14}{len(chunks):>7}{min(tokens):>8}{int(statistics.median(tokens)):>8}{max(tokens):>8}"
+          f"{sum(tokens):>9}{sum(t > budget for t in tokens):>7}{starts_at_heading:>10}")
+
+def main():
+    budget = int(sys.argv[sys.argv.index("--budget") + 1]) if "--budget" in sys.argv else CHUNK_TOKEN_BUDGET
+    pdfs = [a for a in sys.argv[1:] if a.lower().endswith(".pdf")]
+    if not pdfs:
+        pdfs = [make_sample_report(os.path.join(tempfile.mkdtemp(), "synthetic_report.pdf"))]
+
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            page_count = len(doc)
+        print(f"{os.path.basename(pdf)} ({page_count} pages, budget {budget} tokens)")
+        print(f"  {'method':<14}{'chunks':>7}{'min':>8}{'median':>8}{'max':>8}{'total':>9}{'over':>7}{'@heading':>10}")
+        describe("fixed 5 pages", prepare_fixed_page_chunks(pdf), budget)
+        describe("token budget", pack_chunks(extract_report_pages(pdf), budget), budget)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Size and token reduction from near-duplicate collapsing, measured on real extraction outputs.
+
+  stored profiles   list lengths and estimated tokens (~4 chars/token) of each extracted profile JSON,
+                    exact-match dedupe vs near_dupes.collapse_near_duplicates
+  pooled wordings   every goal/accommodation/learning style from all the profiles in sample_data, per
+                    field; different extractions word the same item differently ("Advance notice of
+                    schedule changes" / "... of changes in routine or schedule"), so this is where
+                    restatements show up. Every merged cluster is printed for review
+  labelled pairs    LABELLED_PAIRS, taken from those wordings: pairs that must merge and pairs that
+                    must stay apart (negation, subject, numbers); any mistake is listed
+
+  python preprocessing/benchmarks/bench_dedup.py [--threshold 0.5] [profile.json ...]
+"""
+import glob, json, os, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from near_dupes import DEDUP_THRESHOLD, cluster_near_duplicates, collapse_near_duplicates
+
+LIST_FIELDS = ["iep_goals", "accommodations", "learning_styles"]
+SAMPLE_DATA = os.path.join(HERE, "..", "..", "sample_data")
+DEFAULT_PROFILES = [os.path.join(SAMPLE_DATA, "*_extracted_output", "*_final_student_profile.json"),
+                    os.path.join(SAMPLE_DATA, "sample-student-profiles", "*", "*.json")]
+
+# (a, b, should merge)
+LABELLED_PAIRS = [
+    ("Advance notice of changes in routine or schedule", "Advance notice of schedule changes", True),
+    ("Allow extra processing time for verbal responses", "Extra time for verbal responses", True),
+    ("Quiet space available for breaks when overwhelmed", "Quiet space for breaks when overwhelmed", True),
+    ("Extra time for reading assignments", "Extended time for reading tasks", True),
+    ("Extended time on tests", "Extra time for tests and quizzes", True),
+    ("responds well to visual schedules and checklists", "responds well to visual schedules", True),
+    ("Allow use of a calculator on math tests", "Do not allow use of a calculator on math tests", False),
+    ("Not to participate in ELA testing (Outside Testing Group or Plan Type 200)",
+     "Not to participate in Math testing (Outside Testing Group or Plan Type 200)", False),
+    ("Movement breaks every 20 minutes (Across all instructional environments)", "Movement breaks every 30 minutes", False),
+    ("Modified ELA testing with audio format", "Modified ELA testing with extended time", False),
+    ("Testing accommodations for Science and Social Studies", "Testing accommodations for Science", False),
+    ("Check-ins with counselor twice weekly", "Regular check-ins with counselor", False),
+    ("Produce /th/ in medial position of words in 10 sentences with 80% accuracy",
+     "Produce /l/ in medial position of words in 10 sentences with 80% accuracy", False),
+]
+
+def tokens(obj):
+    return len(json.dumps(obj)) // 4
+
+def exact_dedupe(items):
+    return collapse_near_duplicates(items, threshold=1.1)  # nothing reaches 1.1, so exact matches only
+
+def main():
+    args = sys.argv[1:]
+    threshold = DEDUP_THRESHOLD
+    if "--threshold" in args:
+        threshold = float(args[args.index("--threshold") + 1])
+        del args[args.index("--threshold"):args.index("--threshold") + 2]
+    paths = args or sorted(p for pattern in DEFAULT_PROFILES for p in glob.glob(pattern))
+    print(f"threshold {threshold}, {len(paths)} profiles\n")
+
+    print("stored profiles")
+    before_total, after_total = 0, 0
+    pooled = {field: [] for field in LIST_FIELDS}
+    for path in paths:
+        with open(path) as f:
+            profile = json.load(f)
+        exact, collapsed = dict(profile), dict(profile)
+        removed = []
+        for field in LIST_FIELDS:
+            items = profile.get(field) or []
+            pooled[field].extend(items)
+            exact[field] = exact_dedupe(items)
+            collapsed[field] = collapse_near_duplicates(items, threshold)
+            removed.append(f"{field} {len(exact[field])} -> {len(collapsed[field])}")
+        before_total += tokens(exact)
+        after_total += tokens(collapsed)
+        print(f"  {os.path.basename(path):<36} {', '.join(removed)}, tokens {tokens(exact)} -> {tokens(collapsed)}")
+    print(f"  all profiles: {before_total} -> {after_total} tokens "
+          f"({100 * (1 - after_total / before_total) if before_total else 0:.1f}% smaller)\n")
+
+    print("pooled wordings")
+    for field in LIST_FIELDS:
+        items = exact_dedupe(pooled[field])
+        clusters = cluster_near_duplicates(items, threshold)
+        print(f"  {field:<16}{len(items):>4} -> {len(clusters)}")
+        for canonical, members in clusters.items():
+            for i in members:
+                if i != canonical:
+                    print(f"    {items[i]!r}\n      -> {items[canonical]!r}")
+    print()
+
+    mistakes = []
+    for a, b, should_merge in LABELLED_PAIRS:
+        merged = len(cluster_near_duplicates([a, b], threshold)) == 1
+        if merged != should_merge:
+            mistakes.append(f"{'kept apart' if should_merge else 'merged'}: {a!r} / {b!r}")
+    print(f"labelled pairs: {len(LABELLED_PAIRS) - len(mistakes)}/{len(LABELLED_PAIRS)} correct")
+    for mistake in mistakes:
+        print(f"  {mistake}")
+
+if __name__ == "__main__":
+    main()
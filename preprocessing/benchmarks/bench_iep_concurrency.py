@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent page extraction in extract_iep against the local Bedrock stub.
+
+Builds N placeholder page images, then runs extract_pages with 1..W workers while the stub
+sleeps ~latency per call and throttles above its simulated quota. Run from the repo root:
+
+  python preprocessing/benchmarks/bench_iep_concurrency.py [--pages 40] [--latency 1.5] [--quota 8]
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bedrock_client
+import extract_iep
+from bedrock_stub import StubBedrock, install
+
+def arg(name, default, cast):
+    return cast(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+def main():
+    pages = arg("--pages", 40, int)
+    latency = arg("--latency", 1.5, float)
+    quota = arg("--quota", 8, int)
+
+    # placeholder page images, the stub never looks at them
+    rendered = [
+        {"page": i + 1, "route": "vision", "text": "", "image": os.urandom(64 * 1024), "media_type": "image/png"}
+        for i in range(pages)
+    ]
+
+    print(f"{pages} pages, ~{latency}s per call, stub quota {quota} concurrent calls\n")
+    print(f"{'workers':>8}{'wall s':>10}{'pages/s':>10}{'calls':>8}{'throttled':>11}{'ok pages':>10}")
+    for workers in (1, 2, 4, 8, 16):
+        stub = install(StubBedrock(latency_s=latency, max_concurrent=quota))
+        # cap follows the pool size so the rows above the quota show throttling + backoff
+        bedrock_client.set_max_concurrency(workers)
+        start = time.perf_counter()
+        results = extract_iep.extract_pages(rendered, max_workers=workers)
+        wall = time.perf_counter() - start
+        ok = sum(parsed is not None for parsed, _ in results)
+        print(f"{workers:>8}{wall:>10.1f}{pages / wall:>10.2f}{stub.calls:>8}{stub.throttled:>11}{ok:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Peak RSS and per-page time for IEP page rendering, before and after the streaming renderer.
+
+  before: pdf2image.convert_from_path at 200 DPI -> PNG files on disk -> read back -> base64
+  after:  extract_iep.render_pdf_pages (PyMuPDF, grayscale, long edge 1568px, in memory) -> base64
+
+Each method runs in its own subprocess so peak RSS isn't shared. Pass PDFs, or --pages N to
+generate a synthetic text-heavy PDF. "before" needs pdf2image + poppler and is skipped without them.
+
+  python preprocessing/benchmarks/bench_page_rendering.py [--pages 40] [file.pdf ...]
+"""
+import base64, json, os, resource, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PREPROCESSING_DIR = os.path.join(HERE, "..")
+
+def make_sample_pdf(path, pages):
+    import fitz
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = f"Annual Goal {i + 1}: " + "The student will read grade-level text with 80% accuracy. " * 40
+        page.insert_textbox(fitz.Rect(50, 50, 560, 800), text, fontsize=10)
+    doc.save(path)
+    return path
+
+def run_before(pdf_path):
+    from pdf2image import convert_from_path
+    out_dir = tempfile.mkdtemp()
+    times, sizes = [], []
+    start = time.perf_counter()
+    images = convert_from_path(pdf_path, dpi=200)
+    render_all = time.perf_counter() - start
+    for i, image in enumerate(images):
+        t = time.perf_counter()
+        path = os.path.join(out_dir, f"page_{i+1}.png")
+        image.save(path, "PNG")
+        with open(path, "rb") as f:
+            encoded = base64.b64encode(f.read())
+        sizes.append(len(encoded))
+        times.append(time.perf_counter() - t + render_all / len(images))
+    return times, sizes
+
+def run_after(pdf_path):
+    sys.path.insert(0, PREPROCESSING_DIR)
+    from extract_iep import render_pdf_pages
+    times, sizes = [], []
+    t = time.perf_counter()
+    for _, image_bytes, _ in render_pdf_pages(pdf_path):
+        encoded = base64.b64encode(image_bytes)
+        sizes.append(len(encoded))
+        times.append(time.perf_counter() - t)
+        t = time.perf_counter()
+    return times, sizes
+
+def child(method, pdf_path):
+    times, sizes = (run_before if method == "before" else run_after)(pdf_path)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "pages": len(times),
+        "ms_per_page": 1000 * sum(times) / len(times),
+        "kb_per_page": sum(sizes) / len(sizes) / 1024,
+        "peak_rss_mb": peak_mb,
+    }))
+
+def main():
+    if "--child" in sys.argv:
+        child(sys.argv[2], sys.argv[3])
+        return
+
+    pages = int(sys.argv[sys.argv.index("--pages") + 1]) if "--pages" in sys.argv else 40
+    pdfs = [a for a in sys.argv[1:] if a.lower().endswith(".pdf")]
+    if not pdfs:
+        pdfs = [make_sample_pdf(os.path.join(tempfile.mkdtemp(), f"synthetic_{pages}p.pdf"), pages)]
+
+    # prompt loading in extract_iep uses paths relative to the repo root
+    repo_root = os.path.abspath(os.path.join(PREPROCESSING_DIR, ".."))
+    print(f"{'pdf':<28}{'method':<8}{'pages':>6}{'ms/page':>10}{'KB/page':>10}{'peak RSS MB':>13}")
+    for pdf in pdfs:
+        for method in ("before", "after"):
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", method, os.path.abspath(pdf)],
+                cwd=repo_root, capture_output=True, text=True
+            )
+            name = os.path.basename(pdf)[:26]
+            if proc.returncode != 0:
+                reason = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                print(f"{name:<28}{method:<8}  skipped ({reason})")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{name:<28}{method:<8}{r['pages']:>6}{r['ms_per_page']:>10.1f}{r['kb_per_page']:>10.0f}{r['peak_rss_mb']:>13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the preprocessing pipeline (extract_iep + extract_psych_reports +
+merge_iep_and_report stages) without live Bedrock.
+
+Generates a seeded corpus of multi-page IEP + psych report pairs in three flavours:
+  text     born-digital pages with a text layer
+  scanned  every page is a rasterized image with no text layer
+  mixed    every third page scanned
+then runs each pair through the merge_iep_and_report stages in its own subprocess (so peak RSS
+isn't shared) with a replaying Bedrock stub (see bedrock_stub.ReplayBedrock): recorded requests get
+their recorded response and latency, the rest a synthetic answer after a latency sampled from the
+recordings of the same kind of call. --record runs against real Bedrock and appends to the cassette.
+
+Per document: end-to-end profile latency, pages/sec, Bedrock calls by kind, peak RSS, stage
+timings, and the time spent rendering page images, encoding requests (base64 + request json) and
+parsing PDFs (text layer / layout). Phase times are summed over worker threads, so they can add
+up to more than the wall time. Results go to JSON; --compare diffs two result files.
+Run from the repo root (prompts are loaded relative to it):
+
+  python preprocessing/benchmarks/bench_pipeline.py [--docs 2] [--iep-pages 12] [--report-pages 24] [--out bench.json]
+  python preprocessing/benchmarks/bench_pipeline.py --replay cassette.jsonl --latency-scale 0.1 --out after.json
+  python preprocessing/benchmarks/bench_pipeline.py --record cassette.jsonl --docs 1      # live Bedrock
+  python preprocessing/benchmarks/bench_pipeline.py --compare before.json after.json
+"""
+import argparse, json, os, random, resource, statistics, subprocess, sys, tempfile, threading, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PREPROCESSING_DIR = os.path.join(HERE, "..")
+REPO_ROOT = os.path.abspath(os.path.join(PREPROCESSING_DIR, ".."))
+KINDS = ("text", "scanned", "mixed")
+
+GOALS = ["read grade-level passages at {n} words per minute", "solve two-step word problems with {n}% accuracy",
+         "write a five-sentence paragraph with a topic sentence in {n} of 5 trials",
+         "use a checklist to start independent work within {n} minutes"]
+ACCOMMODATIONS = ["Extended time (1.5x) on tests and quizzes", "Preferential seating near instruction",
+                  "Graphic organizers for writing tasks", "Text-to-speech for passages over one page",
+                  "Breaks as needed, up to {n} minutes", "Directions read aloud and repeated"]
+REPORT_SECTIONS = ["REASON FOR REFERRAL", "BACKGROUND INFORMATION", "COGNITIVE ASSESSMENT", "ACADEMIC ACHIEVEMENT",
+                   "PHONOLOGICAL PROCESSING", "PARENT INTERVIEW", "TEACHER INTERVIEW", "CLASSROOM OBSERVATION",
+                   "SUMMARY AND RECOMMENDATIONS"]
+
+# corpus ==========================
+
+def _iep_page_text(rng, page_num):
+    lines = [f"INDIVIDUALIZED EDUCATION PROGRAM - page {page_num}", ""]
+    for i in range(rng.randint(3, 5)):
+        lines.append(f"Annual Goal {page_num}.{i + 1}: The student will " + rng.choice(GOALS).format(n=rng.randint(3, 95)) + ".")
+        lines.append("Progress will be measured by teacher-charted data and work samples, reported each grading period.")
+    lines.append("")
+    lines.append("Accommodations:")
+    lines += ["- " + a.format(n=rng.randint(5, 15)) for a in rng.sample(ACCOMMODATIONS, 3)]
+    lines.append(f"Services: specialized reading instruction, {rng.randint(2, 5)}x{rng.choice([20, 30, 45])} minutes weekly.")
+    return "\n".join(lines)
+
+def _report_page(rng, page_num):
+    heading = REPORT_SECTIONS[(page_num - 1) % len(REPORT_SECTIONS)]
+    sentences = ["The student was cooperative and attentive throughout testing.",
+                 f"Scores on the processing subtests fell at the {rng.randint(2, 60)}th percentile.",
+                 "Decoding of unfamiliar multisyllabic words was slow and effortful.",
+                 "The parent reports that homework routinely takes over an hour.",
+                 "Visual supports and chunked directions improved task completion."]
+    body = " ".join(rng.choice(sentences) for _ in range(rng.randint(18, 26)))
+    return heading, body
+
+def _write_text_page(doc, heading, body):
+    import fitz
+    page = doc.new_page()
+    if heading:
+        page.insert_text((50, 60), heading, fontsize=14, fontname="hebo")
+    page.insert_textbox(fitz.Rect(50, 80 if heading else 50, 560, 800), body, fontsize=10)
+    return page
+
+def _scan(doc, page_index, dpi=150):
+    """replaces a text page by a rasterized copy of itself, like a scanner would produce"""
+    import fitz
+    pix = doc[page_index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    rect = doc[page_index].rect
+    doc.delete_page(page_index)
+    page = doc.new_page(pno=page_index, width=rect.width, height=rect.height)
+    page.insert_image(rect, stream=pix.tobytes("png"))
+
+def make_document(path, kind, pages, seed, doc_type):
+    import fitz
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for n in range(1, pages + 1):
+        if doc_type == "iep":
+            _write_text_page(doc, None, _iep_page_text(rng, n))
+        else:
+            _write_text_page(doc, *_report_page(rng, n))
+    for i in range(pages):
+        if kind == "scanned" or (kind == "mixed" and i % 3 == 2):
+            _scan(doc, i)
+    doc.save(path)
+    doc.close()
+    return path
+
+def build_corpus(corpus_dir, docs, iep_pages, report_pages):
+    """[(name, kind, iep_path, report_path)], generated only if missing so reruns see identical PDFs"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = []
+    for kind in KINDS:
+        for i in range(docs):
+            name = f"{kind}{i}"
+            iep = os.path.join(corpus_dir, f"{name}_iep_{iep_pages}p.pdf")
+            report = os.path.join(corpus_dir, f"{name}_report_{report_pages}p.pdf")
+            if not os.path.exists(iep):
+                make_document(iep, kind, iep_pages, seed=1000 * i + KINDS.index(kind), doc_type="iep")
+            if not os.path.exists(report):
+                make_document(report, kind, report_pages, seed=1000 * i + KINDS.index(kind) + 500, doc_type="report")
+            corpus.append((name, kind, iep, report))
+    return corpus
+
+# one document, in a child process ==========================
+
+class Phases:
+    """thread-safe seconds per phase, filled by wrapped functions"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = {"render": 0.0, "encode": 0.0, "parse": 0.0}
+
+    def wrap(self, fn, phase):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.seconds[phase] += time.perf_counter() - start
+        return timed
+
+class _TimedModule:
+    """stands in for a module inside one caller, timing only the named functions"""
+    def __init__(self, module, names, phases, phase):
+        self._module = module
+        for name in names:
+            setattr(self, name, phases.wrap(getattr(module, name), phase))
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+def run_document(name, iep_path, report_path, options):
+    sys.path.insert(0, PREPROCESSING_DIR)
+    sys.path.insert(0, HERE)
+    import base64, fitz
+    import bedrock_client, extract_iep, extract_psych_reports, structured_output
+    from bedrock_stub import RecordingBedrock, ReplayBedrock, install
+    from merge_iep_and_report import build_student_stages
+    from pipeline import run_stages
+
+    if options["record"]:
+        stub = install(RecordingBedrock(bedrock_client.get_bedrock_client(), options["record"]))
+    else:
+        stub = install(ReplayBedrock(options["replay"], latency_scale=options["latency_scale"], seed=options["seed"]))
+
+    phases = Phases()
+    extract_iep.render_page_image = phases.wrap(extract_iep.render_page_image, "render")
+    extract_iep.classify_page = phases.wrap(extract_iep.classify_page, "parse")
+    extract_psych_reports.extract_report_pages = phases.wrap(extract_psych_reports.extract_report_pages, "parse")
+    extract_iep.base64 = _TimedModule(base64, ["b64encode"], phases, "encode")
+    structured_output.json = _TimedModule(json, ["dumps"], phases, "encode")
+
+    with fitz.open(iep_path) as doc:
+        iep_pages = len(doc)
+    with fitz.open(report_path) as doc:
+        report_pages = len(doc)
+
+    start = time.perf_counter()
+    _, timings = run_stages(build_student_stages(iep_path, report_path, name))
+    wall = time.perf_counter() - start
+    return {
+        "iep_pages": iep_pages,
+        "report_pages": report_pages,
+        "profile_latency_s": wall,
+        "pages_per_s": (iep_pages + report_pages) / wall,
+        "bedrock_calls": stub.calls,
+        "calls_by_kind": dict(sorted(stub.calls_by_kind.items())),
+        "replayed": getattr(stub, "replayed", None),
+        "synthesized": getattr(stub, "synthesized", None),
+        "model_s": stub.model_seconds,
+        "render_s": phases.seconds["render"],
+        "encode_s": phases.seconds["encode"],
+        "parse_s": phases.seconds["parse"],
+        "stages_s": {stage: end - begin for stage, (begin, end) in timings.items()},
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+# reporting ==========================
+
+def summarize(documents):
+    by_kind = {}
+    for kind in KINDS:
+        runs = [d for d in documents if d["kind"] == kind]
+        if not runs:
+            continue
+        by_kind[kind] = {
+            "documents": len(runs),
+            "profile_latency_s": statistics.median(d["profile_latency_s"] for d in runs),
+            "pages_per_s": statistics.median(d["pages_per_s"] for d in runs),
+            "calls_per_doc": statistics.mean(d["bedrock_calls"] for d in runs),
+            "peak_rss_mb": max(d["peak_rss_mb"] for d in runs),
+            "render_s": statistics.median(d["render_s"] for d in runs),
+            "encode_s": statistics.median(d["encode_s"] for d in runs),
+            "parse_s": statistics.median(d["parse_s"] for d in runs),
+        }
+    return by_kind
+
+COLUMNS = [("profile_latency_s", "e2e s", ".2f"), ("pages_per_s", "pages/s", ".2f"), ("calls_per_doc", "calls", ".1f"),
+           ("peak_rss_mb", "RSS MB", ".0f"), ("render_s", "render s", ".2f"), ("encode_s", "encode s", ".3f"),
+           ("parse_s", "parse s", ".3f")]
+
+def print_summary(by_kind):
+    print(f"{'corpus':<9}" + "".join(f"{label:>11}" for _, label, _ in COLUMNS))
+    for kind, row in by_kind.items():
+        print(f"{kind:<9}" + "".join(f"{row[key]:>11{fmt}}" for key, _, fmt in COLUMNS))
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)["summary"]
+    with open(after_path) as f:
+        after = json.load(f)["summary"]
+    print(f"{'corpus':<9}" + "".join(f"{label:>22}" for _, label, _ in COLUMNS))
+    for kind in KINDS:
+        if kind not in before or kind not in after:
+            continue
+        b, a = before[kind], after[kind]
+        cells = []
+        for key, _, fmt in COLUMNS:
+            change = f" ({(a[key] - b[key]) / b[key]:+.0%})" if b[key] else ""
+            cells.append(f"{format(b[key], fmt)} -> {format(a[key], fmt)}{change}")
+        print(f"{kind:<9}" + "".join(f"{c:>22}" for c in cells))
+
+def main():
+    if "--child" in sys.argv:
+        name, iep_path, report_path, options = sys.argv[2], sys.argv[3], sys.argv[4], json.loads(sys.argv[5])
+        print(json.dumps(run_document(name, iep_path, report_path, options)))
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing pipeline against recorded Bedrock responses")
+    parser.add_argument("--docs", type=int, default=2, help="IEP + report pairs per corpus flavour")
+    parser.add_argument("--iep-pages", type=int, default=12)
+    parser.add_argument("--report-pages", type=int, default=24)
+    parser.add_argument("--corpus", help="directory for the generated PDFs (reused when present)")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma separated subset of text,scanned,mixed")
+    parser.add_argument("--replay", help="cassette to replay; without it every call is synthetic")
+    parser.add_argument("--record", help="call real Bedrock and append every call to this cassette")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply replayed latencies (e.g. 0.1 for a quick run)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    corpus_dir = args.corpus or os.path.join(tempfile.gettempdir(), "k12_preprocessing_bench_corpus")
+    kinds = args.kinds.split(",")
+    corpus = [c for c in build_corpus(corpus_dir, args.docs, args.iep_pages, args.report_pages) if c[1] in kinds]
+    options = {"replay": args.replay, "record": args.record and os.path.abspath(args.record),
+               "latency_scale": args.latency_scale, "seed": args.seed}
+    if options["replay"]:
+        options["replay"] = os.path.abspath(options["replay"])
+    print(f"{len(corpus)} documents from {corpus_dir}, {'recording to ' + args.record if args.record else 'replaying ' + (args.replay or 'synthetic answers')}\n")
+
+    documents = []
+    # the llm cache would turn every rerun into cache hits, the benchmark always calls the stub
+    env = {**os.environ, "LLM_CACHE_ENABLED": "0"}
+    for name, kind, iep_path, report_path in corpus:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, iep_path, report_path, json.dumps(options)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            reason = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+            print(f"  {name}: failed ({reason})")
+            continue
+        result = {"name": name, "kind": kind, **json.loads(proc.stdout.strip().splitlines()[-1])}
+        documents.append(result)
+        print(f"  {name:<10}{result['iep_pages'] + result['report_pages']:>4} pages {result['profile_latency_s']:>8.2f}s "
+              f"{result['bedrock_calls']:>4} calls  {json.dumps(result['calls_by_kind'])}")
+
+    summary = summarize(documents)
+    print()
+    print_summary(summary)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": {**vars(args), "corpus": corpus_dir}, "summary": summary, "documents": documents}, f, indent=2)
+        print(f"\nwrote {args.out}")
+
+if __name__ == "__main__":
+    main()
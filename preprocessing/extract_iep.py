@@ -1,56 +1,209 @@
 from textwrap import dedent
-from pdf2image import convert_from_path
 from collections import defaultdict
-import os, json, boto3, base64, uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+import fitz, os, json, base64, time, uuid
+from llm_cache import default_cache, report as report_cache
+from near_dupes import collapse_near_duplicates
+from structured_output import IEP_TOOL, extract_structured, print_failure_report
 
 def load_prompt(path):
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
 CLAUDE_IEP_PROMPT= dedent(load_prompt("prompts/claude3.5_iep_prompt.txt"))    
+CLAUDE_IEP_TEXT_PROMPT = dedent(load_prompt("prompts/claude3.5_iep_text_prompt.txt"))
+IEP_MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+IEP_INFERENCE_PARAMS = {"max_tokens": 2048, "temperature": 0.3}
 
-def convert_pdf_to_images(pdf_path, output_dir="images", dpi=200):
-    os.makedirs(output_dir, exist_ok=True)
-    images = convert_from_path(pdf_path, dpi=dpi)
-    image_paths = []
-    for i, image in enumerate(images):
-        path = os.path.join(output_dir, f"page_{i+1}.png")
-        image.save(path, "PNG")
-        image_paths.append(path)
-    return image_paths
-
-def call_claude_with_image(image_path, prompt_template):
-    with open(image_path, "rb") as f:
-        image_bytes = f.read()
-    bedrock = boto3.client("bedrock-runtime", region_name="us-west-2")
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-    body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 2048,
-        "temperature": 0.3,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "source": {
-                        "type": "base64",
-                        "media_type": "image/png", 
-                        "data": image_base64
-                    }},
-                    {"type": "text", "text": prompt_template}
-                ]
-            }
-        ]
-    }
-    response = bedrock.invoke_model(
-        modelId="us.anthropic.claude-3-5-sonnet-20241022-v2:0",
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps(body)
+# pages in flight per document (bedrock_client also caps calls across the whole process)
+IEP_PAGE_WORKERS = int(os.environ.get("IEP_PAGE_WORKERS", "6"))
+PAGE_RETRIES = 3
+
+# claude downscales images whose long edge is over ~1568px, rendering larger only adds
+# render/encode time and request size. grayscale png keeps text crisp at a fraction of the bytes
+MAX_IMAGE_EDGE = int(os.environ.get("IEP_MAX_IMAGE_EDGE", "1568"))
+JPEG_QUALITY = 80
+
+# a page goes to the text prompt when it has a real text layer and isn't mostly image (scans)
+MIN_TEXT_CHARS = int(os.environ.get("IEP_MIN_TEXT_CHARS", "200"))
+MAX_IMAGE_COVERAGE = float(os.environ.get("IEP_MAX_IMAGE_COVERAGE", "0.5"))
+
+def render_page_image(page, max_edge=MAX_IMAGE_EDGE, grayscale=True, image_format="png"):
+    """encodes one fitz page in memory. returns (image_bytes, media_type, (width, height))"""
+    # scale so the long edge lands on max_edge instead of a fixed DPI
+    zoom = max_edge / max(page.rect.width, page.rect.height)
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(zoom, zoom),
+        colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+        alpha=False
     )
+    size = (pix.width, pix.height)
+    if image_format == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY), "image/jpeg", size
+    return pix.tobytes("png"), "image/png", size
+
+def estimate_image_tokens(size):
+    # anthropic's published estimate for image input: width * height / 750
+    return int(size[0] * size[1] / 750)
+
+def render_pdf_pages(pdf_path, max_edge=MAX_IMAGE_EDGE, grayscale=True, image_format="png"):
+    """
+    yields (page_num, image_bytes, media_type) one page at a time, encoded in memory.
+    only one rendered page is alive per call, so memory stays flat however long the PDF is
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            image_bytes, media_type, _ = render_page_image(page, max_edge, grayscale, image_format)
+            yield page.number + 1, image_bytes, media_type
+    finally:
+        doc.close()
+
+def classify_page(page):
+    """
+    decides whether a page can go through the (cheaper, faster) text prompt.
+    born-digital pages have a real text layer; scans have little or no text and a page-sized image
+    returns (route, page_text, image_coverage)
+    """
+    blocks = page.get_text("blocks")
+    blocks.sort(key=lambda b: (b[1], b[0]))  # order: top-down, then left-right
+    text = "\n\n".join(b[4].strip() for b in blocks if b[4].strip())
+
+    page_area = abs(page.rect) or 1
+    image_area = 0
+    for image in page.get_images(full=True):
+        for rect in page.get_image_rects(image[0]):
+            image_area += abs(rect & page.rect)
+    coverage = min(1.0, image_area / page_area)
+
+    if len(text) >= MIN_TEXT_CHARS and coverage <= MAX_IMAGE_COVERAGE:
+        return "text", text, coverage
+    return "vision", text, coverage
+
+def iter_iep_pages(pdf_path, force_vision=False):
+    """
+    yields one dict per page: {"page", "route", "text"} plus "image"/"media_type" for vision pages.
+    vision pages are rendered lazily, text pages never are
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            route, text, coverage = classify_page(page)
+            if force_vision:
+                route = "vision"
+            item = {"page": page.number + 1, "route": route, "text": text, "image_coverage": coverage}
+            if route == "vision":
+                item["image"], item["media_type"], size = render_page_image(page)
+                item["est_image_tokens"] = estimate_image_tokens(size)
+            else:
+                # what this page would have cost as an image, for the savings report
+                zoom = MAX_IMAGE_EDGE / max(page.rect.width, page.rect.height)
+                item["est_image_tokens"] = estimate_image_tokens((page.rect.width * zoom, page.rect.height * zoom))
+            yield item
+    finally:
+        doc.close()
+
+def _call_claude(content):
+    # answers come back through the record_iep_page tool, validated against the partial-profile schema
+    return extract_structured(content, IEP_TOOL, IEP_MODEL_ID, IEP_INFERENCE_PARAMS)
 
-    response_body = json.loads(response["body"].read().decode("utf-8"))
-    return response_body["content"][0]["text"]
+def call_claude_with_image(image_bytes, prompt_template, media_type="image/png"):
+    """returns (validated partial or None, call stats)"""
+    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    return _call_claude([
+        {"type": "image", "source": {
+            "type": "base64",
+            "media_type": media_type,
+            "data": image_base64
+        }},
+        {"type": "text", "text": prompt_template}
+    ])
+
+def call_claude_with_text(page_text, prompt_template):
+    """returns (validated partial or None, call stats)"""
+    return _call_claude([{"type": "text", "text": prompt_template.replace("{{CHUNK}}", page_text)}])
+
+def extract_page(page, page_retries=PAGE_RETRIES):
+    """
+    runs one page through claude (text or vision prompt depending on its route).
+    failed calls are retried; an answer that fails schema validation gets repair turns instead
+    (see structured_output). returns (parsed json or None, stats)
+    """
+    stats = {"page": page["page"], "route": page["route"], "input_tokens": 0, "output_tokens": 0,
+             "latency_s": 0.0, "est_image_tokens": page.get("est_image_tokens", 0), "cached": False,
+             "calls": 0, "repairs": 0, "errors": []}
+    # the tool schema is part of the key: answers cached from free-text parsing aren't reused
+    cache_params = {**IEP_INFERENCE_PARAMS, "tool": IEP_TOOL}
+    if page["route"] == "text":
+        cache_key = default_cache.make_key(page["text"], CLAUDE_IEP_TEXT_PROMPT, IEP_MODEL_ID, cache_params)
+    else:
+        cache_key = default_cache.make_key(page["image"], CLAUDE_IEP_PROMPT, IEP_MODEL_ID, cache_params)
+    cached = default_cache.get(cache_key)
+    if cached is not None:
+        stats["cached"] = True
+        return cached, stats
+
+    for attempt in range(1, page_retries + 1):
+        start = time.perf_counter()
+        try:
+            if page["route"] == "text":
+                parsed, call_stats = call_claude_with_text(page["text"], CLAUDE_IEP_TEXT_PROMPT)
+            else:
+                parsed, call_stats = call_claude_with_image(page["image"], CLAUDE_IEP_PROMPT, page["media_type"])
+            stats["latency_s"] += time.perf_counter() - start
+            for key in ("input_tokens", "output_tokens", "calls", "repairs"):
+                stats[key] += call_stats[key]
+            stats["errors"] = call_stats["errors"]
+            if parsed is not None:
+                default_cache.put(cache_key, parsed)
+            # a page still invalid after its repair turns isn't resent from scratch
+            return parsed, stats
+        except Exception as e:
+            stats["latency_s"] += time.perf_counter() - start
+            print(f"Error on page {page['page']} (attempt {attempt}/{page_retries}): {e}")
+    stats["errors"] = stats["errors"] or ["model call failed"]
+    return None, stats
+
+def extract_pages(pages, max_workers=IEP_PAGE_WORKERS):
+    """
+    extracts pages from an iterable of page dicts (see iter_iep_pages) on a bounded worker pool.
+    pages are pulled lazily, at most 2x max_workers pages are held at once.
+    returns [(parsed or None, stats)] in page order
+    """
+    results = {}
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for page in pages:
+            if len(in_flight) >= max_workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[in_flight.pop(future)] = future.result()
+            in_flight[pool.submit(extract_page, page)] = page["page"]
+        for future in as_completed(in_flight):
+            results[in_flight[future]] = future.result()
+    return [results[page_num] for page_num in sorted(results)]
+
+def print_routing_report(page_stats):
+    """pages routed each way, tokens and latency per route, and the estimated saving vs all-vision"""
+    # cache hits made no call, leave them out of the token/latency numbers
+    page_stats = [s for s in page_stats if not s.get("cached")]
+    for route in ("text", "vision"):
+        stats = [s for s in page_stats if s["route"] == route]
+        if not stats:
+            continue
+        tokens = sum(s["input_tokens"] for s in stats)
+        latency = sum(s["latency_s"] for s in stats) / len(stats)
+        print(f"  {route:<7}{len(stats):>4} pages  {tokens:>8} input tokens  {latency:6.2f}s avg latency")
+    text_stats = [s for s in page_stats if s["route"] == "text"]
+    if text_stats:
+        as_images = sum(s["est_image_tokens"] for s in text_stats)
+        as_text = sum(s["input_tokens"] for s in text_stats)
+        print(f"  text routing saved ~{as_images - as_text} input tokens "
+              f"({as_images} est. as images vs {as_text} as text)")
+    vision_stats = [s for s in page_stats if s["route"] == "vision"]
+    if text_stats and vision_stats:
+        saved = sum(s["latency_s"] for s in vision_stats) / len(vision_stats) - sum(s["latency_s"] for s in text_stats) / len(text_stats)
+        print(f"  ~{saved:.2f}s faster per text-routed page")
 
 def merge_student_profile_partials(partials):
     merged = {
@@ -73,32 +226,34 @@ def merge_student_profile_partials(partials):
         placement = student.get("placement", "")
         if placement and len(placement) > len(merged["placement"]):
             merged["placement"] = placement
+    # pages restate the same goal/accommodation in slightly different words
+    for key in ["iep_goals", "accommodations"]:
+        merged[key] = collapse_near_duplicates(merged[key])
     return merged
 
 
-def extract_student_info_from_iep(input_path, student_id):
-    # 1. convert PDF to image pages bc claude doesn't take pdfs
-    # 2. run claude on each image (page)
-    # 3. merge all outputs (removing dupes) and save to file
-    input_pdf = input_path
-    output_dir = f"{student_id}/images"
-    image_paths = convert_pdf_to_images(input_pdf, output_dir=output_dir)
-    print(f"Converted {len(image_paths)} pages to images.")
-    all_outputs = []
-    for img_path in image_paths:
-        print(f"\nOutput for {img_path}:")
-        result = call_claude_with_image(img_path, CLAUDE_IEP_PROMPT)
-        print(result)
-        try:
-            parsed = json.loads(result)
-            all_outputs.append(parsed)
-        except Exception as e:
-            print(f"Error parsing result for {img_path}: {e}")
-            print("Raw output:", result)
+def extract_iep_partials(input_path):
+    """classifies, renders and extracts every page, returns the parsed page outputs in page order"""
+    # text-layer pages go through the text prompt, scanned/image-heavy pages are rendered lazily for vision
+    results = extract_pages(iter_iep_pages(input_path))
+    all_outputs = [parsed for parsed, _ in results if parsed is not None]
+    print(f"Extracted {len(all_outputs)}/{len(results)} pages.")
+    print_routing_report([stats for _, stats in results])
+    print_failure_report([stats for _, stats in results], unit="pages")
+    report_cache([stats for _, stats in results], label="IEP page cache")
+    default_cache.evict()
+    return all_outputs
 
-    merged_profile = merge_student_profile_partials(all_outputs)
-    with open(f"{student_id}/{student_id}_merged_iep_profile.json", "w", encoding="utf-8") as f:
+def extract_student_info_from_iep(input_path, student_id, output_dir=None):
+    # 1. classify pages: text layer -> text prompt, scanned/image-heavy -> render to image (claude doesn't take pdfs)
+    # 2. run claude on each page
+    # 3. merge all outputs (removing dupes) and save to file
+    merged_profile = merge_student_profile_partials(extract_iep_partials(input_path))
+    output_dir = output_dir or student_id
+    os.makedirs(output_dir, exist_ok=True)
+    with open(f"{output_dir}/{student_id}_merged_iep_profile.json", "w", encoding="utf-8") as f:
         json.dump(merged_profile, f, indent=2, ensure_ascii=False)
+    return merged_profile
 
 if __name__ == "__main__":
     input_pdf = "data/IEP_Redacted_Johansson.pdf"
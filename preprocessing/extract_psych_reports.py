@@ -1,25 +1,28 @@
 from textwrap import dedent
 from collections import defaultdict
 from pathlib import Path
-import fitz, json, os, uuid, boto3
+import fitz, json, os, uuid
+from bedrock_client import invoke_model
+from llm_cache import default_cache, report as report_cache
+from near_dupes import collapse_near_duplicates
+from structured_output import PSYCH_TOOL, extract_structured, print_failure_report
+
+PSYCH_MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+PSYCH_INFERENCE_PARAMS = {"max_tokens": 5000, "temperature": 0.2}
+
+# chunks are packed up to this many (estimated) tokens, on top of the ~1.5k token prompt
+CHUNK_TOKEN_BUDGET = int(os.environ.get("PSYCH_CHUNK_TOKEN_BUDGET", "6000"))
+HEADING_MAX_CHARS = 80
 
 # invoke bedrock
-def call_bedrock(prompt, model_id="us.anthropic.claude-3-5-sonnet-20241022-v2:0"):
-    bedrock = boto3.client(service_name="bedrock-runtime", region_name="us-west-2")
+def call_bedrock(prompt, model_id=PSYCH_MODEL_ID):
     body = {
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 5000,
-        "temperature": 0.2,
+        **PSYCH_INFERENCE_PARAMS,
         "messages": [{"role": "user", "content": prompt}]
     }
     try:
-        response = bedrock.invoke_model(
-            modelId=model_id,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(body)
-        )
-        response_body = json.loads(response["body"].read())
+        response_body = invoke_model(json.dumps(body), model_id)
         return response_body["content"][0]["text"]
     except Exception as e:
         print("call to bedrock failed", e)
@@ -46,7 +49,8 @@ def extract_images_from_pdf(pdf_path):
             image_info.append({"page": i + 1, "num_images": len(images)})
     return image_info
 
-def prepare_claude_chunks(pdf_path, pages_per_chunk=5):
+def prepare_fixed_page_chunks(pdf_path, pages_per_chunk=5):
+    """previous chunker (fixed page count, two passes over the PDF), kept for comparison benchmarks"""
     text_blocks = extract_text_blocks_from_pdf(pdf_path)
     image_pages = {info["page"] for info in extract_images_from_pdf(pdf_path)}
     chunks = []
@@ -57,10 +61,120 @@ def prepare_claude_chunks(pdf_path, pages_per_chunk=5):
             chunk_text += f"\n---\nPage {page_num}:\n{text.strip()}\n"
             if page_num in image_pages:
                 chunk_text += f"\n[Image Placeholder: Page {page_num} contains a diagram, table, or visual.]\n"
-        # print(chunk_text)
         chunks.append(dedent(chunk_text.strip()))
     return chunks
 
+def estimate_tokens(text):
+    # ~4 characters per token for english prose, close enough for packing
+    return len(text) // 4 + 1
+
+def _is_heading(block_text, spans, body_size):
+    """short single-line block that is bold, larger than body text, or ALL CAPS"""
+    if "\n" in block_text or len(block_text) > HEADING_MAX_CHARS or not any(c.isalpha() for c in block_text):
+        return False
+    if block_text.rstrip().endswith((".", ",", ";")):
+        return False
+    bold = all(span["flags"] & 16 for span in spans)  # 16 = bold in PyMuPDF span flags
+    larger = max(span["size"] for span in spans) >= body_size * 1.15
+    letters = [c for c in block_text if c.isalpha()]
+    caps = len(letters) >= 4 and all(c.isupper() for c in letters)
+    return bold or larger or caps
+
+def extract_report_pages(pdf_path):
+    """
+    single pass over the PDF: per page, the text blocks in reading order (each flagged if it looks like
+    a section heading) and whether the page has images.
+    returns [{"page": n, "blocks": [(text, is_heading)], "has_images": bool}]
+    """
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            blocks = []
+            for block in page.get_text("dict")["blocks"]:
+                if block.get("type") != 0:  # 1 = image block
+                    continue
+                spans = [span for line in block["lines"] for span in line["spans"] if span["text"].strip()]
+                if not spans:
+                    continue
+                text = "\n".join(
+                    "".join(span["text"] for span in line["spans"]).strip() for line in block["lines"]
+                ).strip()
+                blocks.append((block["bbox"], text, spans))
+            blocks.sort(key=lambda b: (b[0][1], b[0][0]))  # order: top-down, then left-right
+
+            sizes = sorted(span["size"] for _, _, spans in blocks for span in spans)
+            body_size = sizes[len(sizes) // 2] if sizes else 0
+            pages.append({
+                "page": page.number + 1,
+                "blocks": [(text, _is_heading(text, spans, body_size)) for _, text, spans in blocks],
+                "has_images": bool(page.get_images(full=True)),
+            })
+    return pages
+
+def _render_chunk(units, image_pages):
+    """units are (page_num, text); keeps the "Page N:" markers and image placeholders of the old format"""
+    chunk_text = ""
+    current_page = None
+    for i, (page_num, text) in enumerate(units):
+        if page_num != current_page:
+            chunk_text += f"\n---\nPage {page_num}:\n"
+            current_page = page_num
+        chunk_text += text + "\n\n"
+        last_of_page = i + 1 == len(units) or units[i + 1][0] != page_num
+        if last_of_page and page_num in image_pages:
+            chunk_text += f"[Image Placeholder: Page {page_num} contains a diagram, table, or visual.]\n"
+    return chunk_text.strip()
+
+def pack_chunks(pages, token_budget=CHUNK_TOKEN_BUDGET, min_fill=0.5):
+    """
+    packs text blocks into chunks of up to token_budget tokens.
+    when a chunk fills up, it is cut at the last section heading (if that still leaves the chunk at
+    least min_fill full) so sections aren't split across chunks; otherwise it is cut at the block boundary.
+    a single block larger than the budget is split on paragraph/line breaks.
+    the budget counts block text; the "Page N:" markers add a few tokens on top.
+    """
+    image_pages = {p["page"] for p in pages if p["has_images"]}
+    units = []  # (page_num, text, is_heading, tokens)
+    for p in pages:
+        if not p["blocks"] and p["has_images"]:
+            units.append((p["page"], "", False, 0))
+        for text, is_heading in p["blocks"]:
+            tokens = estimate_tokens(text)
+            if tokens <= token_budget:
+                units.append((p["page"], text, is_heading, tokens))
+                continue
+            piece = ""
+            for line in text.split("\n"):
+                if piece and estimate_tokens(piece + line) > token_budget:
+                    units.append((p["page"], piece.strip(), False, estimate_tokens(piece)))
+                    piece = ""
+                piece += line + "\n"
+            if piece.strip():
+                units.append((p["page"], piece.strip(), False, estimate_tokens(piece)))
+
+    chunks = []
+    current, current_tokens = [], 0
+    for unit in units:
+        while current and current_tokens + unit[3] > token_budget:
+            cut = len(current)
+            if unit[2]:
+                pass  # the new block is a heading: cutting right here is already a section break
+            else:
+                headings = [i for i, u in enumerate(current) if u[2] and i > 0]
+                if headings and sum(u[3] for u in current[:headings[-1]]) >= token_budget * min_fill:
+                    cut = headings[-1]
+            chunks.append(current[:cut])
+            current = current[cut:]
+            current_tokens = sum(u[3] for u in current)
+        current.append(unit)
+        current_tokens += unit[3]
+    if current:
+        chunks.append(current)
+    return [dedent(_render_chunk([(u[0], u[1]) for u in chunk], image_pages)) for chunk in chunks]
+
+def prepare_claude_chunks(pdf_path, token_budget=CHUNK_TOKEN_BUDGET):
+    return pack_chunks(extract_report_pages(pdf_path), token_budget)
+
 def load_prompt_with_chunk(path, chunk_text):
     with open(path, "r", encoding="utf-8") as f:
         raw_prompt = f.read()
@@ -82,12 +196,25 @@ def merge_claude_results(json_outputs_dir, output_dir="final_outputs"):
 def merge_student_profiles(json_outputs_dir, student_id="xxxx", output_path="final_outputs/student_profile.json"):
     """
     input: output dir for resulting student profile json, output file path for student profile json
-    output: nothing
+    output: the merged student profile
 
     this function extracts student profile specific info into a student profile json across all the jsons produced for each chunk passed to claude
 
     """
+    partials = []
+    for path in sorted(Path(json_outputs_dir).glob("chunk_*.json")):
+        with open(path) as f:
+            partials.append(json.load(f))
+    profile = merge_report_partials(partials, student_id=student_id)
+
     os.makedirs(Path(output_path).parent, exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"Merged student profile saved to {output_path}")
+    return profile
+
+def merge_report_partials(chunk_outputs, student_id="xxxx"):
+    """merges the per-chunk claude outputs (in chunk order) into one student profile, in memory"""
     profile = {
         "student_id": None,
         "first_name": None,
@@ -123,11 +250,9 @@ def merge_student_profiles(json_outputs_dir, student_id="xxxx", output_path="fin
     }
 
     seen_disabilities = set()
-    # merging info from each chunk_*json file
-    for path in sorted(Path(json_outputs_dir).glob("chunk_*.json")):
-        with open(path) as f:
-            data = json.load(f)
-            partial = data.get("student_profile_partial", {})
+    # merging info from each chunk's output
+    for data in chunk_outputs:
+        partial = data.get("student_profile_partial", {})
 
         for field in ["first_name", "last_name", "student_id"]:
             if not profile[field] and partial.get(field):
@@ -164,49 +289,75 @@ def merge_student_profiles(json_outputs_dir, student_id="xxxx", output_path="fin
                         "name": name
                     })
 
-    # sort + remove any duplicates found across chunks 
-    profile["iep_goals"] = sorted(set(profile["iep_goals"]))
-    profile["accommodations"] = sorted(set(profile["accommodations"]))
-    profile["learning_styles"] = sorted(set(profile["learning_styles"]))
+    # sort + remove any duplicates (and near-duplicate restatements) found across chunks 
+    profile["iep_goals"] = sorted(collapse_near_duplicates(profile["iep_goals"]))
+    profile["accommodations"] = sorted(collapse_near_duplicates(profile["accommodations"]))
+    profile["learning_styles"] = sorted(collapse_near_duplicates(profile["learning_styles"]))
 
     # generating student UUID for now 
     # TODO: change this to actual id's in the future
     profile["student_id"] = student_id
+    return profile
 
-    with open(output_path, "w") as f:
-        json.dump(profile, f, indent=2)
-    print(f"Merged student profile saved to {output_path}")
 
+def extract_chunk(chunk):
+    """
+    runs one chunk through claude (or the cache) via the record_psych_report_chunk tool.
+    an answer that fails schema validation gets repair turns (see structured_output).
+    returns (parsed json or None, stats)
+    """
+    prompt = load_prompt_with_chunk("prompts/claude3.5_psych_prompt.txt", chunk)
+    stats = {"calls": 0, "repairs": 0, "input_tokens": 0, "output_tokens": 0, "errors": [], "cached": True}
+    # the filled prompt already contains both the prompt file and the chunk text
+    cache_key = default_cache.make_key(chunk, prompt, PSYCH_MODEL_ID, {**PSYCH_INFERENCE_PARAMS, "tool": PSYCH_TOOL})
+    parsed = default_cache.get(cache_key)
+    if parsed is None:
+        parsed, stats = extract_structured([{"type": "text", "text": prompt}], PSYCH_TOOL, PSYCH_MODEL_ID, PSYCH_INFERENCE_PARAMS)
+        stats["cached"] = False
+        if parsed is not None:
+            default_cache.put(cache_key, parsed)
+    return parsed, stats
+
+def extract_chunks(chunks):
+    """returns [parsed or None] in chunk order, chunks that still fail after their repair turns are left as None"""
+    results, all_stats = [], []
+    for i, chunk in enumerate(chunks):
+        print(f"Processing chunk {i+1}/{len(chunks)}")
+        try:
+            parsed, stats = extract_chunk(chunk)
+        except Exception as e:
+            print(f"Error on chunk {i+1}:", e)
+            parsed, stats = None, {"calls": 1, "repairs": 0, "errors": [f"model call failed: {e}"]}
+        stats["chunk"] = i + 1
+        results.append(parsed)
+        all_stats.append(stats)
+    print_failure_report(all_stats, unit="chunks")
+    report_cache(all_stats, label="Psych report chunk cache")
+    default_cache.evict()
+    return results
 
 # execution  ---------------
 # 1. extract txt and denote img place holders using pypdf 
 # 2. feed claude extracted output, chunk by chunk
 # 3. claude generates json partial student profile from each chunk
 # 4. merge all partial student json profiles into a final student profile
-def extract_psychological_report(path_to_report, student_id):
+def extract_psychological_report(path_to_report, student_id, output_dir=None):
     chunks = prepare_claude_chunks(path_to_report)
     print(f"There are {len(chunks)} chunks found in this report")
-    os.makedirs(student_id, exist_ok=True)
-    with open(f"{student_id}/psych_report.txt", "w", encoding="utf-8") as f:
+    output_dir = output_dir or student_id
+    os.makedirs(output_dir, exist_ok=True)
+    with open(f"{output_dir}/psych_report.txt", "w", encoding="utf-8") as f:
         for i, chunk in enumerate(chunks):
             f.write(chunk)
 
-    os.makedirs(f"{student_id}/claude_outputs", exist_ok=True)
-    for i, chunk in enumerate(chunks):
-        print(f"Processing chunk {i+1}/{len(chunks)}")
-        prompt = load_prompt_with_chunk("prompts/claude3.5_psych_prompt.txt", chunk)
-        try:
-            response = call_bedrock(prompt)
-            # print(f"RAW RESPONSE for chunk {i+1}:\n{response[:500]}\n")
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            parsed = json.loads(response[json_start:json_end])
-            with open(f"{student_id}/claude_outputs/chunk_{i+1:02d}.json", "w") as f:
-                json.dump(parsed, f, indent=2)
-            print(f"Chunk {i+1} saved.") 
-        except Exception as e:
-            print(f"Error on chunk {i+1}:", e)
-    merge_student_profiles("claude_outputs", student_id=student_id, output_path=f"{student_id}/{student_id}_student_profile.json")
+    os.makedirs(f"{output_dir}/claude_outputs", exist_ok=True)
+    for i, parsed in enumerate(extract_chunks(chunks)):
+        if parsed is None:
+            continue
+        with open(f"{output_dir}/claude_outputs/chunk_{i+1:02d}.json", "w") as f:
+            json.dump(parsed, f, indent=2)
+        print(f"Chunk {i+1} saved.")
+    return merge_student_profiles(f"{output_dir}/claude_outputs", student_id=student_id, output_path=f"{output_dir}/{student_id}_student_profile.json")
 
 if __name__ == "__main__":
     student_id = str(uuid.uuid4())
@@ -0,0 +1,97 @@
+"""
+content-addressed on-disk cache for parsed LLM extraction results.
+
+key = sha256 of (page/chunk content, prompt text, model id, inference params), so a rerun after a
+crash or a prompt tweak only pays for pages/chunks whose inputs actually changed.
+entries are small json files sharded by key prefix; eviction drops anything older than max_age_days,
+then the least recently used entries until the cache fits in max_bytes.
+hit/miss counts are kept by the callers in their per-page/per-chunk stats (see report), the cache is
+shared by extractors that run concurrently in one process.
+"""
+import hashlib, json, os, threading, time
+from pathlib import Path
+
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_MAX_MB = int(os.environ.get("LLM_CACHE_MAX_MB", "512"))
+LLM_CACHE_MAX_AGE_DAYS = int(os.environ.get("LLM_CACHE_MAX_AGE_DAYS", "30"))
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") == "1"
+
+class LLMCache:
+    def __init__(self, cache_dir=LLM_CACHE_DIR, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+                 max_age_days=LLM_CACHE_MAX_AGE_DAYS, enabled=LLM_CACHE_ENABLED):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_days * 24 * 60 * 60
+        self.enabled = enabled
+
+    @staticmethod
+    def make_key(content, prompt, model_id, params):
+        h = hashlib.sha256()
+        for part in (content, prompt, model_id, json.dumps(params, sort_keys=True)):
+            h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+            h.update(b"\0")  # separator so ("ab", "c") and ("a", "bc") don't collide
+        return h.hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """returns the cached parsed json, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age_s:
+                raise FileNotFoundError
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path, (time.time(), path.stat().st_mtime))  # atime drives LRU eviction
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write then rename, so a crash mid-write never leaves a half entry behind
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(value, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def evict(self):
+        """drops expired entries, then least recently used ones until under max_bytes. returns count removed"""
+        if not self.cache_dir.exists():
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue  # removed by a concurrent evict
+            if now - st.st_mtime > self.max_age_s:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((st.st_atime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def report(stats, label="LLM cache"):
+    """hit rate over one extraction's per-item stats (items answered from the cache have cached=True)"""
+    hits = sum(1 for s in stats if s.get("cached"))
+    misses = len(stats) - hits
+    rate = hits / len(stats) if stats else 0.0
+    print(f"{label}: {hits} hits / {misses} misses ({rate:.0%} hit rate, {hits} model calls saved)")
+
+# shared by every extractor in the process
+default_cache = LLMCache()
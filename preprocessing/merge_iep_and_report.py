@@ -1,19 +1,15 @@
-import json
+import argparse
 import uuid
 import hashlib
-from extract_iep import extract_student_info_from_iep
-from extract_psych_reports import extract_psychological_report
+from extract_iep import extract_iep_partials, merge_student_profile_partials
+from extract_psych_reports import extract_chunks, merge_report_partials, prepare_claude_chunks
+from near_dupes import collapse_near_duplicates
+from pipeline import Stage, print_timings, run_stages
+from student_briefing import build_briefing
 
 def deduped_merge_list(list1, list2):
-    """given two lists, merges into one, removing duplicates"""
-    seen = set()
-    result = []
-    for item in list1 + list2:
-        key = item.lower().strip() if isinstance(item, str) else str(item)
-        if key not in seen:
-            seen.add(key)
-            result.append(item)
-    return result
+    """given two lists, merges into one, removing duplicates and near-duplicate restatements"""
+    return collapse_near_duplicates(list1 + list2)
 
 def merge_profiles(psych_data, iep_data):
     merged = {
@@ -31,22 +27,53 @@ def merge_profiles(psych_data, iep_data):
     }
     return merged
 
+def build_student_stages(iep_path, report_path, student_id):
+    """
+    psych.chunk -> psych.extract -> psych.merge --\
+                                                   profile.merge -> profile.briefing
+    iep.extract -> iep.merge ---------------------/
+    the iep and psych report branches don't depend on each other until profile.merge, so they run side by side.
+    iep rendering is streamed straight into the page extraction (so page images aren't all held at once),
+    which is why it is one stage
+    """
+    return [
+        Stage("psych.chunk", lambda: prepare_claude_chunks(report_path), persist_as="psych_report_chunks.json"),
+        Stage("psych.extract", extract_chunks, deps=["psych.chunk"], persist_as="psych_chunk_outputs.json"),
+        Stage("psych.merge", lambda outputs: merge_report_partials([o for o in outputs if o is not None], student_id=student_id),
+              deps=["psych.extract"], persist_as=f"{student_id}_student_profile.json"),
+        Stage("iep.extract", lambda: extract_iep_partials(iep_path), persist_as="iep_page_outputs.json"),
+        Stage("iep.merge", merge_student_profile_partials, deps=["iep.extract"], persist_as=f"{student_id}_merged_iep_profile.json"),
+        Stage("profile.merge", merge_profiles, deps=["psych.merge", "iep.merge"], persist_as=f"{student_id}_final_student_profile.json"),
+        Stage("profile.briefing", build_briefing, deps=["profile.merge"], persist_as=f"{student_id}_briefing.json"),
+    ]
+
+def process_student(iep_path, report_path, student_id, output_dir=None, persist="all"):
+    """
+    runs both documents through the stage pipeline and returns the final profile, its briefing under "briefing".
+    persist: "all" writes every stage's result to output_dir, "final" only the final profile and briefing, "none" nothing
+    """
+    stages = build_student_stages(iep_path, report_path, student_id)
+    if persist == "final":
+        for stage in stages:
+            if stage.name not in ("profile.merge", "profile.briefing"):
+                stage.persist_as = None
+    persist_dir = None if persist == "none" else (output_dir or student_id)
+    results, timings = run_stages(stages, persist_dir=persist_dir)
+    print_timings(timings, label=f"Student {student_id}")
+    return {**results["profile.merge"], "briefing": results["profile.briefing"]}
+
 if __name__ == "__main__":
     # 1. generate student id for now
-    # 2. extract from iep and psych report
+    # 2. extract from iep and psych report (concurrently)
     # 3. merge to create one profile w/ no duplicate info
+    parser = argparse.ArgumentParser(description="Extract and merge one student's IEP and psych report")
+    parser.add_argument("--iep", default="data/IEP_Redacted_Johansson.pdf")
+    parser.add_argument("--report", default="data/SLD Report.pdf")
+    parser.add_argument("--student-id", help="defaults to a generated 5-char id")
+    parser.add_argument("--persist", choices=["all", "final", "none"], default="all",
+                        help="which stage results to write under <student_id>/")
+    args = parser.parse_args()
 
     full_uuid = str(uuid.uuid4())
-    student_id = hashlib.sha1(full_uuid.encode()).hexdigest()[:5]
-    path_to_report = "data/SLD Report.pdf"
-    path_to_iep = "data/IEP_Redacted_Johansson.pdf"
-    extract_psychological_report(path_to_report, student_id)
-    extract_student_info_from_iep(path_to_iep, student_id)
-
-    with open(f"{student_id}/{student_id}_student_profile.json") as f:
-        psych = json.load(f)
-    with open(f"{student_id}/{student_id}_merged_iep_profile.json") as f:
-        iep = json.load(f)
-    final = merge_profiles(psych, iep)
-    with open(f"{student_id}/{student_id}_final_student_profile.json", "w") as f:
-        json.dump(final, f, indent=2)
+    student_id = args.student_id or hashlib.sha1(full_uuid.encode()).hexdigest()[:5]
+    process_student(args.iep, args.report, student_id, persist=args.persist)
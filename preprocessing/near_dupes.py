@@ -0,0 +1,103 @@
+"""
+Near-duplicate collapsing for merged profile lists (goals, accommodations, learning styles).
+
+Chunk-by-chunk extraction restates the same goal or accommodation in slightly different words, and
+exact-match dedupe keeps all of them. Items are reduced to word shingles and MinHash signatures,
+LSH banding finds candidate pairs, and an item is folded into an earlier, more detailed one when
+their estimated Jaccard similarity is at least the threshold. However similar they are overall, items
+stay apart when they differ in negation ("Allow use of a calculator ..." vs "Do not allow ..."), in
+numbers ("80% accuracy" vs "90% accuracy", "/l/" vs "/th/") or in a qualifier word such as the subject
+("Not to participate in ELA testing (...)" vs "... Math testing (...)"). A few common rewordings
+("extended"/"extra", "quizzes"/"tests") are normalized first so real paraphrases line up.
+
+  DEDUP_THRESHOLD   estimated Jaccard similarity to treat two items as the same (default 0.5)
+  DEDUP_ENABLED     set to 0 to fall back to exact-match dedupe
+"""
+import os, random, re, zlib
+from collections import defaultdict
+
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.5"))
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") != "0"
+NUM_PERM = 128
+BANDS = 32  # 4 rows per band: pairs down to ~0.4 similarity become candidates, the threshold does the rest
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(1)  # fixed seed so clustering is the same on every run
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+STOPWORDS = {"a", "an", "the", "of", "and", "or", "to", "in", "on", "for", "with", "by", "at", "as",
+             "is", "be", "will", "student", "students", "their", "his", "her", "when", "during", "allow"}
+# applied after stemming
+SYNONYMS = {"extended": "extra", "additional": "extra", "quiz": "test", "quizze": "test", "exam": "test",
+            "assessment": "test", "testing": "test"}
+NEGATIONS = {"not", "no", "never", "without", "cannot", "except", "instead"}
+# two items that differ in one of these are different accommodations/goals, not rewordings
+QUALIFIERS = {"ela", "math", "reading", "writing", "written", "science", "english", "spelling", "history",
+              "oral", "verbal", "visual", "audio", "all", "only", "some", "before", "after", "individual",
+              "group", "small", "large", "home", "school", "classroom", "social", "daily", "weekly", "twice"}
+
+def normalize_words(text):
+    words = re.findall(r"[a-z0-9%]+|/[a-z]+/", text.lower().replace("n't", " not"))
+    # light stemming so "tests"/"test" and "notes"/"note" match
+    words = [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+             for w in words if w not in STOPWORDS]
+    return [SYNONYMS.get(w, w) for w in words]
+
+def guard_words(words):
+    """the words two items must agree on to be the same item: negations, numbers and qualifiers"""
+    return frozenset(w for w in words if w in NEGATIONS or w in QUALIFIERS or w.startswith("/")
+                     or any(ch.isdigit() for ch in w))
+
+def shingles(words):
+    """word unigrams + bigrams; unigrams keep short, reordered phrasings comparable"""
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+def minhash(shingle_set):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set] or [0]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS)
+
+def estimated_similarity(sig1, sig2):
+    return sum(x == y for x, y in zip(sig1, sig2)) / len(sig1)
+
+def cluster_near_duplicates(items, threshold=None):
+    """
+    returns {canonical index: [member indices]}.
+    items are visited longest first, so each cluster's canonical entry is its most detailed wording;
+    an item joins the first canonical it restates rather than chaining through other members
+    """
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    words = [normalize_words(item) for item in items]
+    guards = [guard_words(w) for w in words]
+    signatures = [minhash(shingles(w)) for w in words]
+    rows = NUM_PERM // BANDS
+
+    clusters = {}
+    buckets = defaultdict(list)  # lsh band -> canonical indices
+    for i in sorted(range(len(items)), key=lambda i: -len(items[i])):
+        band_keys = [(band, signatures[i][band * rows:(band + 1) * rows]) for band in range(BANDS)]
+        candidates = dict.fromkeys(c for key in band_keys for c in buckets[key])
+        match = next((c for c in candidates
+                      if estimated_similarity(signatures[i], signatures[c]) >= threshold
+                      and guards[i] == guards[c]), None)
+        if match is not None:
+            clusters[match].append(i)
+            continue
+        clusters[i] = [i]
+        for key in band_keys:
+            buckets[key].append(i)
+    return clusters
+
+def collapse_near_duplicates(items, threshold=None):
+    """
+    keeps one entry per near-duplicate cluster, in order of first appearance.
+    non-string items (and everything, when DEDUP_ENABLED=0) only get exact-match dedupe
+    """
+    seen, unique = set(), []
+    for item in items:
+        key = item.lower().strip() if isinstance(item, str) else str(item)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    if not DEDUP_ENABLED or not all(isinstance(item, str) for item in unique):
+        return unique
+    return [unique[i] for i in sorted(cluster_near_duplicates(unique, threshold))]
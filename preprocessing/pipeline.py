@@ -0,0 +1,73 @@
+"""
+Small stage-DAG runner for the preprocessing pipeline.
+
+A stage is a function plus the names of the stages it depends on. Once those have finished it is
+called with their results as positional args, so results are passed in memory. Stages whose
+dependencies are met run concurrently on a thread pool, a stage can optionally persist its result
+to a file, and the wall-clock start/end of every stage is recorded.
+"""
+import json, os, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class Stage:
+    def __init__(self, name, fn, deps=(), persist_as=None):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.persist_as = persist_as  # file name under persist_dir, None to keep it in memory only
+
+def persist_result(result, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        if isinstance(result, str):
+            f.write(result)
+        else:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+def run_stages(stages, max_workers=4, persist_dir=None):
+    """
+    runs the stages in dependency order, returns (results, timings) keyed by stage name.
+    timings are (start, end) in seconds since the run started.
+    if a stage raises, stages already running are allowed to finish and the error is re-raised
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"stage {stage.name} depends on unknown stages {missing}")
+
+    results, timings = {}, {}
+    run_start = time.perf_counter()
+
+    def run(stage):
+        start = time.perf_counter() - run_start
+        result = stage.fn(*(results[d] for d in stage.deps))
+        if persist_dir and stage.persist_as:
+            persist_result(result, os.path.join(persist_dir, stage.persist_as))
+        timings[stage.name] = (start, time.perf_counter() - run_start)
+        return result
+
+    pending = dict(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for stage in [s for s in pending.values() if all(d in results for d in s.deps)]:
+                del pending[stage.name]
+                running[pool.submit(run, stage)] = stage.name
+            if not running:
+                raise ValueError(f"dependency cycle between stages {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results, timings
+
+def print_timings(timings, label="Pipeline", width=40):
+    """one line per stage with a bar showing when it ran, then wall time vs the sum of stage times"""
+    total = max(end for _, end in timings.values()) or 1e-9
+    print(f"{label} stage timings:")
+    for name, (start, end) in sorted(timings.items(), key=lambda item: item[1]):
+        offset = int(start / total * width)
+        bar = " " * offset + "#" * max(1, int(end / total * width) - offset)
+        print(f"  {name:<16}{end - start:8.2f}s  |{bar:<{width}}|")
+    serial = sum(end - start for start, end in timings.values())
+    print(f"  wall {total:.2f}s vs {serial:.2f}s if run one after another")
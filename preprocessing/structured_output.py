@@ -0,0 +1,174 @@
+"""
+Schema-constrained extraction calls.
+
+The model answers through a forced tool call whose input_schema is the partial-profile schema, so
+the output is JSON by construction instead of being sliced out of free text. The tool input is
+validated on receipt; an answer that doesn't match the schema gets a repair turn (the validation
+errors sent back as an error tool_result in the same conversation) rather than a rerun of the page,
+chunk or document.
+"""
+import json, os
+from bedrock_client import invoke_model
+
+REPAIR_RETRIES = int(os.environ.get("EXTRACTION_REPAIR_RETRIES", "2"))
+
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+_OPTIONAL_STRING = {"type": ["string", "null"]}
+
+IEP_PARTIAL_SCHEMA = {
+    "type": "object",
+    "required": ["student_profile_partial"],
+    "properties": {
+        "student_profile_partial": {
+            "type": "object",
+            "properties": {
+                "iep_goals": _STRINGS,
+                "accommodations": _STRINGS,
+                "services": {"type": "array", "items": {
+                    "type": "object",
+                    "required": ["type"],
+                    "properties": {
+                        "type": {"type": "string"},
+                        "frequency": _OPTIONAL_STRING,
+                        "start_date": _OPTIONAL_STRING,
+                        "end_date": _OPTIONAL_STRING,
+                    },
+                }},
+                "placement": _OPTIONAL_STRING,
+            },
+        },
+    },
+}
+
+PSYCH_PARTIAL_SCHEMA = {
+    "type": "object",
+    "required": ["student_profile_partial"],
+    "properties": {
+        "key_iep_sections": {"type": "object", "additionalProperties": {"type": "string"}},
+        "student_profile_partial": {
+            "type": "object",
+            "properties": {
+                "first_name": _OPTIONAL_STRING,
+                "last_name": _OPTIONAL_STRING,
+                "student_id": _OPTIONAL_STRING,
+                "iep_goals": _STRINGS,
+                "accommodations": _STRINGS,
+                "learning_styles": _STRINGS,
+                "disabilities": {"type": "array", "items": {
+                    "type": "object",
+                    "required": ["type", "name"],
+                    "properties": {
+                        "type": {"type": "string", "enum": ["specific_learning_disability", "other_health_impairment"]},
+                        "name": {"type": "string"},
+                    },
+                }},
+                "interviews": {"type": "object", "additionalProperties": {"type": "string"}},
+                "observations": {"type": "object", "additionalProperties": {"type": "string"}},
+            },
+        },
+    },
+}
+
+IEP_TOOL = {
+    "name": "record_iep_page",
+    "description": "Record the student support plan details found on this IEP page.",
+    "input_schema": IEP_PARTIAL_SCHEMA,
+}
+
+PSYCH_TOOL = {
+    "name": "record_psych_report_chunk",
+    "description": "Record the key IEP sections and student profile details found in this psychological report chunk.",
+    "input_schema": PSYCH_PARTIAL_SCHEMA,
+}
+
+_JSON_TYPES = {"object": dict, "array": list, "string": str, "null": type(None), "boolean": bool}
+
+def validate(value, schema, path="$"):
+    """returns a list of schema errors (empty if valid). covers the subset of json schema used above"""
+    types = schema.get("type")
+    if types:
+        types = types if isinstance(types, list) else [types]
+        if not any(isinstance(value, _JSON_TYPES[t]) for t in types):
+            return [f"{path}: expected {' or '.join(types)}, got {type(value).__name__}"]
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{path}: {value!r} is not one of {schema['enum']}"]
+    errors = []
+    if isinstance(value, dict):
+        errors += [f"{path}: missing required field {key!r}" for key in schema.get("required", []) if key not in value]
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            if key in properties:
+                errors += validate(item, properties[key], f"{path}.{key}")
+            elif isinstance(schema.get("additionalProperties"), dict):
+                errors += validate(item, schema["additionalProperties"], f"{path}.{key}")
+    elif isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors += validate(item, schema["items"], f"{path}[{i}]")
+    return errors
+
+def _read_answer(content_blocks, tool_name):
+    """returns (answer, tool_use block or None, errors) from a response's content blocks"""
+    tool_use = next((b for b in content_blocks if b.get("type") == "tool_use" and b.get("name") == tool_name), None)
+    if tool_use is not None:
+        return tool_use.get("input"), tool_use, []
+    # no tool call; accept a bare json answer in text rather than failing outright
+    text = "".join(b.get("text", "") for b in content_blocks if b.get("type") == "text")
+    try:
+        return json.loads(text[text.find("{"):text.rfind("}") + 1]), None, []
+    except ValueError:
+        return None, None, [f"no {tool_name} tool call in the response"]
+
+def extract_structured(content, tool, model_id, inference_params, max_repairs=REPAIR_RETRIES):
+    """
+    one extraction through a forced tool call, with up to max_repairs repair turns.
+    returns (validated tool input or None, stats); stats has calls, repairs, tokens and the last errors.
+    api errors (after bedrock_client's backoff) are raised
+    """
+    stats = {"calls": 0, "repairs": 0, "input_tokens": 0, "output_tokens": 0, "errors": []}
+    messages = [{"role": "user", "content": content}]
+    for attempt in range(max_repairs + 1):
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            **inference_params,
+            "tools": [tool],
+            "tool_choice": {"type": "tool", "name": tool["name"]},
+            "messages": messages,
+        }
+        response_body = invoke_model(json.dumps(body), model_id)
+        stats["calls"] += 1
+        stats["repairs"] = attempt
+        usage = response_body.get("usage", {})
+        stats["input_tokens"] += usage.get("input_tokens", 0)
+        stats["output_tokens"] += usage.get("output_tokens", 0)
+
+        blocks = response_body.get("content", [])
+        answer, tool_use, errors = _read_answer(blocks, tool["name"])
+        if not errors:
+            errors = validate(answer, tool["input_schema"])
+        stats["errors"] = errors
+        if not errors:
+            return answer, stats
+
+        # repair turn: show the model its own answer and what was wrong with it
+        repair = ("Your answer did not match the required schema:\n- " + "\n- ".join(errors[:20]) +
+                  f"\nCall {tool['name']} again with the corrected, complete answer.")
+        messages = messages + [{"role": "assistant", "content": blocks or [{"type": "text", "text": "(empty)"}]}]
+        if tool_use is not None:
+            messages.append({"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": tool_use["id"], "is_error": True, "content": repair}]})
+        else:
+            messages.append({"role": "user", "content": [{"type": "text", "text": repair}]})
+    return None, stats
+
+def print_failure_report(stats_list, unit="pages"):
+    """failed-on-first-answer / repaired / still failing counts for one document"""
+    called = [s for s in stats_list if s.get("calls")]
+    if not called:
+        return
+    first_failed = [s for s in called if s["repairs"] > 0 or s["errors"]]
+    still_failed = [s for s in called if s["errors"]]
+    repair_calls = sum(s["repairs"] for s in called)
+    print(f"  schema: {len(first_failed)}/{len(called)} {unit} failed validation on the first answer, "
+          f"{len(first_failed) - len(still_failed)} repaired with {repair_calls} repair calls, {len(still_failed)} still failed")
+    for s in still_failed:
+        print(f"    {unit[:-1]} {s.get('page', s.get('chunk'))}: {'; '.join(s['errors'][:3])}")
@@ -0,0 +1,15 @@
+"""
+offline briefing generation for freshly merged profiles (the profile.briefing pipeline stage).
+
+the prompt and record format live with the studentBriefing lambda, which regenerates briefings
+after teacher comments; this only plugs in the throttled preprocessing bedrock client.
+"""
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambdas", "studentBriefing"))
+import bedrock_client
+from briefing import generate_briefing
+
+def build_briefing(profile):
+    """teacher-independent briefing record for a merged profile"""
+    return generate_briefing(profile, invoke=bedrock_client.invoke_model)
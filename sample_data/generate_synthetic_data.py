@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Generate a district-scale synthetic dataset in the same CSV format as dynamo_data/.
+
+Writes one CSV per table (teachers-to-classes, class-attributes, class-to-students,
+student-profiles, chat-history) with the same columns and DynamoDB JSON encoding as the sample
+snapshot, so it loads with load_csv_to_dynamo.py. Output is seeded and deterministic: the same
+arguments always produce byte-identical files. Rows are written as they are generated and every
+entity is derived from the seed and its own index, so memory stays flat however many students or
+messages are asked for.
+
+Distributions are meant to reproduce the scaling problems the sample data can't show:
+  - hot teachers: conversations per teacher follow a Zipf-like skew (--teacher-skew)
+  - huge rosters: a fraction of classes (--large-class-rate) get --large-class-size students
+  - long conversations: messages per conversation are drawn from --messages-per-conversation,
+    with --long-conversation-rate of them stretched to --long-conversation-messages
+  - bloated teacherComments: --heavy-comment-rate of students get --heavy-comments comments
+
+Ranges are "lo-hi" (inclusive, uniform) or a single number.
+
+usage:
+  python generate_synthetic_data.py --out-dir synthetic_data
+  python generate_synthetic_data.py --out-dir /data/district --students 100000 --teachers 4000 \\
+      --conversations-per-teacher 5-60 --messages-per-conversation 10-60
+  python load_csv_to_dynamo.py --data-dir synthetic_data --tables k12-coteacher-chat-history --endpoint-url http://localhost:8000
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+TABLE_COLUMNS = {
+    'k12-coteacher-teachers-to-classes': ["teacherID", "classes"],
+    'k12-coteacher-class-attributes': ["classID", "classTitle", "numStudents", "sectionNumber"],
+    'k12-coteacher-class-to-students': ["classID", "students"],
+    'k12-coteacher-student-profiles': ["studentID", "accommodations", "age", "date_of_birth", "disabilities", "ethnicity",
+                                       "first_name", "gender", "grade_level", "iep_goals", "interviews", "last_name",
+                                       "learning_styles", "observations", "placement", "primary_language", "services",
+                                       "teacherComments"],
+    'k12-coteacher-chat-history': ["TeacherId", "sortId", "class_id", "conversation_id", "created_at", "message", "sender",
+                                   "student_ids", "title", "type"],
+}
+
+FIRST_NAMES = ["Liam", "Ava", "Noah", "Mia", "Ethan", "Sofia", "Lucas", "Aisha", "Kai", "Maya", "Carlos", "Destiny",
+               "Jordan", "Samantha", "Trevor", "Alexis", "Devon", "Blake", "Zoe", "Isaac", "Priya", "Mateo", "Hana", "Omar"]
+LAST_NAMES = ["Johnson", "Nguyen", "Martinez", "Hernandez", "Kim", "Singh", "Yamamoto", "Brown", "Cooper", "Lee",
+              "Washington", "Mohamed", "Rivera", "Jackson", "Miller", "Thompson", "Gonzalez", "Patel", "Okafor", "Chen"]
+SUBJECTS = ["ENGL", "MATH", "HIST", "SCI", "ART", "BIO", "CHEM", "PE", "SPAN", "MUS"]
+ETHNICITIES = ["White", "Hispanic", "African American", "Asian", "Native American", "Pacific Islander", "Two or More Races"]
+LANGUAGES = ["English", "English", "English", "Spanish", "Vietnamese", "Mandarin", "Arabic", "Tagalog"]
+DISABILITIES = [("specific_learning_disability", "dyslexia"), ("specific_learning_disability", "dysgraphia"),
+                ("specific_learning_disability", "dyscalculia"), ("specific_learning_disability", "auditory processing disorder"),
+                ("specific_learning_disability", "executive functioning deficits"),
+                ("other_health_impairment", "attention deficit hyperactivity disorder (adhd)"),
+                ("other_health_impairment", "mental health conditions"), ("other_health_impairment", "chronic or acute health conditions")]
+ACCOMMODATIONS = ["Preferential seating near teacher", "Extended time on tests and assignments", "Use of calculator for multi-step problems",
+                  "Texts read aloud", "Speech-to-text software for written assignments", "Reduced distractions during testing",
+                  "Graphic organizers for writing", "Frequent check-ins for understanding", "Movement breaks", "Copies of class notes",
+                  "Visual schedules and reminders", "Chunked assignments with checklists"]
+GOALS = ["Read grade-level text with {p}% accuracy in {n} out of 5 trials", "Write a {n}-paragraph essay with clear topic sentences with {p}% accuracy",
+         "Solve multi-step word problems with {p}% accuracy in {n} out of 4 trials", "Remain on task for {n}-minute intervals in {p}% of observed opportunities",
+         "Use a planner to track assignments with {p}% completion over {n} weeks", "Initiate peer interactions {n} times per session with {p}% independence"]
+LEARNING_STYLES = ["benefits from auditory explanations", "learns best with visual supports", "needs frequent check-ins for understanding",
+                   "performs well with verbal discussion", "thrives with hands-on activities", "works best in small groups"]
+SERVICES = ["Specialized Academic Instruction", "Speech and Language Services", "Individual counseling", "Occupational Therapy"]
+PLACEMENTS = ["85% regular class, 15% resource room", "97% time in regular class", "General Education 80% or more", "Special Day Class"]
+CHAT_OPENERS = ["How can I support", "What strategies would help", "Can you suggest modifications for", "Give me a lesson plan adapted for",
+                "What accommodations should I use for", "Summarize the IEP goals for"]
+WORDS = ("student students reading writing accommodation strategy lesson group visual support extended time seating check-in "
+         "goal progress assessment vocabulary fluency comprehension math problem solving attention focus classroom teacher "
+         "practice feedback scaffold organizer chunk schedule break peer partner model example review quiz project rubric").split()
+
+def parse_range(text):
+    lo, _, hi = str(text).partition("-")
+    return int(lo), int(hi or lo)
+
+def draw(rng, spec):
+    return rng.randint(*spec)
+
+def dynamo_s_list(values):
+    return json.dumps([{"S": v} for v in values])
+
+def dynamo_s_map(mapping):
+    return json.dumps({k: {"S": v} for k, v in mapping.items()})
+
+def entity_rng(seed, kind, index):
+    """every entity gets its own rng, so it can be regenerated from its index without any state"""
+    return random.Random(f"{seed}:{kind}:{index}")
+
+def student_id(index):
+    rng = entity_rng(0, "student-name", index)
+    return f"{index:06d}{rng.choice(FIRST_NAMES)[0]}{rng.choice(LAST_NAMES)[0]}".lower()
+
+def student_name(index):
+    rng = entity_rng(0, "student-name", index)
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+def teacher_id(index):
+    return f"t{index:05d}@district.k12.edu"
+
+def class_id(teacher_index, k):
+    return entity_rng(0, "class-id", f"{teacher_index}:{k}").getrandbits(52).to_bytes(7, "big").hex()[1:]
+
+class TextPool:
+    """message bodies are slices of one seeded corpus: cheap enough for tens of millions of messages"""
+
+    def __init__(self, seed, size=1 << 20):
+        rng = random.Random(f"{seed}:corpus")
+        words, length = [], 0
+        while length < size:
+            words.append(rng.choice(WORDS))
+            length += len(words[-1]) + 1
+        self.text = " ".join(words)
+
+    def take(self, rng, length):
+        start = rng.randrange(0, len(self.text) - length - 1)
+        start = self.text.find(" ", start) + 1
+        return self.text[start:start + length].rsplit(" ", 1)[0]
+
+class Writers:
+    def __init__(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        self.files, self.writers, self.counts = {}, {}, {}
+        for table, columns in TABLE_COLUMNS.items():
+            f = open(os.path.join(out_dir, f"{table}.csv"), "w", encoding="utf-8", newline="")
+            self.files[table] = f
+            self.writers[table] = csv.writer(f, quoting=csv.QUOTE_ALL)
+            self.writers[table].writerow(columns)
+            self.counts[table] = 0
+
+    def write(self, table, row):
+        self.writers[table].writerow(row)
+        self.counts[table] += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+def generate_profile(args, index, teacher_count):
+    rng = entity_rng(args.seed, "profile", index)
+    first, last = student_name(index)
+    grade = rng.randint(1, 12)
+    dob = date(2025 - grade - 6, 1, 1) + timedelta(days=rng.randrange(365))
+    disabilities = rng.sample(DISABILITIES, rng.randint(1, 2))
+    goals = [rng.choice(GOALS).format(p=rng.choice([70, 75, 80, 85, 90]), n=rng.randint(2, 5)) for _ in range(rng.randint(2, 6))]
+    services = [{"M": {"type": {"S": s}, "frequency": {"S": f"{rng.choice([25, 30, 45, 55])} min, {rng.randint(1, 5)}x weekly"},
+                       "start_date": {"S": "2025-08-20"}, "end_date": {"S": "2026-08-20"}}}
+                for s in rng.sample(SERVICES, rng.randint(0, 2))]
+    heavy = rng.random() < args.heavy_comment_rate
+    comment_count = draw(rng, args.heavy_comments if heavy else args.comments_per_student)
+    comments = {}
+    for _ in range(comment_count):
+        author = teacher_id(rng.randrange(teacher_count))
+        comments.setdefault(author, []).append(
+            f"{first} " + args.text_pool.take(rng, rng.randint(40, args.comment_chars)))
+    return [
+        student_id(index),
+        dynamo_s_list(rng.sample(ACCOMMODATIONS, rng.randint(2, 6))),
+        str(grade + 5),
+        dob.isoformat(),
+        json.dumps([{"M": {"type": {"S": t}, "name": {"S": n}}} for t, n in disabilities]),
+        rng.choice(ETHNICITIES),
+        first,
+        rng.choice(["Male", "Female", "Non-binary"]),
+        str(grade),
+        dynamo_s_list(goals),
+        dynamo_s_map({"parent": f"Parent reports {first} " + args.text_pool.take(rng, 160),
+                      "teacher": f"{first} " + args.text_pool.take(rng, 160)}),
+        last,
+        dynamo_s_list(rng.sample(LEARNING_STYLES, rng.randint(1, 3))),
+        dynamo_s_map({"psychologist": args.text_pool.take(rng, 200)}),
+        json.dumps(rng.choice(PLACEMENTS)),
+        rng.choice(LANGUAGES),
+        json.dumps(services),
+        json.dumps({author: {"L": [{"S": c} for c in notes]} for author, notes in comments.items()}) if comments else "",
+    ]
+
+def generate(args):
+    out = Writers(args.out_dir)
+    started = last_report = time.perf_counter()
+    messages = 0
+    zipf_norm = sum(1 / (k + 1) ** args.teacher_skew for k in range(args.teachers))
+
+    # teachers, their classes and rosters; students are drawn by index so no roster is kept around
+    teacher_classes = []  # (class id, roster indices) for the current teacher only
+    for t in range(args.teachers):
+        trng = entity_rng(args.seed, "teacher", t)
+        teacher_classes = []
+        for k in range(draw(trng, args.classes_per_teacher)):
+            cid = class_id(t, k)
+            large = trng.random() < args.large_class_rate
+            size = min(args.students, draw(trng, args.large_class_size if large else args.class_size))
+            roster = trng.sample(range(args.students), size)
+            teacher_classes.append((cid, roster))
+            out.write('k12-coteacher-class-attributes', [cid, f"{trng.choice(SUBJECTS)}{trng.randint(100, 299)}", str(size), str(k + 1)])
+            out.write('k12-coteacher-class-to-students', [cid, json.dumps({student_id(i): {"S": " ".join(student_name(i))} for i in roster})])
+        out.write('k12-coteacher-teachers-to-classes', [teacher_id(t), dynamo_s_list([cid for cid, _ in teacher_classes])])
+
+        # hot teachers: conversation counts fall off with rank like a Zipf distribution, scaled so the
+        # average teacher still gets --conversations-per-teacher
+        weight = args.teachers / (t + 1) ** args.teacher_skew / zipf_norm
+        conversations = min(round(draw(trng, args.conversations_per_teacher) * weight), args.max_conversations_per_teacher)
+        clock = args.start_timestamp + trng.randrange(86400 * 30)
+        for _ in range(conversations):
+            crng = random.Random(trng.getrandbits(64))
+            conversation_id = str(uuid.UUID(int=crng.getrandbits(128), version=4))
+            cid, roster = crng.choice(teacher_classes) if teacher_classes else ("", [])
+            chat_type = "student" if roster and crng.random() < 0.6 else "general"
+            student_ids = [student_id(crng.choice(roster))] if chat_type == "student" else []
+            clock += crng.randrange(600, 86400)
+            out.write('k12-coteacher-chat-history', [
+                teacher_id(t), f"CONV#{conversation_id}", cid, conversation_id, str(clock), "", "",
+                dynamo_s_list(student_ids), f"{crng.choice(CHAT_OPENERS)} {crng.choice(SUBJECTS)}", chat_type])
+            long = crng.random() < args.long_conversation_rate
+            for m in range(draw(crng, args.long_conversation_messages if long else args.messages_per_conversation)):
+                clock += crng.randint(5, 120)
+                sender = "user" if m % 2 == 0 else "assistant"
+                length = crng.randint(40, args.user_message_chars) if sender == "user" else crng.randint(200, args.assistant_message_chars)
+                message_id = str(uuid.UUID(int=crng.getrandbits(128), version=4))
+                out.write('k12-coteacher-chat-history', [
+                    teacher_id(t), f"CHAT#{conversation_id}#MSG#{message_id}", "", "", str(clock),
+                    # json-quoted like the sample export, so load_csv_to_dynamo decodes it back to the same string
+                    json.dumps(args.text_pool.take(crng, length), ensure_ascii=False), sender, "", "", ""])
+                messages += 1
+
+        if time.perf_counter() - last_report >= 5:
+            last_report = time.perf_counter()
+            print(f"  teachers {t + 1}/{args.teachers}, messages {messages}, {messages / (last_report - started):.0f} messages/s")
+
+    for index in range(args.students):
+        out.write('k12-coteacher-student-profiles', generate_profile(args, index, args.teachers))
+        if index % 10000 == 9999 and time.perf_counter() - last_report >= 5:
+            last_report = time.perf_counter()
+            print(f"  students {index + 1}/{args.students}")
+
+    out.close()
+    print(f"Wrote {args.out_dir} in {time.perf_counter() - started:.1f}s:")
+    for table, count in out.counts.items():
+        size = os.path.getsize(os.path.join(args.out_dir, f"{table}.csv"))
+        print(f"  {table:<36}{count:>12} rows {size / 1e6:>10.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic dataset in the dynamo_data CSV format")
+    parser.add_argument("--out-dir", default="synthetic_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--teachers", type=int, default=80)
+    parser.add_argument("--classes-per-teacher", type=parse_range, default="3-6")
+    parser.add_argument("--class-size", type=parse_range, default="18-35")
+    parser.add_argument("--large-class-rate", type=float, default=0.02, help="fraction of classes with a huge roster")
+    parser.add_argument("--large-class-size", type=parse_range, default="300-1200")
+    parser.add_argument("--conversations-per-teacher", type=parse_range, default="2-20")
+    parser.add_argument("--teacher-skew", type=float, default=1.0, help="Zipf exponent for conversations per teacher, 0 for none")
+    parser.add_argument("--max-conversations-per-teacher", type=int, default=5000)
+    parser.add_argument("--messages-per-conversation", type=parse_range, default="2-16")
+    parser.add_argument("--long-conversation-rate", type=float, default=0.02)
+    parser.add_argument("--long-conversation-messages", type=parse_range, default="200-1000")
+    parser.add_argument("--user-message-chars", type=int, default=400)
+    parser.add_argument("--assistant-message-chars", type=int, default=2500)
+    parser.add_argument("--comments-per-student", type=parse_range, default="0-3")
+    parser.add_argument("--heavy-comment-rate", type=float, default=0.01, help="fraction of students with a bloated teacherComments map")
+    parser.add_argument("--heavy-comments", type=parse_range, default="200-800")
+    parser.add_argument("--comment-chars", type=int, default=300)
+    parser.add_argument("--start-timestamp", type=int, default=1756270137)
+    args = parser.parse_args()
+    args.text_pool = TextPool(args.seed)
+    generate(args)
+
+if __name__ == "__main__":
+    main()
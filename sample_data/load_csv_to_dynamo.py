@@ -2,137 +2,254 @@
 """
 Load CSV files from dynamo_data/ folder into DynamoDB tables.
 Handles the specific data format used in the K-12 Co-Teacher project.
+
+Cells holding DynamoDB JSON ({"S": ...}, {"M": ...}, {"L": ...}, {"N": ...}, ...) are decoded at
+every nesting level with boto3's TypeDeserializer, so maps such as disabilities and services
+arrive as plain maps/lists. Tables load in parallel; within a table one reader parses the CSV and
+hands 25-row segments to a pool of writer threads. Throttled or unprocessed writes are retried
+with backoff, and an interrupted or failed load prints the row offset to resume from.
+
+usage:
+  python load_csv_to_dynamo.py [--dry-run]
+  python load_csv_to_dynamo.py --tables k12-coteacher-student-profiles --workers 16
+  python load_csv_to_dynamo.py --tables k12-coteacher-student-profiles --start-row 250000
+  python load_csv_to_dynamo.py --data-dir /tmp/synthetic --endpoint-url http://localhost:8000
 """
 
+import argparse
 import boto3
 import csv
 import json
 import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+MAX_ATTEMPTS = 8
+RETRYABLE_ERRORS = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+}
+DEFAULT_TABLES = [
+    'k12-coteacher-teachers-to-classes',
+    'k12-coteacher-class-attributes',
+    'k12-coteacher-class-to-students',
+    'k12-coteacher-student-profiles',
+]
+TYPE_DESCRIPTORS = {"S", "N", "B", "SS", "NS", "BS", "M", "L", "NULL", "BOOL"}
+
+csv.field_size_limit(sys.maxsize)  # long chat messages and teacherComments
+_deserializer = TypeDeserializer()
+_stop = threading.Event()  # set on Ctrl-C so every table stops at a resumable point
 
 def json_loads_decimal(s):
-    """Parse JSON with Decimal support for DynamoDB"""
-    return json.loads(s, parse_float=Decimal)
+    """Parse JSON with Decimal support for DynamoDB (NaN/Infinity stay strings, DynamoDB can't store them)"""
+    return json.loads(s, parse_float=Decimal, parse_constant=str)
+
+def is_attribute_value(value):
+    """True for a DynamoDB typed value such as {"S": "x"} or {"M": {...}}"""
+    return isinstance(value, dict) and len(value) == 1 and next(iter(value)) in TYPE_DESCRIPTORS
+
+def decode_value(value):
+    """
+    Decode one CSV cell. A map or list of DynamoDB typed values (the console export format) is
+    deserialized all the way down; other JSON (numbers, quoted strings) is parsed; anything else
+    is kept as the raw string.
+    """
+    try:
+        parsed = json_loads_decimal(value)
+    except (json.JSONDecodeError, ValueError):
+        return value
+    if isinstance(parsed, dict) and parsed and all(is_attribute_value(v) for v in parsed.values()):
+        return {k: _deserializer.deserialize(v) for k, v in parsed.items()}
+    if isinstance(parsed, list) and all(is_attribute_value(v) for v in parsed):
+        return [_deserializer.deserialize(v) for v in parsed]
+    return parsed
+
+def row_to_item(row):
+    # Skip empty values
+    return {key: decode_value(value) for key, value in row.items() if value}
 
-def clean_dynamo_format(value):
-    """Clean DynamoDB format strings like {"S":"value"} to just "value" """
-    if isinstance(value, str):
+class LoadProgress:
+    """Tracks finished segments so a failed or interrupted load knows where it can safely resume."""
+
+    def __init__(self, start_row):
+        self.start_row = start_row
+        self.finished = {}  # segment start -> segment end
+        self.rows = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def segment_done(self, start, end, retries):
+        with self.lock:
+            self.finished[start] = end
+            self.rows += end - start
+            self.retries += retries
+
+    def resume_row(self):
+        """first row not known to be written; every row before it is in the table"""
+        with self.lock:
+            row = self.start_row
+            while row in self.finished:
+                row = self.finished[row]
+            return row
+
+def write_segment(client, table_name, key_names, rows):
+    """Decodes and writes up to 25 rows, retrying throttling and unprocessed items. Returns the retry count."""
+    items = {}
+    for row in rows:
+        item = row_to_item(row)
+        # BatchWriteItem rejects two puts of the same key, the later row wins like it would one by one
+        items[tuple(str(item.get(k)) for k in key_names)] = item
+    requests = [{"PutRequest": {"Item": item}} for item in items.values()]
+    retries = 0
+    for attempt in range(MAX_ATTEMPTS):
         try:
-            # Try to parse as JSON first
-            parsed = json.loads(value)
-            if isinstance(parsed, dict):
-                # Handle DynamoDB format objects
-                result = {}
-                for k, v in parsed.items():
-                    if isinstance(v, dict) and 'S' in v:
-                        result[k] = v['S']
-                    else:
-                        result[k] = v
-                return result
-            elif isinstance(parsed, list):
-                # Handle arrays of DynamoDB format
-                result = []
-                for item in parsed:
-                    if isinstance(item, dict) and 'S' in item:
-                        result.append(item['S'])
-                    else:
-                        result.append(item)
-                return result
-            return parsed
-        except (json.JSONDecodeError, ValueError):
-            return value
-    return value
-
-def load_csv_to_table(table_name, csv_file_path, dry_run=False):
-    """Load CSV data into a DynamoDB table"""
-    if not dry_run:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(table_name)
-    
+            response = client.batch_write_item(RequestItems={table_name: requests})
+            requests = response.get("UnprocessedItems", {}).get(table_name, [])
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in RETRYABLE_ERRORS:
+                raise
+        if not requests:
+            return retries
+        retries += 1
+        time.sleep(random.uniform(0, min(5.0, 0.05 * 2 ** attempt)))
+    raise RuntimeError(f"{len(requests)} items still unprocessed after {MAX_ATTEMPTS} attempts")
+
+def read_segments(csv_file_path, start_row):
+    """yields (first_row, rows) segments of BATCH_SIZE rows, skipping rows before start_row"""
+    with open(csv_file_path, 'r', encoding='utf-8', newline='') as file:
+        segment, first_row = [], start_row
+        for row_number, row in enumerate(csv.DictReader(file)):
+            if row_number < start_row:
+                continue
+            segment.append(row)
+            if len(segment) == BATCH_SIZE:
+                yield first_row, segment
+                segment, first_row = [], row_number + 1
+        if segment:
+            yield first_row, segment
+
+def load_csv_to_table(table_name, csv_file_path, dry_run=False, client=None, workers=8, start_row=0, report_every=5.0):
+    """Load CSV data into a DynamoDB table. Returns the LoadProgress (resume_row() is where a rerun should start)."""
     action = "DRY RUN - Would load" if dry_run else "Loading"
-    print(f"{action} {csv_file_path} into {table_name}...")
-    
-    with open(csv_file_path, 'r', encoding='utf-8') as file:
-        csv_reader = csv.DictReader(file)
-        
-        items_processed = 0
-        if not dry_run:
-            with table.batch_writer() as batch:
-                for row in csv_reader:
-                    # Clean up the data
-                    item = {}
-                    for key, value in row.items():
-                        if value:  # Skip empty values
-                            cleaned_value = clean_dynamo_format(value)
-                            item[key] = cleaned_value
-                    
-                    # Put item into DynamoDB
-                    batch.put_item(Item=item)
-                    items_processed += 1
-                    print(f"  Added item with key: {list(item.keys())[0]}={list(item.values())[0]}")
-        else:
-            # Dry run - just process and show what would be loaded
-            for row in csv_reader:
-                item = {}
-                for key, value in row.items():
-                    if value:
-                        cleaned_value = clean_dynamo_format(value)
-                        item[key] = cleaned_value
-                
-                items_processed += 1
-                print(f"  Would add: {list(item.keys())[0]}={list(item.values())[0]}")
-                if items_processed <= 3:  # Show first 3 items in detail
+    print(f"{action} {csv_file_path} into {table_name}" + (f" from row {start_row}" if start_row else "") + "...")
+    progress = LoadProgress(start_row)
+    started = last_report = time.perf_counter()
+
+    if dry_run:
+        # Dry run - just decode and show what would be loaded
+        for first_row, rows in read_segments(csv_file_path, start_row):
+            for row in rows:
+                item = row_to_item(row)
+                if progress.rows < 3:  # Show first 3 items in detail
                     print(f"    Full item: {item}")
-    
-    status = "Would complete" if dry_run else "Completed"
-    print(f"{status} loading {table_name} ({items_processed} items)\n")
+                progress.rows += 1
+        print(f"Would complete loading {table_name} ({progress.rows} items)\n")
+        return progress
+
+    key_names = [k["AttributeName"] for k in client.describe_table(TableName=table_name)["Table"]["KeySchema"]]
+    in_flight = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for first_row, rows in read_segments(csv_file_path, start_row):
+                if _stop.is_set():
+                    raise KeyboardInterrupt
+                # keep the reader at most a couple of segments per worker ahead of the writers
+                while len(in_flight) >= workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        first, end = in_flight.pop(future)
+                        progress.segment_done(first, end, future.result())
+                in_flight[pool.submit(write_segment, client, table_name, key_names, rows)] = (first_row, first_row + len(rows))
+                if time.perf_counter() - last_report >= report_every:
+                    last_report = time.perf_counter()
+                    print(f"  {table_name}: {progress.rows} rows, {progress.rows / (last_report - started):.0f} rows/s")
+            for future in list(in_flight):
+                first, end = in_flight.pop(future)
+                progress.segment_done(first, end, future.result())
+    except BaseException:
+        for future in in_flight:
+            future.cancel()
+        print(f"  {table_name}: load stopped, resume with --tables {table_name} --start-row {progress.resume_row()}")
+        raise
+
+    elapsed = time.perf_counter() - started
+    print(f"Completed loading {table_name} ({progress.rows} items in {elapsed:.1f}s, "
+          f"{progress.rows / max(elapsed, 1e-9):.0f} rows/s, {progress.retries} throttled/unprocessed retries)\n")
+    return progress
 
 def main():
     """Load all CSV files in dynamo_data/ folder"""
-    import sys
-    
-    # Check for dry run flag
-    dry_run = '--dry-run' in sys.argv or '-d' in sys.argv
-    
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    dynamo_data_dir = os.path.join(script_dir, 'dynamo_data')
-    
-    if not os.path.exists(dynamo_data_dir):
-        print(f"Directory not found: {dynamo_data_dir}")
+    parser = argparse.ArgumentParser(description="Load the dynamo_data CSV snapshots into DynamoDB")
+    parser.add_argument("--dry-run", "-d", action="store_true", help="decode and count rows without writing")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dynamo_data'))
+    parser.add_argument("--tables", nargs="+", default=DEFAULT_TABLES,
+                        help="table names; each loads from <data-dir>/<table>.csv (k12-coteacher-chat-history is also available)")
+    parser.add_argument("--workers", type=int, default=8, help="writer threads per table")
+    parser.add_argument("--start-row", type=int, default=0, help="skip rows already loaded (single table only)")
+    parser.add_argument("--endpoint-url", default=os.environ.get("DYNAMODB_ENDPOINT_URL"), help="e.g. DynamoDB Local")
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-west-2"))
+    args = parser.parse_args()
+
+    if args.start_row and len(args.tables) != 1:
+        parser.error("--start-row needs exactly one table in --tables")
+    if not os.path.exists(args.data_dir):
+        print(f"Directory not found: {args.data_dir}")
         return
-    
-    # Map CSV files to table names
-    csv_files = [
-        'k12-coteacher-teachers-to-classes.csv',
-        'k12-coteacher-class-attributes.csv', 
-        'k12-coteacher-class-to-students.csv',
-        'k12-coteacher-student-profiles.csv'
-    ]
-    
-    mode = "DRY RUN MODE" if dry_run else "LIVE MODE"
+
+    mode = "DRY RUN MODE" if args.dry_run else "LIVE MODE"
     print(f"Starting DynamoDB data load - {mode}\n")
-    
-    if dry_run:
+    if args.dry_run:
         print("DRY RUN: No data will be written to DynamoDB\n")
-    
-    for csv_file in csv_files:
-        csv_path = os.path.join(dynamo_data_dir, csv_file)
-        
+
+    client = None
+    if not args.dry_run:
+        # the resource's client takes plain python items (Decimal, dict, list) and serializes them
+        config = Config(max_pool_connections=args.workers * len(args.tables) + 4, retries={"mode": "standard", "max_attempts": 3})
+        client = boto3.resource('dynamodb', region_name=args.region, endpoint_url=args.endpoint_url, config=config).meta.client
+
+    jobs = []
+    for table_name in args.tables:
+        csv_path = os.path.join(args.data_dir, f"{table_name}.csv")
         if os.path.exists(csv_path):
-            # Extract table name from filename (remove .csv extension)
-            table_name = csv_file.replace('.csv', '')
-            
-            try:
-                load_csv_to_table(table_name, csv_path, dry_run=dry_run)
-            except Exception as e:
-                print(f"Error loading {csv_file}: {e}\n")
+            jobs.append((table_name, csv_path))
         else:
             print(f"File not found: {csv_path}")
-    
-    if dry_run:
+
+    failed = False
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs))) as pool:
+        futures = {pool.submit(load_csv_to_table, table_name, csv_path, args.dry_run, client, args.workers, args.start_row): table_name
+                   for table_name, csv_path in jobs}
+        try:
+            for future, table_name in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failed = True
+                    print(f"Error loading {table_name}: {e}\n")
+        except KeyboardInterrupt:
+            _stop.set()
+            wait(futures)
+            print("Interrupted, see the resume offsets above.")
+            sys.exit(130)
+
+    if args.dry_run:
         print("Dry run complete! Run without --dry-run to actually load data.")
+    elif failed:
+        print("Data loading finished with errors, see the resume offsets above.")
+        sys.exit(1)
     else:
         print("Data loading complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,37 @@
+"""
+shared fixtures: lambdas run against moto's in-process DynamoDB, no AWS account needed.
+run from the repo root: pip install -r requirements-dev.txt && python -m pytest -q
+"""
+import os, sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for key, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                   'AWS_DEFAULT_REGION': 'us-west-2', 'AWS_REGION': 'us-west-2'}.items():
+    os.environ[key] = value
+os.environ.pop('DYNAMODB_ENDPOINT_URL', None)
+sys.path[:0] = [os.path.join(ROOT, 'lambdas', 'layers', 'aws_clients', 'python'), os.path.join(ROOT, 'lambdas', 'inference')]
+sys.path.append(os.path.join(ROOT, 'preprocessing'))
+
+from moto import mock_aws
+
+
+@pytest.fixture
+def dynamodb():
+    with mock_aws():
+        import aws_clients
+        yield aws_clients.get_dynamo_resource()
+
+
+def create_table(dynamodb, name, hash_key, range_key=None, range_type='S'):
+    keys = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    attributes = [{'AttributeName': hash_key, 'AttributeType': 'S'}]
+    if range_key:
+        keys.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+        attributes.append({'AttributeName': range_key, 'AttributeType': range_type})
+    return dynamodb.create_table(TableName=name, KeySchema=keys, AttributeDefinitions=attributes, BillingMode='PAY_PER_REQUEST')
+
+
+@pytest.fixture
+def chat_table(dynamodb):
+    return create_table(dynamodb, 'k12-coteacher-chat-history', 'TeacherId', 'sortId')
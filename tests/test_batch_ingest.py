@@ -0,0 +1,38 @@
+import json
+from conftest import create_table
+import batch_ingest
+
+
+def finished_job(tmp_path, ledger, student_id, profile, briefing=None):
+    out = tmp_path / student_id
+    out.mkdir()
+    (out / f'{student_id}_final_student_profile.json').write_text(json.dumps(profile))
+    if briefing:
+        (out / f'{student_id}_briefing.json').write_text(json.dumps(briefing))
+    ledger.add(student_id, 'iep.pdf', 'psych.pdf')
+    ledger.mark(student_id, 'done', output_path=str(out / f'{student_id}_final_student_profile.json'))
+
+
+def test_reload_keeps_teacher_data_and_bumps_the_briefing(dynamodb, tmp_path):
+    table = create_table(dynamodb, batch_ingest.STUDENT_PROFILES_TABLE, 'studentID')
+    table.put_item(Item={
+        'studentID': 's1', 'first_name': 'Old', 'grade': 3,
+        'teacherComments': {'t1': ['needs breaks']},
+        'teacher_briefings': {'t1': {'text': 'with comments', 'comment_count': 1, 'version': 2}},
+        'briefing_requests': {'t1': 'r1'},
+        'briefing': {'text': 'old briefing', 'comment_count': 0, 'version': 3},
+    })
+    ledger = batch_ingest.JobLedger(str(tmp_path / 'ledger.db'))
+    finished_job(tmp_path, ledger, 's1', {'first_name': 'Ava', 'disabilities': ['Dyslexia'], 'teacherComments': {}},
+                 {'text': 'new briefing', 'comment_count': 0})
+    finished_job(tmp_path, ledger, 's2', {'first_name': 'Ben'}, {'text': 'first briefing', 'comment_count': 0})
+
+    assert batch_ingest.load_profiles(ledger) == 2
+    item = table.get_item(Key={'studentID': 's1'})['Item']
+    assert (item['first_name'], item['disabilities'], item['grade']) == ('Ava', ['Dyslexia'], 3)
+    assert item['teacherComments'] == {'t1': ['needs breaks']}
+    assert item['teacher_briefings']['t1']['text'] == 'with comments'
+    assert item['briefing_requests'] == {'t1': 'r1'}
+    assert (item['briefing']['text'], item['briefing']['version']) == ('new briefing', 4)
+    assert table.get_item(Key={'studentID': 's2'})['Item']['briefing']['version'] == 1
+    assert ledger.counts() == {'loaded': 2}
@@ -0,0 +1,89 @@
+import importlib.util, os, sys
+import pytest
+from conftest import ROOT, create_table
+
+sys.path.insert(0, os.path.join(ROOT, 'lambdas', 'studentBriefing'))
+import briefing
+
+
+def load_lambda(name):
+    path = os.path.join(ROOT, 'lambdas', name, 'lambda_function.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_lambda', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def profiles(dynamodb):
+    table = create_table(dynamodb, 'k12-coteacher-student-profiles', 'studentID')
+    table.put_item(Item={'studentID': 's1', 'first_name': 'Ava', 'disabilities': ['Dyslexia'], 'teacherComments': {}})
+    return table
+
+
+def record(comment_count, text='briefing'):
+    return {'text': text, 'model_id': 'm', 'generated_at': 0, 'comment_count': comment_count, 'generation_ms': 1, 'usage': {}}
+
+
+def test_versions_and_stale_writes(profiles):
+    assert briefing.store_briefing(profiles, 's1', record(0)) == 1
+    assert briefing.store_briefing(profiles, 's1', record(0)) == 2
+    assert briefing.store_briefing(profiles, 's1', record(2), teacher_id='t1') == 1
+    assert briefing.store_briefing(profiles, 's1', record(1), teacher_id='t1') is None
+    assert briefing.store_briefing(profiles, 's1', record(0), teacher_id='t2') == 1
+
+
+class RacingTable:
+    """another regeneration lands right after our first read"""
+
+    def __init__(self, table, race):
+        self.table, self.race = table, race
+
+    def get_item(self, **kwargs):
+        item = self.table.get_item(**kwargs)
+        if self.race:
+            self.race, race = None, self.race
+            race()
+        return item
+
+    def update_item(self, **kwargs):
+        return self.table.update_item(**kwargs)
+
+
+def test_concurrent_write_gets_its_own_version(profiles):
+    briefing.store_briefing(profiles, 's1', record(1), teacher_id='t1')
+    racing = RacingTable(profiles, lambda: briefing.store_briefing(profiles, 's1', record(2, 'first'), teacher_id='t1'))
+    assert briefing.store_briefing(racing, 's1', record(2, 'second'), teacher_id='t1') == 3
+    stored = profiles.get_item(Key={'studentID': 's1'})['Item']['teacher_briefings']['t1']
+    assert (stored['text'], stored['version']) == ('second', 3)
+
+
+def test_concurrent_newer_write_is_not_overwritten(profiles):
+    briefing.store_briefing(profiles, 's1', record(1), teacher_id='t1')
+    racing = RacingTable(profiles, lambda: briefing.store_briefing(profiles, 's1', record(3, 'newer'), teacher_id='t1'))
+    assert briefing.store_briefing(racing, 's1', record(2, 'slower'), teacher_id='t1') is None
+    stored = profiles.get_item(Key={'studentID': 's1'})['Item']['teacher_briefings']['t1']
+    assert (stored['text'], stored['version']) == ('newer', 2)
+
+
+def test_burst_of_comments_regenerates_once(profiles, monkeypatch):
+    import aws_clients
+    queue_url = aws_clients.get_sqs_client().create_queue(QueueName='k12-coteacher-briefing-requests')['QueueUrl']
+    monkeypatch.setenv('BRIEFING_QUEUE_URL', queue_url)
+    monkeypatch.setenv('BRIEFING_DEBOUNCE_SECONDS', '0')
+    edit = load_lambda('editStudentProfile')
+    student_briefing = load_lambda('studentBriefing')
+    calls = []
+    monkeypatch.setattr(student_briefing, 'invoke_bedrock', lambda body, model_id: calls.append(body) or
+                        {'content': [{'text': 'briefing'}], 'usage': {'input_tokens': 10, 'output_tokens': 5}})
+
+    for comment in ['needs breaks', 'prefers front row', 'uses a reading ruler']:
+        assert edit.lambda_handler({'studentID': 's1', 'teacherID': 't1', 'teacherComment': comment}, None)['statusCode'] == 200
+    messages = aws_clients.get_sqs_client().receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+    assert len(messages) == 3
+
+    records = [{'messageId': m['MessageId'], 'body': m['Body']} for m in messages]
+    assert student_briefing.lambda_handler({'Records': records}, None) == {'batchItemFailures': []}
+    assert len(calls) == 1
+    stored = profiles.get_item(Key={'studentID': 's1'})['Item']['teacher_briefings']['t1']
+    assert (stored['comment_count'], stored['version']) == (3, 1)
@@ -0,0 +1,64 @@
+import gzip, importlib.util, json, os, sys
+import pytest
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'lambdas', 'chatRetention'))
+import chat_archive
+
+
+def load_get_chat_history():
+    path = os.path.join(ROOT, 'lambdas', 'getChatHistory', 'lambda_fuction.py')
+    spec = importlib.util.spec_from_file_location('get_chat_history', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_conversation(table, n, created_at=1000):
+    table.put_item(Item={'TeacherId': 't1', 'sortId': 'CONV#c1', 'conversation_id': 'c1', 'title': 'old', 'created_at': created_at})
+    for i in range(n):
+        table.put_item(Item={'TeacherId': 't1', 'sortId': f'CHAT#c1#MSG#{i:03d}', 'created_at': created_at + i,
+                             'message': f'message {i}', 'sender': 'user'})
+
+
+def test_archiving_without_s3_uri_fails_before_deleting(chat_table, monkeypatch):
+    monkeypatch.setattr(chat_archive, 'CHAT_ARCHIVE_URI', '')
+    write_conversation(chat_table, 5)
+    conversation = chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CONV#c1'})['Item']
+
+    with pytest.raises(ValueError):
+        chat_archive.archive_conversation(conversation)
+    with pytest.raises(ValueError):
+        chat_archive.get_archive_store('/tmp/chat-archive')
+    assert len(chat_table.scan()['Items']) == 6
+
+
+def test_history_merges_archive_with_messages_written_after_archiving(chat_table, dynamodb, tmp_path):
+    write_conversation(chat_table, 4)
+    conversation = chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CONV#c1'})['Item']
+    store = chat_archive.get_archive_store(local_dir=str(tmp_path))
+    assert chat_archive.archive_conversation(conversation, store) == 4
+    archive_uri = chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CONV#c1'})['Item']['archive_uri']
+    assert len(json.loads(gzip.decompress(open(archive_uri, 'rb').read()))['messages']) == 4
+
+    # the teacher comes back to the archived conversation
+    chat_table.put_item(Item={'TeacherId': 't1', 'sortId': 'CHAT#c1#MSG#new', 'created_at': 5000, 'message': 'again', 'sender': 'user'})
+
+    items = load_get_chat_history().lambda_handler({'teacherId': 't1', 'conversationId': 'c1'}, None)
+    assert [m['message'] for m in items] == ['message 0', 'message 1', 'message 2', 'message 3', 'again']
+    assert 'archive_uri' not in chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CONV#c1'})['Item']
+
+
+def test_backfill_ttl_stamps_only_messages(chat_table, monkeypatch):
+    import backfill_ttl
+    write_conversation(chat_table, 12)
+    chat_table.update_item(Key={'TeacherId': 't1', 'sortId': 'CHAT#c1#MSG#000'}, UpdateExpression='SET expires_at = :e',
+                           ExpressionAttributeValues={':e': 1})
+    monkeypatch.setattr(sys, 'argv', ['backfill_ttl.py', '--segments', '3'])
+    backfill_ttl.main()
+
+    items = {item['sortId']: item for item in chat_table.scan()['Items']}
+    assert 'expires_at' not in items['CONV#c1']
+    assert items['CHAT#c1#MSG#000']['expires_at'] == 1
+    assert items['CHAT#c1#MSG#005']['expires_at'] == chat_archive.expires_at_for(1005)
+    assert sum('expires_at' in item for item in items.values()) == 12
@@ -0,0 +1,75 @@
+import os, sys
+import pytest
+from conftest import ROOT, create_table
+
+sys.path.insert(0, os.path.join(ROOT, 'lambdas', 'chatRetention'))
+import chat_archive
+import chat_search_index
+
+
+@pytest.fixture
+def index_table(dynamodb):
+    return create_table(dynamodb, chat_search_index.SEARCH_INDEX_TABLE, 'TeacherId', 'sortId')
+
+
+def add_message(chat_table, conversation_id, i, text):
+    if not chat_table.get_item(Key={'TeacherId': 't1', 'sortId': f'CONV#{conversation_id}'}).get('Item'):
+        chat_table.put_item(Item={'TeacherId': 't1', 'sortId': f'CONV#{conversation_id}', 'conversation_id': conversation_id,
+                                  'title': conversation_id, 'created_at': 1000})
+    item = {'TeacherId': 't1', 'sortId': f'CHAT#{conversation_id}#MSG#{i:03d}', 'created_at': 1000 + i, 'message': text, 'sender': 'user'}
+    chat_table.put_item(Item=item)
+    return conversation_id, item
+
+
+def found(query):
+    return [hit['messageId'] for hit in chat_search_index.search('t1', query)['hits']]
+
+
+def test_bulk_index_folds_pending_chat_docs_first(chat_table, index_table):
+    chat_search_index.index_message('t1', *add_message(chat_table, 'c1', 0, 'extended time on fractions'))
+    chat_search_index.index_message('t1', *add_message(chat_table, 'c1', 1, 'seat near the door'))
+    history = [add_message(chat_table, 'c2', i, f'reading log week {i}') for i in range(5)]
+    assert chat_search_index.bulk_index('t1', history) == 5
+
+    meta = index_table.get_item(Key={'TeacherId': 't1', 'sortId': 'META'})['Item']
+    assert meta['compacted_through'] == meta['next_docno'] == 7
+    assert found('fractions') == ['CHAT#c1#MSG#000']
+    assert found('door') == ['CHAT#c1#MSG#001']
+    assert len(found('reading')) == 5
+
+
+def test_bulk_index_leaves_batch_pending_behind_a_pending_doc(chat_table, index_table):
+    chat_search_index.index_message('t1', *add_message(chat_table, 'c1', 0, 'extended time on fractions'))
+    # another compaction holds the lease, the chat doc stays pending
+    index_table.update_item(Key={'TeacherId': 't1', 'sortId': 'META'}, UpdateExpression='SET lease_until = :u',
+                            ExpressionAttributeValues={':u': 2 ** 40})
+    chat_search_index.bulk_index('t1', [add_message(chat_table, 'c2', 0, 'reading log')])
+
+    assert 'compacted_through' not in index_table.get_item(Key={'TeacherId': 't1', 'sortId': 'META'})['Item']
+    assert found('fractions') == ['CHAT#c1#MSG#000']
+    assert found('reading') == ['CHAT#c2#MSG#000']
+
+
+def test_backfill_skips_indexed_messages(chat_table, index_table):
+    chat_search_index.index_message('t1', *add_message(chat_table, 'c1', 0, 'fractions again'))
+    history = [add_message(chat_table, 'c1', 1, 'fractions practice'), add_message(chat_table, 'c1', 0, 'fractions again')]
+    indexed = chat_search_index.indexed_message_keys('t1')
+    assert indexed == {'CHAT#c1#MSG#000'}
+    assert chat_search_index.bulk_index('t1', [m for m in history if m[1]['sortId'] not in indexed]) == 1
+    assert sorted(found('fractions')) == ['CHAT#c1#MSG#000', 'CHAT#c1#MSG#001']
+    assert int(index_table.get_item(Key={'TeacherId': 't1', 'sortId': 'META'})['Item']['next_docno']) == 2
+
+
+def test_hits_in_archived_conversations_come_from_the_archive(chat_table, index_table, tmp_path):
+    for i in range(3):
+        chat_search_index.index_message('t1', *add_message(chat_table, 'c1', i, f'fractions lesson {i}'))
+    chat_search_index.index_message('t1', *add_message(chat_table, 'c2', 0, 'fractions quiz'))
+    conversation = chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CONV#c1'})['Item']
+    chat_archive.archive_conversation(conversation, chat_archive.get_archive_store(local_dir=str(tmp_path)))
+    assert not chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CHAT#c1#MSG#000'}).get('Item')
+
+    result = chat_search_index.search('t1', 'fractions', page_size=3)
+    assert len(result['hits']) == 3 and result['nextOffset'] == 3
+    hits = result['hits'] + chat_search_index.search('t1', 'fractions', page_size=3, offset=3)['hits']
+    assert sorted(hit['messageId'] for hit in hits) == ['CHAT#c1#MSG#000', 'CHAT#c1#MSG#001', 'CHAT#c1#MSG#002', 'CHAT#c2#MSG#000']
+    assert {hit['snippet'].split()[0] for hit in hits} == {'**fractions**'}
@@ -0,0 +1,39 @@
+import conversation_history
+
+
+def test_delete_conversation_removes_10k_messages_across_pages(chat_table, monkeypatch):
+    with chat_table.batch_writer() as batch:
+        batch.put_item(Item={'TeacherId': 't1', 'sortId': 'CONV#c1', 'title': 'big'})
+        for i in range(10000):
+            # ~250 byte items so the key query needs several 1 MB pages
+            batch.put_item(Item={'TeacherId': 't1', 'sortId': f'CHAT#c1#MSG#{i:05d}', 'message': 'x' * 200, 'sender': 'user'})
+        batch.put_item(Item={'TeacherId': 't1', 'sortId': 'CONV#c2', 'title': 'other'})
+        batch.put_item(Item={'TeacherId': 't1', 'sortId': 'CHAT#c2#MSG#0', 'message': 'keep me', 'sender': 'user'})
+
+    pages = []
+    list_pages = conversation_history.get_chat_message_keys
+
+    def recording_pages(user_id, conversation_id):
+        for page in list_pages(user_id, conversation_id):
+            pages.append(len(page))
+            yield page
+    monkeypatch.setattr(conversation_history, 'get_chat_message_keys', recording_pages)
+
+    assert conversation_history.delete_conversation('t1', 'c1') == 10000
+    assert len(pages) > 1 and sum(pages) == 10000
+
+    remaining = sorted(item['sortId'] for item in chat_table.scan()['Items'])
+    assert remaining == ['CHAT#c2#MSG#0', 'CONV#c2']
+
+
+def test_async_delete_is_swept_later(chat_table):
+    with chat_table.batch_writer() as batch:
+        batch.put_item(Item={'TeacherId': 't1', 'sortId': 'CONV#c1', 'title': 'gone'})
+        for i in range(60):
+            batch.put_item(Item={'TeacherId': 't1', 'sortId': f'CHAT#c1#MSG#{i:02d}', 'message': 'hi', 'sender': 'user'})
+
+    assert conversation_history.delete_conversation('t1', 'c1', async_delete=True) == 0
+    assert chat_table.get_item(Key={'TeacherId': 't1', 'sortId': 'CONV#c1'})['Item']['deleted_at']
+
+    assert conversation_history.sweep_deleted_conversations('t1') == 1
+    assert chat_table.scan()['Items'] == []
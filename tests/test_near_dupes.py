@@ -0,0 +1,20 @@
+from near_dupes import collapse_near_duplicates
+
+
+def test_negation_is_not_a_duplicate():
+    items = ['Allow use of a calculator on math tests', 'Do not allow use of a calculator on math tests']
+    assert collapse_near_duplicates(items) == items
+
+
+def test_substituted_subject_or_number_is_not_a_duplicate():
+    items = ['Not to participate in ELA testing (Outside Testing Group or Plan Type 200)',
+             'Not to participate in Math testing (Outside Testing Group or Plan Type 200)',
+             'Movement breaks every 20 minutes', 'Movement breaks every 30 minutes']
+    assert collapse_near_duplicates(items) == items
+
+
+def test_paraphrases_keep_the_most_detailed_wording():
+    items = ['Extended time on tests', 'Extra time for tests and quizzes',
+             'Advance notice of schedule changes', 'Advance notice of changes in routine or schedule']
+    assert collapse_near_duplicates(items) == ['Extra time for tests and quizzes',
+                                               'Advance notice of changes in routine or schedule']
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import create_table
+import rate_limiter
+
+
+@pytest.fixture
+def buckets(dynamodb):
+    return create_table(dynamodb, rate_limiter.RATE_LIMIT_TABLE, 'bucketId')
+
+
+def test_burst_then_reject(buckets):
+    # 6/min refills one token every 10s, nothing refills during the test
+    results = [rate_limiter.take_token('TEACHER#t1', 6, 10) for _ in range(11)]
+    assert [allowed for allowed, _ in results] == [True] * 10 + [False]
+    assert 9 < results[-1][1] <= 10
+
+
+def test_refund_gives_the_token_back(buckets):
+    for _ in range(10):
+        rate_limiter.take_token('TEACHER#t1', 6, 10)
+    assert not rate_limiter.take_token('TEACHER#t1', 6, 10)[0]
+    rate_limiter.refund_token('TEACHER#t1', 6)
+    assert rate_limiter.take_token('TEACHER#t1', 6, 10)[0]
+    assert not rate_limiter.take_token('TEACHER#t1', 6, 10)[0]
+
+
+def test_contention_on_global_bucket_rejects_nothing_under_burst(buckets):
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda _: rate_limiter.take_token('GLOBAL', 0.6, 150), range(150)))
+    assert all(allowed for allowed, _ in results)
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda _: rate_limiter.take_token('GLOBAL', 0.6, 150), range(20)))
+    assert not any(allowed for allowed, _ in results)
+
+
+def test_admit_refunds_teacher_when_global_is_empty(buckets, monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'GLOBAL_BURST', 1)
+    assert rate_limiter.admit_request('t1')[0]
+    assert not rate_limiter.admit_request('t1')[0]
+    # 1 token used by t1 out of 10, the rejected request was refunded
+    item = buckets.get_item(Key={'bucketId': 'TEACHER#t1'})['Item']
+    assert float(item['full_at']) - rate_limiter.time.time() < 10.5
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import create_table
+import stream_buffer
+
+
+class FakeApiGateway:
+    """records frames per connection, a connection goes away after gone_after frames"""
+
+    def __init__(self, gone_after=None):
+        self.gone_after = gone_after or {}
+        self.received = {}
+
+    def post_to_connection(self, ConnectionId, Data):
+        frames = self.received.setdefault(ConnectionId, [])
+        if len(frames) >= self.gone_after.get(ConnectionId, float('inf')):
+            raise ClientError({'Error': {'Code': 'GoneException', 'Message': 'gone'}}, 'PostToConnection')
+        frames.append(json.loads(Data)['seq'])
+
+
+def client_view(apigw, *connections):
+    """what the client ends up with: every connection's frames in order, already-seen seqs dropped"""
+    seen = []
+    for connection_id in connections:
+        seen += [seq for seq in apigw.received.get(connection_id, []) if not seen or seq > seen[-1]]
+    return seen
+
+
+@pytest.fixture
+def buffer_table(dynamodb, monkeypatch):
+    monkeypatch.setattr(stream_buffer, 'CHECKPOINT_MAX_FRAMES', 3)
+    return create_table(dynamodb, stream_buffer.STREAM_BUFFER_TABLE, 'sessionId', 'seq', range_type='N')
+
+
+def test_resume_while_generating(buffer_table):
+    apigw = FakeApiGateway(gone_after={'c1': 4})
+    stream = stream_buffer.ResumableStream(apigw, 'c1', 's1', 't1')
+    for i in range(10):
+        stream.send({'type': 'chunk', 'text': str(i)})
+    assert not stream.connected
+
+    last_seen = apigw.received['c1'][-1]
+    assert stream_buffer.resume_stream(apigw, 'c2', 's1', 't1', last_seen) == 'attached'
+    for i in range(10, 20):
+        stream.send({'type': 'chunk', 'text': str(i)})
+    stream.finish({'type': 'end'})
+
+    assert client_view(apigw, 'c1', 'c2') == list(range(1, 22))
+
+
+def test_resume_after_completion(buffer_table):
+    apigw = FakeApiGateway(gone_after={'c1': 5})
+    stream = stream_buffer.ResumableStream(apigw, 'c1', 's1', 't1')
+    for i in range(12):
+        stream.send({'type': 'chunk', 'text': str(i)})
+    stream.finish({'type': 'end'})
+
+    assert stream_buffer.resume_stream(apigw, 'c2', 's1', 't1', apigw.received['c1'][-1]) == 'replayed'
+    assert apigw.received['c2'] == list(range(6, 14))
+    assert client_view(apigw, 'c1', 'c2') == list(range(1, 14))
+
+
+def test_resume_for_another_teacher_is_unavailable(buffer_table):
+    apigw = FakeApiGateway()
+    stream = stream_buffer.ResumableStream(apigw, 'c1', 's1', 't1')
+    stream.finish({'type': 'end'})
+    assert stream_buffer.resume_stream(apigw, 'c2', 's1', 't2', 0) == 'unavailable'
+    assert 'c2' not in apigw.received
+
+
+def frames_of(apigw, connection_id):
+    return [json.loads(f) for f in apigw.raw.get(connection_id, [])]
+
+
+class RecordingApiGateway(FakeApiGateway):
+    """also keeps the frame bodies"""
+
+    def __init__(self, gone_after=None):
+        super().__init__(gone_after)
+        self.raw = {}
+
+    def post_to_connection(self, ConnectionId, Data):
+        super().post_to_connection(ConnectionId, Data)
+        self.raw.setdefault(ConnectionId, []).append(Data)
+
+
+def test_second_answer_in_a_session_replays_only_its_own_frames(buffer_table, monkeypatch):
+    monkeypatch.setattr(stream_buffer, 'CHECKPOINT_MAX_FRAMES', 5)
+    apigw = RecordingApiGateway()
+    first = stream_buffer.ResumableStream(apigw, 'c1', 's1', 't1')
+    for i in range(19):
+        first.send({'answer': 1, 'text': str(i)})
+    first.finish({'answer': 1, 'status': 'complete'})
+
+    apigw = RecordingApiGateway(gone_after={'c2': 2})
+    second = stream_buffer.ResumableStream(apigw, 'c2', 's1', 't1')
+    for i in range(5):
+        second.send({'answer': 2, 'text': str(i)})
+    second.finish({'answer': 2, 'status': 'complete'})
+
+    assert stream_buffer.resume_stream(apigw, 'c3', 's1', 't1', 2) == 'replayed'
+    replayed = frames_of(apigw, 'c3')
+    assert [f['seq'] for f in replayed] == [3, 4, 5, 6]
+    assert {f['answer'] for f in replayed} == {2}
+    assert [f.get('status') for f in replayed].count('complete') == 1
+
+
+def test_resume_while_second_answer_generates(buffer_table):
+    apigw = RecordingApiGateway()
+    first = stream_buffer.ResumableStream(apigw, 'c1', 's1', 't1')
+    for i in range(12):
+        first.send({'answer': 1, 'text': str(i)})
+    first.finish({'answer': 1, 'status': 'complete'})
+
+    apigw = RecordingApiGateway(gone_after={'c2': 2})
+    second = stream_buffer.ResumableStream(apigw, 'c2', 's1', 't1')
+    for i in range(4):
+        second.send({'answer': 2, 'text': str(i)})
+    assert stream_buffer.resume_stream(apigw, 'c3', 's1', 't1', 2) == 'attached'
+    for i in range(4, 8):
+        second.send({'answer': 2, 'text': str(i)})
+    second.finish({'answer': 2, 'status': 'complete'})
+
+    assert client_view(apigw, 'c2', 'c3') == list(range(1, 10))
+    assert {f['answer'] for f in frames_of(apigw, 'c3')} == {2}
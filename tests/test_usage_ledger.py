@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+import pytest
+from boto3.dynamodb.conditions import Key
+from conftest import create_table
+import usage_ledger
+
+
+@pytest.fixture
+def ledger(dynamodb):
+    usage_ledger.reset_usage()
+    yield create_table(dynamodb, usage_ledger.USAGE_TABLE, 'pk', 'sk')
+    usage_ledger.reset_usage()
+
+
+def record(teacher_id, class_id='', output_tokens=10, purpose='chat'):
+    usage_ledger.record_usage(teacher_id, 'conv1', class_id, 'general', purpose, 'model-a',
+                              {'input_tokens': 100, 'output_tokens': output_tokens, 'cache_read_tokens': 50}, latency_ms=1200, ttft_ms=300)
+
+
+def items(table, pk):
+    return table.query(KeyConditionExpression=Key('pk').eq(pk))['Items']
+
+
+def test_flush_writes_turns_and_daily_rollups(ledger):
+    record('t1', 'class1')
+    record('t1', 'class1', output_tokens=5, purpose='title')
+    assert usage_ledger.flush_usage() == 2
+    record('t1')
+    assert usage_ledger.flush_usage() == 1
+    assert usage_ledger.flush_usage() == 0
+
+    turns = items(ledger, 'TEACHER#t1')
+    assert len(turns) == 3
+    assert sorted(t['purpose'] for t in turns) == ['chat', 'chat', 'title']
+    assert all(t['ttft_ms'] == 300 and 'teacher_id' not in t and t['expires_at'] > 0 for t in turns)
+
+    day = datetime.now(timezone.utc).date().isoformat()
+    rollups = {item['sk']: item for item in items(ledger, f'DAILY#{day}')}
+    assert set(rollups) == {'TEACHER#t1', 'CLASS#class1'}
+    assert (rollups['TEACHER#t1']['calls'], rollups['TEACHER#t1']['output_tokens'], rollups['TEACHER#t1']['cache_read_tokens']) == (3, 25, 150)
+    assert (rollups['CLASS#class1']['calls'], rollups['CLASS#class1']['input_tokens'], rollups['CLASS#class1']['latency_ms']) == (2, 200, 2400)
+
+
+def test_records_of_an_unflushed_turn_do_not_reach_the_next_teacher(ledger):
+    # an earlier invocation failed before flushing, the warm container then serves another teacher
+    record('t1', 'class1')
+    assert usage_ledger.reset_usage() == 1
+    record('t2', 'class2')
+    assert usage_ledger.flush_usage() == 1
+
+    assert items(ledger, 'TEACHER#t1') == []
+    assert len(items(ledger, 'TEACHER#t2')) == 1
+    day = datetime.now(timezone.utc).date().isoformat()
+    assert {item['sk'] for item in items(ledger, f'DAILY#{day}')} == {'TEACHER#t2', 'CLASS#class2'}
+
+
+def test_flush_never_raises(dynamodb):
+    usage_ledger.reset_usage()
+    record('t1')
+    # no ledger table: the turn must still complete
+    assert usage_ledger.flush_usage() == 1
+    assert usage_ledger.flush_usage() == 0